@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, Float, DateTime, Enum, JSON, ForeignKey, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Boolean, Float, DateTime, Enum, JSON, ForeignKey, UniqueConstraint, Index, LargeBinary
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from .database import Base
 import enum
@@ -62,6 +62,10 @@ class User(Base):
 
 class Memory(Base):
     __tablename__ = "memories"
+    __table_args__ = (
+        Index("idx_user_type", "user_id", "memory_type"),
+        Index("idx_memory_type", "memory_type"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -85,7 +89,9 @@ class Post(Base):
     content = Column(Text, nullable=False)
     image_path = Column(String(500))
     likes_count = Column(Integer, default=0)
+    comments_count = Column(Integer, default=0)  # 由评论的增删在同一事务中维护
     created_at = Column(DateTime, server_default=func.now(), index=True)
+    last_activity_at = Column(DateTime, server_default=func.now())  # 最近被评论/点赞的时间
     
     # 关系
     author = relationship("User", back_populates="posts")
@@ -111,6 +117,9 @@ class PostLike(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("idx_post_created", "post_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
@@ -154,6 +163,10 @@ class ChatGroupMember(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("idx_receiver_unread", "receiver_id", "is_read", "created_at"),
+        Index("idx_private_chat_time", "sender_id", "receiver_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -258,6 +271,9 @@ class ActionLog(Base):
     记录AI角色的每一步行动
     """
     __tablename__ = "action_logs"
+    __table_args__ = (
+        Index("idx_character_day_time", "character_id", "game_day", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     character_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -277,9 +293,13 @@ class ActionLog(Base):
     result = Column(Text)                              # 行动结果
     success = Column(Boolean, default=True)
     
-    # LLM交互记录
-    input_prompt = Column(Text)                        # 发送给LLM的完整prompt
-    llm_response = Column(Text)                        # LLM返回的原始响应
+    # LLM交互记录（内容存于llm_blobs表，这里只存哈希）
+    input_prompt_hash = Column(String(64))             # 发送给LLM的完整prompt
+    llm_response_hash = Column(String(64))             # LLM返回的原始响应
+    
+    # 旧版直接存储的LLM交互记录（延迟加载，列表查询不读取）
+    input_prompt = deferred(Column(Text))
+    llm_response = deferred(Column(Text))
     
     # 额外数据（JSON格式存储）
     extra_data = Column(JSON)
@@ -290,3 +310,18 @@ class ActionLog(Base):
     character = relationship("User", foreign_keys=[character_id])
     target_character = relationship("User", foreign_keys=[target_character_id])
     location = relationship("Location")
+
+
+class LLMBlob(Base):
+    """
+    LLM输入/输出内容表
+    
+    按原文SHA-256寻址，压缩存储，相同内容只存一份
+    """
+    __tablename__ = "llm_blobs"
+    
+    hash = Column(String(64), primary_key=True)
+    codec = Column(String(10), nullable=False, default="zlib")
+    data = Column(LargeBinary(length=16777215), nullable=False)
+    raw_size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
+from typing import Optional
 
 from ..database import get_db
 from ..models import User, Post, Comment
 from ..schemas import CommentCreate, CommentResponse, CommentListResponse, UserBrief
 from ..auth import get_current_user
+from shared.pagination import apply_keyset, encode_cursor
 
 router = APIRouter(prefix="/posts/{post_id}/comments", tags=["评论"])
 
@@ -15,9 +17,11 @@ async def list_comments(
     post_id: int,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=50, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="上一页返回的next_cursor，提供时忽略skip"),
+    with_total: bool = Query(default=True, description="是否统计总数"),
     db: Session = Depends(get_db)
 ):
-    """获取帖子评论列表"""
+    """获取帖子评论列表（按时间正序，支持skip/limit或游标分页）"""
     post = db.query(Post).filter(Post.id == post_id).first()
     if not post:
         raise HTTPException(
@@ -26,8 +30,20 @@ async def list_comments(
         )
     
     query = db.query(Comment).options(joinedload(Comment.author)).filter(Comment.post_id == post_id)
-    total = query.count()
-    comments = query.order_by(Comment.created_at).offset(skip).limit(limit).all()
+    total = query.count() if with_total else None
+    
+    try:
+        query = apply_keyset(query, Comment.created_at, Comment.id, cursor, descending=False)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的游标")
+    
+    if not cursor:
+        query = query.offset(skip)
+    
+    # 多取一条判断是否还有下一页
+    comments = query.limit(limit + 1).all()
+    has_more = len(comments) > limit
+    comments = comments[:limit]
     
     items = [
         CommentResponse(
@@ -47,7 +63,12 @@ async def list_comments(
         for c in comments
     ]
     
-    return CommentListResponse(items=items, total=total)
+    return CommentListResponse(
+        items=items,
+        total=total,
+        next_cursor=encode_cursor(comments[-1].created_at, comments[-1].id) if has_more else None,
+        has_more=has_more
+    )
 
 
 @router.post("", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
@@ -71,6 +92,11 @@ async def create_comment(
         content=comment_data.content
     )
     db.add(new_comment)
+    # 与评论在同一事务中更新帖子计数（原子自增，避免并发覆盖）
+    db.query(Post).filter(Post.id == post_id).update({
+        Post.comments_count: Post.comments_count + 1,
+        Post.last_activity_at: func.now()
+    }, synchronize_session=False)
     db.commit()
     db.refresh(new_comment)
     
@@ -116,5 +142,8 @@ async def delete_comment(
         )
     
     db.delete(comment)
+    db.query(Post).filter(Post.id == post_id, Post.comments_count > 0).update({
+        Post.comments_count: Post.comments_count - 1
+    }, synchronize_session=False)
     db.commit()
     return None
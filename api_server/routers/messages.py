@@ -1,7 +1,7 @@
 """私聊消息路由"""
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func, desc
+from sqlalchemy import or_, and_, func, desc, case, select
 from typing import List, Dict, Optional
 import json
 from datetime import datetime
@@ -10,6 +10,7 @@ from ..database import get_db
 from ..models import Message, User
 from ..schemas import MessageCreate, MessageResponse, UserBrief, SuccessResponse
 from ..auth import get_current_user, decode_token
+from shared.pagination import apply_keyset, encode_cursor
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
@@ -89,34 +90,42 @@ async def get_conversations(
     try:
         user_id = current_user.id
         
-        # 获取所有与当前用户相关的私聊消息
-        all_messages = db.query(Message).filter(
+        # 一次查询得到：每个对话方的最后一条消息 + 未读数 + 对方用户信息
+        # 对话方ID：我发出的取接收者，我收到的取发送者
+        partner_id = case(
+            (Message.sender_id == user_id, Message.receiver_id),
+            else_=Message.sender_id
+        )
+        is_unread = case(
+            (and_(Message.receiver_id == user_id, Message.is_read == False), 1),
+            else_=0
+        )
+        ranked = select(
+            Message.id.label("message_id"),
+            partner_id.label("partner_id"),
+            func.row_number().over(
+                partition_by=partner_id,
+                order_by=(Message.created_at.desc(), Message.id.desc())
+            ).label("rn"),
+            func.sum(is_unread).over(partition_by=partner_id).label("unread_count")
+        ).where(
             or_(Message.sender_id == user_id, Message.receiver_id == user_id),
             Message.group_id.is_(None)
-        ).order_by(desc(Message.created_at)).all()
+        ).subquery()
         
-        # 按对话方分组，找出每个对话的最后一条消息
-        conversation_map = {}
-        for msg in all_messages:
-            other_id = msg.receiver_id if msg.sender_id == user_id else msg.sender_id
-            if other_id not in conversation_map:
-                conversation_map[other_id] = msg
+        rows = db.query(Message, User, ranked.c.unread_count).join(
+            ranked, Message.id == ranked.c.message_id
+        ).join(
+            User, User.id == ranked.c.partner_id
+        ).filter(
+            ranked.c.rn == 1
+        ).order_by(
+            desc(Message.created_at), desc(Message.id)
+        ).all()
         
-        # 构建响应
+        # 构建响应（已按最后消息时间倒序）
         conversations = []
-        for other_user_id, last_message in conversation_map.items():
-            # 获取对方用户信息
-            other_user = db.query(User).filter(User.id == other_user_id).first()
-            if not other_user:
-                continue
-            
-            # 统计未读消息数
-            unread_count = db.query(func.count(Message.id)).filter(
-                Message.sender_id == other_user_id,
-                Message.receiver_id == user_id,
-                Message.is_read == False
-            ).scalar()
-            
+        for last_message, other_user, unread_count in rows:
             conversations.append({
                 "user": user_to_brief(other_user),
                 "last_message": {
@@ -125,15 +134,9 @@ async def get_conversations(
                     "created_at": last_message.created_at.isoformat(),
                     "is_mine": last_message.sender_id == user_id
                 },
-                "unread_count": unread_count
+                "unread_count": int(unread_count or 0)
             })
         
-        # 按最后消息时间排序
-        conversations.sort(
-            key=lambda x: x["last_message"]["created_at"],
-            reverse=True
-        )
-        
         return {"conversations": conversations}
     except Exception as e:
         import traceback
@@ -147,10 +150,12 @@ async def get_message_history(
     user_id: int,
     page: int = 1,
     page_size: int = 50,
+    cursor: Optional[str] = Query(default=None, description="上一页返回的next_cursor，用于加载更早的消息"),
+    with_total: bool = True,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取与指定用户的私聊历史"""
+    """获取与指定用户的私聊历史（支持page分页或游标分页）"""
     my_id = current_user.id
     
     # 验证对方用户存在
@@ -165,10 +170,23 @@ async def get_message_history(
             and_(Message.sender_id == user_id, Message.receiver_id == my_id)
         ),
         Message.group_id.is_(None)
-    ).order_by(desc(Message.created_at))
+    )
+    
+    total = query.count() if with_total else None
+    
+    try:
+        query = apply_keyset(query, Message.created_at, Message.id, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的游标")
+    
+    if not cursor:
+        query = query.offset((page - 1) * page_size)
     
-    total = query.count()
-    messages = query.offset((page - 1) * page_size).limit(page_size).all()
+    # 多取一条判断是否还有更早的消息
+    messages = query.limit(page_size + 1).all()
+    has_more = len(messages) > page_size
+    messages = messages[:page_size]
+    next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id) if has_more else None
     
     # 按时间正序返回（最新的在最后）
     messages.reverse()
@@ -184,6 +202,8 @@ async def get_message_history(
         "total": total,
         "page": page,
         "page_size": page_size,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
         "other_user": user_to_brief(other_user)
     }
 
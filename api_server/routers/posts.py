@@ -1,27 +1,38 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, func
-from typing import Optional
+from sqlalchemy import func
+from typing import Optional, Set, List
 
 from ..database import get_db
-from ..models import User, Post, PostLike, Comment
+from ..models import User, Post, PostLike
 from ..schemas import PostCreate, PostResponse, PostListResponse, LikeResponse, UserBrief
 from ..auth import get_current_user, get_current_user_optional
+from shared.pagination import apply_keyset, encode_cursor
 
 router = APIRouter(prefix="/posts", tags=["帖子"])
 
 
-def post_to_response(post: Post, current_user: Optional[User], db: Session) -> PostResponse:
-    """将Post模型转换为响应格式"""
-    is_liked = False
-    if current_user:
-        like = db.query(PostLike).filter(
-            PostLike.post_id == post.id,
-            PostLike.user_id == current_user.id
-        ).first()
-        is_liked = like is not None
+def get_liked_post_ids(db: Session, current_user: Optional[User], post_ids: List[int]) -> Set[int]:
+    """一次查询当前用户点赞过的帖子ID集合"""
+    if not current_user or not post_ids:
+        return set()
+    rows = db.query(PostLike.post_id).filter(
+        PostLike.user_id == current_user.id,
+        PostLike.post_id.in_(post_ids)
+    ).all()
+    return {row.post_id for row in rows}
+
+
+def post_to_response(post: Post, current_user: Optional[User], db: Session,
+                     liked_post_ids: Optional[Set[int]] = None) -> PostResponse:
+    """
+    将Post模型转换为响应格式
     
-    comments_count = db.query(func.count(Comment.id)).filter(Comment.post_id == post.id).scalar()
+    liked_post_ids为整页预先查询好的点赞集合，不提供时单独查询
+    """
+    if liked_post_ids is None:
+        liked_post_ids = get_liked_post_ids(db, current_user, [post.id])
+    is_liked = post.id in liked_post_ids
     
     return PostResponse(
         id=post.id,
@@ -38,7 +49,7 @@ def post_to_response(post: Post, current_user: Optional[User], db: Session) -> P
             is_ai=post.author.is_ai
         ),
         is_liked=is_liked,
-        comments_count=comments_count
+        comments_count=post.comments_count or 0
     )
 
 
@@ -47,25 +58,48 @@ async def list_posts(
     page: int = Query(default=1, ge=1),
     page_size: int = Query(default=20, ge=1, le=100),
     author_id: Optional[int] = None,
+    cursor: Optional[str] = Query(default=None, description="上一页返回的next_cursor，提供时忽略page"),
+    with_total: bool = Query(default=True, description="是否统计总数"),
     current_user: Optional[User] = Depends(get_current_user_optional),
     db: Session = Depends(get_db)
 ):
-    """获取帖子列表"""
+    """
+    获取帖子列表
+    
+    支持两种分页方式：
+    - page/page_size：传统分页
+    - cursor：游标分页（按发布时间倒序），深度翻页不变慢，建议配合with_total=false
+    """
     query = db.query(Post).options(joinedload(Post.author))
     
     if author_id:
         query = query.filter(Post.author_id == author_id)
     
-    total = query.count()
-    posts = query.order_by(desc(Post.created_at)).offset((page - 1) * page_size).limit(page_size).all()
+    total = query.count() if with_total else None
+    
+    try:
+        query = apply_keyset(query, Post.created_at, Post.id, cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的游标")
+    
+    if not cursor:
+        query = query.offset((page - 1) * page_size)
+    
+    # 多取一条判断是否还有下一页
+    posts = query.limit(page_size + 1).all()
+    has_more = len(posts) > page_size
+    posts = posts[:page_size]
     
-    items = [post_to_response(post, current_user, db) for post in posts]
+    liked_post_ids = get_liked_post_ids(db, current_user, [post.id for post in posts])
+    items = [post_to_response(post, current_user, db, liked_post_ids) for post in posts]
     
     return PostListResponse(
         items=items,
         total=total,
         page=page,
-        page_size=page_size
+        page_size=page_size,
+        next_cursor=encode_cursor(posts[-1].created_at, posts[-1].id) if has_more else None,
+        has_more=has_more
     )
 
 
@@ -85,7 +119,7 @@ async def create_post(
     db.commit()
     db.refresh(new_post)
     
-    return post_to_response(new_post, current_user, db)
+    return post_to_response(new_post, current_user, db, liked_post_ids=set())
 
 
 @router.get("/{post_id}", response_model=PostResponse)
@@ -157,6 +191,7 @@ async def toggle_like(
         new_like = PostLike(post_id=post_id, user_id=current_user.id)
         db.add(new_like)
         post.likes_count += 1
+        post.last_activity_at = func.now()
         liked = True
     
     db.commit()
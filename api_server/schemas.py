@@ -91,9 +91,11 @@ class PostResponse(PostBase):
 
 class PostListResponse(BaseModel):
     items: List[PostResponse]
-    total: int
+    total: Optional[int] = None  # with_total=false时不统计
     page: int
     page_size: int
+    next_cursor: Optional[str] = None  # 下一页游标，没有更多时为空
+    has_more: bool = False
 
 
 # ============ Comment Schemas ============
@@ -119,7 +121,9 @@ class CommentResponse(CommentBase):
 
 class CommentListResponse(BaseModel):
     items: List[CommentResponse]
-    total: int
+    total: Optional[int] = None  # with_total=false时不统计
+    next_cursor: Optional[str] = None  # 下一页游标，没有更多时为空
+    has_more: bool = False
 
 
 # ============ Like Schemas ============
@@ -0,0 +1,147 @@
+"""
+事件队列基准测试
+
+按 GameEngine.schedule_event 的方式（先 check_conflict 再 add）为大量角色调度事件，
+然后执行按角色查询、重新调度和全部取出，对比：
+- 区间索引：当前 EventQueue（每个角色的事件按时间区间索引）
+- 全量扫描：改用区间索引之前的做法（冲突检测、按角色查询都遍历整个堆）
+
+全量扫描的调度是平方复杂度，事件数超过 --baseline-limit 时跳过
+
+用法：
+    python benchmarks/event_queue.py
+    python benchmarks/event_queue.py --events 10000 100000 --characters 1000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core_engine.event_system.event_queue import EventQueue
+from core_engine.event_system.events import GameEvent, EventType, EventStatus
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class LinearScanEventQueue(EventQueue):
+    """原实现：冲突检测和按角色查询遍历整个堆"""
+
+    def check_conflict(self, new_event: GameEvent) -> List[GameEvent]:
+        conflicts = []
+        new_start = new_event.scheduled_time
+        new_end = new_event.end_time
+        for pe in self._heap:
+            event = pe.event
+            if event.character_id != new_event.character_id or event is new_event:
+                continue
+            if event.status != EventStatus.PENDING:
+                continue
+            if not (new_end <= event.scheduled_time or new_start >= event.end_time):
+                conflicts.append(event)
+        return conflicts
+
+    def get_character_events(self, character_id: int,
+                             start_time: Optional[int] = None,
+                             end_time: Optional[int] = None) -> List[GameEvent]:
+        events = []
+        for pe in self._heap:
+            event = pe.event
+            if event.character_id != character_id or event.status != EventStatus.PENDING:
+                continue
+            if start_time is not None and event.scheduled_time < start_time:
+                continue
+            if end_time is not None and event.scheduled_time >= end_time:
+                continue
+            events.append(event)
+        return sorted(events, key=lambda e: (e.scheduled_time, e.priority.value))
+
+
+def make_events(n: int, characters: int, rng: random.Random) -> List[GameEvent]:
+    """每个角色的事件均匀分布在若干天内，时长15~120分钟（有一部分会冲突）"""
+    days = max(1, n // (characters * 20))
+    return [
+        GameEvent(
+            event_type=EventType.WORK,
+            character_id=rng.randint(1, characters),
+            scheduled_time=rng.randint(0, days * MINUTES_PER_DAY),
+            duration=rng.choice([15, 30, 60, 120]),
+        )
+        for _ in range(n)
+    ]
+
+
+def run(queue_cls, events: List[GameEvent], characters: int, rng: random.Random) -> Dict[str, float]:
+    """返回各阶段耗时（毫秒）"""
+    queue = queue_cls()
+    results = {}
+
+    begin = time.perf_counter()
+    scheduled = []
+    for event in events:
+        if not queue.check_conflict(event):
+            queue.add(event)
+            scheduled.append(event)
+    results['schedule'] = (time.perf_counter() - begin) * 1000
+    results['scheduled'] = len(scheduled)
+
+    horizon = max(e.scheduled_time for e in events)
+    queries = [(rng.randint(1, characters), rng.randint(0, horizon)) for _ in range(1000)]
+    begin = time.perf_counter()
+    for character_id, start in queries:
+        queue.get_character_events(character_id, start, start + MINUTES_PER_DAY)
+    results['character_events x1000'] = (time.perf_counter() - begin) * 1000
+
+    targets = rng.sample(scheduled, min(1000, len(scheduled)))
+    begin = time.perf_counter()
+    for event in targets:
+        queue.reschedule(event.id, rng.randint(0, horizon))
+    results['reschedule x1000'] = (time.perf_counter() - begin) * 1000
+
+    begin = time.perf_counter()
+    while queue.pop():
+        pass
+    results['pop all'] = (time.perf_counter() - begin) * 1000
+    return results
+
+
+def clone(events: List[GameEvent]) -> List[GameEvent]:
+    return [
+        GameEvent(event_type=e.event_type, character_id=e.character_id,
+                  scheduled_time=e.scheduled_time, duration=e.duration)
+        for e in events
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="事件队列基准测试")
+    parser.add_argument("--events", type=int, nargs="+", default=[10000, 100000], help="调度的事件数")
+    parser.add_argument("--characters", type=int, default=1000, help="角色数")
+    parser.add_argument("--baseline-limit", type=int, default=20000, help="全量扫描最多测试的事件数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    for n in args.events:
+        events = make_events(n, args.characters, random.Random(args.seed))
+        indexed = run(EventQueue, clone(events), args.characters, random.Random(args.seed))
+        baseline = None
+        if n <= args.baseline_limit:
+            baseline = run(LinearScanEventQueue, clone(events), args.characters, random.Random(args.seed))
+
+        print(f"\n===== {n} 个事件，{args.characters} 个角色"
+              f"（无冲突可调度 {indexed['scheduled']} 个） =====")
+        print(f"{'阶段':<26}{'全量扫描 ms':>14}{'区间索引 ms':>14}{'加速':>10}")
+        for key in ('schedule', 'character_events x1000', 'reschedule x1000', 'pop all'):
+            if baseline:
+                speedup = baseline[key] / indexed[key] if indexed[key] else float("inf")
+                print(f"{key:<26}{baseline[key]:>14.1f}{indexed[key]:>14.1f}{speedup:>9.1f}x")
+            else:
+                print(f"{key:<26}{'(跳过)':>14}{indexed[key]:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+角色空间索引基准测试
+
+在保持角色密度不变（地图面积随人数增长）的情况下，对比：
+- 全量扫描：改用网格索引之前 World.get_nearby_characters / check_encounter 的做法
+- 网格索引：World 通过 SpatialGrid 查询
+
+查询类型对应模拟中的实际调用：
+- 感知：get_nearby_characters(x, y, 30)
+- 相遇：check_encounter(id, 5)
+- k近邻：get_nearest_characters(x, y, 5)
+
+用法：
+    python benchmarks/spatial_index.py
+    python benchmarks/spatial_index.py --sizes 1000 10000 --queries 2000
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core_engine.environment.world import World, WorldConfig
+
+
+# 原实现中每个查询遍历所有角色
+def brute_nearby(positions: Dict[int, tuple], x: float, y: float, radius: float) -> List[int]:
+    nearby = []
+    for char_id, (px, py) in positions.items():
+        if ((px - x) ** 2 + (py - y) ** 2) ** 0.5 <= radius:
+            nearby.append(char_id)
+    return nearby
+
+
+def brute_encounter(positions: Dict[int, tuple], character_id: int, radius: float) -> List[int]:
+    x, y = positions[character_id]
+    return [c for c in brute_nearby(positions, x, y, radius) if c != character_id]
+
+
+def brute_nearest(positions: Dict[int, tuple], x: float, y: float, k: int) -> List[int]:
+    dists = sorted(
+        (((px - x) ** 2 + (py - y) ** 2) ** 0.5, char_id)
+        for char_id, (px, py) in positions.items()
+    )
+    return [char_id for _, char_id in dists[:k]]
+
+
+def build_world(n: int, rng: random.Random):
+    """默认地图500x500容纳约1000人，人数更多时按面积等比放大"""
+    side = 500.0 * math.sqrt(n / 1000)
+    world = World(WorldConfig(map_width=side, map_height=side))
+    positions = {}
+    for char_id in range(1, n + 1):
+        x, y = rng.uniform(0, side), rng.uniform(0, side)
+        world.set_character_position(char_id, x, y)
+        positions[char_id] = (x, y)
+    return world, positions, side
+
+
+def timeit(fn: Callable[[int], object], count: int) -> float:
+    """返回每次调用的平均耗时（微秒）"""
+    begin = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return (time.perf_counter() - begin) * 1e6 / count
+
+
+def run(n: int, queries: int, seed: int):
+    rng = random.Random(seed)
+
+    begin = time.perf_counter()
+    world, positions, side = build_world(n, rng)
+    build_ms = (time.perf_counter() - begin) * 1000
+
+    points = [(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(queries)]
+    ids = [rng.randint(1, n) for _ in range(queries)]
+
+    # 结果一致性检查
+    for i in range(min(queries, 200)):
+        x, y = points[i]
+        assert sorted(world.get_nearby_characters(x, y, 30.0)) == sorted(brute_nearby(positions, x, y, 30.0))
+        assert sorted(world.check_encounter(ids[i], 5.0)) == sorted(brute_encounter(positions, ids[i], 5.0))
+        grid_knn = [d for _, d in world.get_nearest_characters(x, y, 5)]
+        brute_knn = [math.dist(points[i], positions[c]) for c in brute_nearest(positions, x, y, 5)]
+        assert all(abs(a - b) < 1e-9 for a, b in zip(grid_knn, brute_knn))
+
+    # 全量扫描很慢，人数多时减少次数
+    brute_queries = max(20, min(queries, 2_000_000 // n))
+
+    cases = [
+        ("感知 r=30",
+         lambda i: brute_nearby(positions, *points[i], 30.0),
+         lambda i: world.get_nearby_characters(*points[i], 30.0)),
+        ("相遇 r=5",
+         lambda i: brute_encounter(positions, ids[i], 5.0),
+         lambda i: world.check_encounter(ids[i], 5.0)),
+        ("k近邻 k=5",
+         lambda i: brute_nearest(positions, *points[i], 5),
+         lambda i: world.get_nearest_characters(*points[i], 5)),
+    ]
+
+    print(f"\n===== {n} 个角色（地图 {side:.0f}x{side:.0f}，建索引 {build_ms:.1f} ms） =====")
+    print(f"{'查询':<14}{'全量扫描 µs':>14}{'网格索引 µs':>14}{'加速':>10}{'每轮全员 ms':>14}")
+    for name, brute_fn, grid_fn in cases:
+        brute_us = timeit(brute_fn, brute_queries)
+        grid_us = timeit(grid_fn, queries)
+        # 每个角色各查询一次（模拟一轮全员感知/相遇检测）的耗时
+        round_ms = grid_us * n / 1000
+        print(f"{name:<14}{brute_us:>14.1f}{grid_us:>14.1f}{brute_us / grid_us:>9.1f}x{round_ms:>14.1f}")
+
+    # 位置更新开销
+    moves = [(rng.randint(1, n), rng.uniform(0, side), rng.uniform(0, side)) for _ in range(queries)]
+    update_us = timeit(lambda i: world.set_character_position(*moves[i]), queries)
+    print(f"{'位置更新':<14}{'-':>14}{update_us:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="角色空间索引基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="角色数量")
+    parser.add_argument("--queries", type=int, default=2000, help="每种查询的执行次数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        run(n, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+事件队列后端基准测试：二叉堆 vs 分层时间轮
+
+两种后端都通过 create_event_queue 创建，测试阶段：
+- add: 加入N个事件（默认大部分落在未来24小时内，--horizon-days 控制时间跨度）
+- reschedule x10%: 随机改期十分之一的事件
+- cancel x10%: 随机取消十分之一的事件
+- pop all: 逐个取出剩余事件
+- hold: 稳态模拟，队列保持N个事件，每个游戏分钟 pop_due 取出到期事件，
+        每取出一个就在未来1~24小时内补一个（引擎运行时的典型负载）
+
+用法：
+    python benchmarks/timing_wheel.py
+    python benchmarks/timing_wheel.py --events 10000 100000 --horizon-days 1
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core_engine.event_system.event_queue import create_event_queue
+from core_engine.event_system.events import GameEvent, EventType
+
+MINUTES_PER_DAY = 24 * 60
+BACKENDS = ('heap', 'timing_wheel')
+
+
+def make_event(character_id: int, scheduled_time: int) -> GameEvent:
+    return GameEvent(event_type=EventType.WORK, character_id=character_id,
+                     scheduled_time=scheduled_time, duration=15)
+
+
+def run(backend: str, times: List[int], characters: int, hold_minutes: int,
+        seed: int) -> Dict[str, float]:
+    """返回各阶段耗时（毫秒）"""
+    rng = random.Random(seed)
+    results = {}
+
+    queue = create_event_queue(backend)
+    events = [make_event(rng.randint(1, characters), t) for t in times]
+    begin = time.perf_counter()
+    for event in events:
+        queue.add(event)
+    results['add'] = (time.perf_counter() - begin) * 1000
+
+    horizon = max(times)
+    targets = rng.sample(events, len(events) // 10)
+    begin = time.perf_counter()
+    for event in targets:
+        queue.reschedule(event.id, rng.randint(0, horizon))
+    results['reschedule x10%'] = (time.perf_counter() - begin) * 1000
+
+    targets = rng.sample(events, len(events) // 10)
+    begin = time.perf_counter()
+    for event in targets:
+        queue.cancel(event.id)
+    results['cancel x10%'] = (time.perf_counter() - begin) * 1000
+
+    begin = time.perf_counter()
+    while queue.pop():
+        pass
+    results['pop all'] = (time.perf_counter() - begin) * 1000
+
+    # 稳态：队列中始终保持约N个未来24小时内的事件
+    queue = create_event_queue(backend)
+    for t in times:
+        queue.add(make_event(rng.randint(1, characters), t % MINUTES_PER_DAY))
+    processed = 0
+    begin = time.perf_counter()
+    for now in range(hold_minutes):
+        for event in queue.pop_due(now):
+            queue.add(make_event(event.character_id, now + rng.randint(60, MINUTES_PER_DAY)))
+            processed += 1
+    results['hold'] = (time.perf_counter() - begin) * 1000
+    results['hold_events'] = processed
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="事件队列后端基准测试")
+    parser.add_argument("--events", type=int, nargs="+", default=[10000, 100000], help="事件数")
+    parser.add_argument("--characters", type=int, default=1000, help="角色数")
+    parser.add_argument("--horizon-days", type=float, default=1.0, help="事件分布的时间跨度（天）")
+    parser.add_argument("--hold-minutes", type=int, default=3 * MINUTES_PER_DAY, help="稳态模拟的游戏分钟数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    for n in args.events:
+        rng = random.Random(args.seed)
+        span = max(1, int(args.horizon_days * MINUTES_PER_DAY))
+        times = [rng.randint(0, span) for _ in range(n)]
+        results = {backend: run(backend, times, args.characters, args.hold_minutes, args.seed)
+                   for backend in BACKENDS}
+        heap, wheel = results['heap'], results['timing_wheel']
+
+        print(f"\n===== {n} 个事件，跨度 {args.horizon_days} 天，"
+              f"稳态 {args.hold_minutes} 分钟处理 {heap['hold_events']} 个事件 =====")
+        print(f"{'阶段':<20}{'二叉堆 ms':>12}{'时间轮 ms':>12}{'加速':>10}")
+        for key in ('add', 'reschedule x10%', 'cancel x10%', 'pop all', 'hold'):
+            speedup = heap[key] / wheel[key] if wheel[key] else float("inf")
+            print(f"{key:<20}{heap[key]:>12.1f}{wheel[key]:>12.1f}{speedup:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
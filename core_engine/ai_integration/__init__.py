@@ -5,5 +5,14 @@ AI集成模块
 """
 
 from .llm_client import LLMClient, LLMConfig
+from .batch_dispatcher import BatchDispatcher, BatchConfig
+from .request_scheduler import RequestScheduler, SchedulerConfig, RequestPriority
+from .response_cache import ResponseCache
+from .json_stream import IncrementalJsonParser
 
-__all__ = ['LLMClient', 'LLMConfig']
+__all__ = [
+    'LLMClient', 'LLMConfig',
+    'BatchDispatcher', 'BatchConfig',
+    'RequestScheduler', 'SchedulerConfig', 'RequestPriority',
+    'ResponseCache', 'IncrementalJsonParser',
+]
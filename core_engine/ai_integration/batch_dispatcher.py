@@ -0,0 +1,273 @@
+"""
+LLM批量调度模块
+
+将同一时刻并发发起的决策请求在一个短时间窗口内收集起来，
+合并为一个多角色请求发往LLM服务，再把结果按角色拆分返回给各个调用方。
+
+说明：
+- OpenAI兼容的 /chat/completions 接口一次只接受一组消息，
+  因此一批请求被拼成一条提示词：各角色系统提示词的公共前缀（准则、共同记忆）只出现一次，
+  其余部分按角色分节，要求模型返回 {"decisions": [...]}，每项带 character_id
+- 一批只占用一个推理槽位和一次请求开销，代价是输出更长
+- 缺少或无法解析的角色结果、没有角色ID的请求、单独成批的请求都退回单独的 generate_json 调用
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Set
+
+from .llm_client import LLMClient, get_llm_client
+from .request_scheduler import RequestPriority
+
+
+@dataclass
+class BatchConfig:
+    """批量调度配置"""
+    # 收集窗口（毫秒）：第一个请求到达后等待多久再发送整批
+    window_ms: float = 20.0
+
+    # 单批最大请求数，达到后立即发送（受模型上下文长度限制）
+    max_batch_size: int = 8
+
+    # 每个角色结果的token预算，整批预算为其乘以批大小
+    tokens_per_request: int = 256
+
+
+@dataclass
+class _PendingRequest:
+    """等待发送的请求"""
+    system_prompt: str
+    user_prompt: str
+    temperature: float
+    priority: RequestPriority
+    character_id: Optional[int]
+    future: asyncio.Future
+
+
+BATCH_SYSTEM_PROMPT = """你需要同时为多个角色各自做一次决策，每个角色彼此独立。
+下面先给出所有角色共同的背景，每个角色的设定和当前情况在【角色ID: N】一节中给出。
+请站在每个角色自己的立场，按该角色一节中要求的JSON格式给出决策。"""
+
+BATCH_REPLY_FORMAT = """
+请只用一个JSON对象回复，为上面每个角色各给出一项，字段与各角色要求的格式相同，并加上character_id：
+{"decisions": [{"character_id": 角色ID, ...该角色的决策字段}, ...]}"""
+
+
+def _shared_prefix(prompts: List[str]) -> str:
+    """各系统提示词的公共前缀（截断到最后一个完整段落）"""
+    prefix = os.path.commonprefix(prompts)
+    cut = prefix.rfind("\n\n")
+    return prefix[:cut] if cut > 0 else ""
+
+
+class BatchDispatcher:
+    """
+    LLM批量调度器
+
+    使用方式与 LLMClient.generate_json 相同：
+        dispatcher = BatchDispatcher()
+        result = await dispatcher.generate_json(system_prompt, user_prompt, temperature=0.6,
+                                                character_id=agent_id)
+
+    多个协程在同一窗口内调用时，相同温度的请求会被合并为一个多角色请求发送
+    """
+
+    def __init__(self, llm_client: Optional[LLMClient] = None,
+                 config: Optional[BatchConfig] = None):
+        self._llm = llm_client or get_llm_client()
+        self.config = config or BatchConfig()
+
+        self._pending: List[_PendingRequest] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # 正在发送的批次任务（事件循环只保留弱引用，需持有引用防止任务被回收）
+        self._dispatch_tasks: Set[asyncio.Task] = set()
+
+        # 统计
+        self._batches_sent = 0
+        self._requests_received = 0
+        self._requests_batched = 0
+        self._fallbacks = 0
+        self._max_batch_size_seen = 0
+
+    async def generate_json(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.3,
+        priority: RequestPriority = RequestPriority.DECISION,
+        character_id: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        提交一个JSON生成请求，等待所在批次完成后返回结果
+
+        Returns:
+            解析后的JSON字典，失败返回None
+        """
+        loop = asyncio.get_running_loop()
+        request = _PendingRequest(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            temperature=temperature,
+            priority=priority,
+            character_id=character_id,
+            future=loop.create_future()
+        )
+        self._pending.append(request)
+        self._requests_received += 1
+
+        if len(self._pending) >= self.config.max_batch_size:
+            # 批次已满，立即发送
+            self._start_flush(delay=0)
+        elif self._flush_task is None:
+            # 本批第一个请求，启动窗口计时
+            self._start_flush(delay=self.config.window_ms / 1000.0)
+
+        return await request.future
+
+    def _start_flush(self, delay: float):
+        """取出当前批次并安排发送"""
+        if self._flush_task is not None and delay > 0:
+            return
+
+        if delay <= 0:
+            batch = self._pending
+            self._pending = []
+            if self._flush_task is not None:
+                self._flush_task.cancel()
+                self._flush_task = None
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._dispatch_tasks.add(task)
+            task.add_done_callback(self._dispatch_tasks.discard)
+        else:
+            self._flush_task = asyncio.ensure_future(self._flush_after(delay))
+
+    async def _flush_after(self, delay: float):
+        """窗口结束后发送当前批次"""
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+
+        batch = self._pending
+        self._pending = []
+        self._flush_task = None
+        await self._dispatch(batch)
+
+    async def _dispatch(self, batch: List[_PendingRequest]):
+        """发送一批请求并把结果分发回各个调用方"""
+        if not batch:
+            return
+
+        self._max_batch_size_seen = max(self._max_batch_size_seen, len(batch))
+
+        # 只有带角色ID、温度相同的请求才能合并（结果按角色ID拆分）
+        groups: Dict[float, List[_PendingRequest]] = {}
+        singles: List[_PendingRequest] = []
+        for request in batch:
+            if request.character_id is None:
+                singles.append(request)
+            else:
+                groups.setdefault(request.temperature, []).append(request)
+
+        sends = []
+        for requests in groups.values():
+            if len(requests) == 1:
+                singles.extend(requests)
+            else:
+                sends.append(self._send_batch(requests))
+        sends.extend(self._send_single(request) for request in singles)
+
+        await asyncio.gather(*sends)
+
+    async def _send_batch(self, requests: List[_PendingRequest]):
+        """把一组请求合并为一个多角色请求，缺少结果的角色单独重发"""
+        self._batches_sent += 1
+        self._requests_batched += len(requests)
+
+        system_prompts = [r.system_prompt for r in requests]
+        shared = _shared_prefix(system_prompts)
+
+        sections = []
+        for request in requests:
+            own = request.system_prompt[len(shared):].strip()
+            sections.append(
+                f"【角色ID: {request.character_id}】\n{own}\n\n{request.user_prompt.strip()}"
+            )
+        system_prompt = BATCH_SYSTEM_PROMPT + ("\n\n" + shared if shared else "")
+        user_prompt = "\n\n".join(sections) + "\n" + BATCH_REPLY_FORMAT
+
+        try:
+            response = await self._llm.generate_json(
+                system_prompt,
+                user_prompt,
+                temperature=requests[0].temperature,
+                priority=min(r.priority for r in requests),
+                max_tokens=self.config.tokens_per_request * len(requests)
+            )
+        except Exception as e:
+            print(f"Batched LLM request failed: {e}")
+            response = None
+
+        results: Dict[int, Dict[str, Any]] = {}
+        decisions = response.get('decisions') if isinstance(response, dict) else None
+        for item in decisions if isinstance(decisions, list) else ():
+            if not isinstance(item, dict):
+                continue
+            try:
+                character_id = int(item.get('character_id'))
+            except (TypeError, ValueError):
+                continue
+            results.setdefault(character_id, item)
+
+        retries = []
+        for request in requests:
+            result = results.get(request.character_id)
+            if result is None:
+                retries.append(self._send_single(request, fallback=True))
+            elif not request.future.done():
+                request.future.set_result(result)
+        if retries:
+            await asyncio.gather(*retries)
+
+    async def _send_single(self, request: _PendingRequest, fallback: bool = False):
+        """单独发送一个请求"""
+        if fallback:
+            self._fallbacks += 1
+        try:
+            result = await self._llm.generate_json(
+                request.system_prompt,
+                request.user_prompt,
+                temperature=request.temperature,
+                priority=request.priority,
+                character_id=request.character_id
+            )
+        except Exception as e:
+            if not request.future.done():
+                request.future.set_exception(e)
+            return
+        if not request.future.done():
+            request.future.set_result(result)
+
+    async def flush(self):
+        """立即发送当前未满的批次"""
+        batch = self._pending
+        self._pending = []
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self._dispatch(batch)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度统计"""
+        return {
+            'batches_sent': self._batches_sent,
+            'requests_received': self._requests_received,
+            'requests_batched': self._requests_batched,
+            'fallbacks': self._fallbacks,
+            'avg_batch_size': (
+                self._requests_batched / self._batches_sent if self._batches_sent else 0.0
+            ),
+            'max_batch_size': self._max_batch_size_seen,
+            'pending': len(self._pending),
+        }
@@ -0,0 +1,88 @@
+"""
+流式JSON解析模块
+
+逐段接收LLM的流式输出，一旦顶层JSON对象（或数组）完整闭合就返回其文本，
+调用方可以立即关闭HTTP流，不必等模型把后面的废话说完
+"""
+
+from typing import Optional
+
+
+class IncrementalJsonParser:
+    """
+    增量JSON边界解析器
+
+    只追踪括号深度和字符串状态，不做完整的JSON解析；
+    顶层结构闭合后由调用方用json.loads解析返回的文本
+
+    使用方式：
+        parser = IncrementalJsonParser()
+        async for chunk in stream:
+            text = parser.feed(chunk)
+            if text is not None:
+                break
+    """
+
+    def __init__(self):
+        self._buffer: list = []
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._result: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        """顶层JSON是否已闭合"""
+        return self._result is not None
+
+    @property
+    def started(self) -> bool:
+        """是否已读到顶层JSON的起始括号"""
+        return self._started
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        输入一段文本
+
+        Returns:
+            顶层JSON闭合时返回完整的JSON文本，否则返回None
+        """
+        if self._result is not None:
+            return self._result
+
+        for ch in chunk:
+            if not self._started:
+                # 跳过JSON之前的内容（如 ```json 代码块标记）
+                if ch in '{[':
+                    self._started = True
+                    self._depth = 1
+                    self._buffer.append(ch)
+                continue
+
+            self._buffer.append(ch)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._result = ''.join(self._buffer)
+                    return self._result
+
+        return None
+
+    def get_partial(self) -> str:
+        """获取目前已收集的JSON文本（可能不完整）"""
+        return ''.join(self._buffer)
@@ -6,10 +6,23 @@ LLM客户端模块
 
 import asyncio
 import json
-from dataclasses import dataclass, field
-from typing import Optional, Dict, Any, List, AsyncGenerator
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Dict, Any, List, AsyncGenerator, Tuple, Union
 import aiohttp
 
+from .request_scheduler import (
+    RequestScheduler, SchedulerConfig, RequestPriority, SchedulerOverloaded
+)
+from .response_cache import ResponseCache
+from .json_stream import IncrementalJsonParser
+
+
+# generate_json的返回值：顶层为对象或数组
+JsonValue = Union[Dict[str, Any], List[Any]]
+
+# 要求模型只输出JSON的附加指令
+JSON_INSTRUCTION = "\n\n请只输出JSON格式的内容，不要有其他文字。"
+
 
 @dataclass
 class LLMConfig:
@@ -21,9 +34,26 @@ class LLMConfig:
     top_p: float = 0.9
     timeout: int = 120  # 超时时间（秒）
     
-    # 重试配置
+    # 重试配置（retry_delay为自适应退避的基础时长）
     max_retries: int = 3
     retry_delay: float = 1.0
+    
+    # 并发调度配置
+    max_concurrency: int = 4      # 最大在途请求数
+    max_queue_size: int = 256     # 最大排队请求数
+    
+    # 响应缓存配置（cache_path为None时不启用）
+    cache_path: Optional[str] = None
+    cache_max_entries: int = 10000
+    cache_ttl: Optional[float] = None  # 有效期（秒），None表示不过期
+    # 只缓存温度不高于该值的调用，默认0.3覆盖generate_json默认温度的确定性调用；
+    # 角色的决策、对话等调用温度为0.5~0.9，只有开启cache_replay才会缓存
+    cache_max_temperature: float = 0.3
+    cache_replay: bool = False  # 重放模式：不论温度缓存所有调用，重放同一场景时不再访问推理服务
+    
+    # JSON生成配置
+    stream_json: bool = False                 # 流式生成JSON，闭合后立即断流
+    json_token_budget: Optional[int] = None   # JSON调用的默认token预算，None表示使用max_tokens
 
 
 @dataclass
@@ -62,6 +92,42 @@ class LLMClient:
         self.config = config or LLMConfig()
         self._session: Optional[aiohttp.ClientSession] = None
         self._connected = False
+        self.scheduler = RequestScheduler(SchedulerConfig(
+            max_in_flight=self.config.max_concurrency,
+            max_queue_size=self.config.max_queue_size,
+            backoff_base=self.config.retry_delay
+        ))
+        self.cache: Optional[ResponseCache] = self._create_cache(self.config)
+    
+    @staticmethod
+    def _create_cache(config: LLMConfig) -> Optional[ResponseCache]:
+        """按配置创建响应缓存"""
+        if not config.cache_path:
+            return None
+        return ResponseCache(
+            config.cache_path,
+            max_entries=config.cache_max_entries,
+            ttl=config.cache_ttl,
+            max_temperature=config.cache_max_temperature,
+            replay=config.cache_replay
+        )
+    
+    def set_config(self, config: LLMConfig):
+        """更新配置（同步更新调度器的并发限制和响应缓存）"""
+        old_cache_path = self.config.cache_path
+        self.config = config
+        self.scheduler.reconfigure(
+            config.max_concurrency,
+            max_queue_size=config.max_queue_size,
+            backoff_base=config.retry_delay
+        )
+        if config.cache_path != old_cache_path:
+            if self.cache:
+                self.cache.close()
+            self.cache = self._create_cache(config)
+        elif self.cache:
+            self.cache.max_temperature = config.cache_max_temperature
+            self.cache.replay = config.cache_replay
     
     async def _get_session(self) -> aiohttp.ClientSession:
         """获取或创建HTTP会话"""
@@ -108,24 +174,70 @@ class LLMClient:
         messages: List[Message],
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
-        stop: Optional[List[str]] = None
+        stop: Optional[List[str]] = None,
+        priority: RequestPriority = RequestPriority.DECISION,
+        character_id: Optional[int] = None
     ) -> LLMResponse:
         """
         发送聊天请求
         
+        请求经调度器排队发送；失败时由调度器统一退避后重试
+        
         Args:
             messages: 消息列表
             temperature: 温度参数（可选，覆盖默认值）
             max_tokens: 最大token数（可选，覆盖默认值）
             stop: 停止词列表
+            priority: 请求优先级
+            character_id: 发起请求的角色ID（用于同优先级内的公平排队）
             
         Returns:
             LLMResponse对象
         """
+        payload = self._build_payload(messages, temperature, max_tokens, stop)
+        
+        cache_key = None
+        if self.cache and self.cache.accepts(payload):
+            cache_key = self.cache.make_key(payload)
+            cached = await self.cache.get_async(cache_key)
+            if cached is not None:
+                return LLMResponse(**cached)
+        
+        for attempt in range(self.config.max_retries):
+            try:
+                await self.scheduler.acquire(priority, character_id)
+            except SchedulerOverloaded as e:
+                print(f"LLM request rejected: {e}")
+                break
+            
+            outcome: Optional[bool] = None
+            try:
+                result, outcome = await self._post_chat(payload, attempt)
+                if result is not None:
+                    if cache_key and result.success:
+                        await self.cache.put_async(cache_key, asdict(result))
+                    return result
+            finally:
+                self.scheduler.release(success=outcome)
+            
+            if outcome is None:
+                # 客户端错误，重试无意义
+                break
+        
+        return LLMResponse(content="", finish_reason="error")
+    
+    def _build_payload(
+        self,
+        messages: List[Message],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """构建请求体"""
         payload = {
             "model": self.config.model,
             "messages": [msg.to_dict() for msg in messages],
-            "temperature": temperature or self.config.temperature,
+            "temperature": temperature if temperature is not None else self.config.temperature,
             "max_tokens": max_tokens or self.config.max_tokens,
             "top_p": self.config.top_p,
         }
@@ -133,68 +245,86 @@ class LLMClient:
         if stop:
             payload["stop"] = stop
         
-        for attempt in range(self.config.max_retries):
-            try:
-                session = await self._get_session()
-                async with session.post(
-                    f"{self.config.base_url}/chat/completions",
-                    json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        choice = data.get('choices', [{}])[0]
-                        message = choice.get('message', {})
-                        usage = data.get('usage', {})
-                        
-                        return LLMResponse(
-                            content=message.get('content', ''),
-                            finish_reason=choice.get('finish_reason', 'stop'),
-                            prompt_tokens=usage.get('prompt_tokens', 0),
-                            completion_tokens=usage.get('completion_tokens', 0),
-                            total_tokens=usage.get('total_tokens', 0),
-                            model=data.get('model', self.config.model)
-                        )
-                    else:
-                        error_text = await response.text()
-                        print(f"LLM request failed (attempt {attempt + 1}): {response.status} - {error_text}")
-                        
-            except asyncio.TimeoutError:
-                print(f"LLM request timeout (attempt {attempt + 1})")
-            except Exception as e:
-                print(f"LLM request error (attempt {attempt + 1}): {e}")
-            
-            if attempt < self.config.max_retries - 1:
-                await asyncio.sleep(self.config.retry_delay)
+        return payload
+    
+    async def _post_chat(self, payload: Dict[str, Any],
+                         attempt: int) -> Tuple[Optional[LLMResponse], Optional[bool]]:
+        """
+        发送一次聊天请求
         
-        return LLMResponse(content="", finish_reason="error")
+        Returns:
+            (响应, 结果类型)，结果类型：True=成功，False=可重试的失败，None=不可重试的失败
+        """
+        try:
+            session = await self._get_session()
+            async with session.post(
+                f"{self.config.base_url}/chat/completions",
+                json=payload
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    
+                    choice = data.get('choices', [{}])[0]
+                    message = choice.get('message', {})
+                    usage = data.get('usage', {})
+                    
+                    return LLMResponse(
+                        content=message.get('content', ''),
+                        finish_reason=choice.get('finish_reason', 'stop'),
+                        prompt_tokens=usage.get('prompt_tokens', 0),
+                        completion_tokens=usage.get('completion_tokens', 0),
+                        total_tokens=usage.get('total_tokens', 0),
+                        model=data.get('model', self.config.model)
+                    ), True
+                
+                error_text = await response.text()
+                print(f"LLM request failed (attempt {attempt + 1}): {response.status} - {error_text}")
+                # 429和5xx说明服务端过载，需要退避重试
+                if response.status == 429 or response.status >= 500:
+                    return None, False
+                return None, None
+                    
+        except asyncio.TimeoutError:
+            print(f"LLM request timeout (attempt {attempt + 1})")
+        except aiohttp.ClientError as e:
+            print(f"LLM request error (attempt {attempt + 1}): {e}")
+        except Exception as e:
+            print(f"LLM request error (attempt {attempt + 1}): {e}")
+            return None, None
+        
+        return None, False
     
     async def chat_stream(
         self,
         messages: List[Message],
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
+        priority: RequestPriority = RequestPriority.DECISION,
+        character_id: Optional[int] = None
     ) -> AsyncGenerator[str, None]:
         """
-        流式聊天请求
+        流式聊天请求（整个流式过程占用一个调度槽位）
         
         Args:
             messages: 消息列表
             temperature: 温度参数
             max_tokens: 最大token数
+            priority: 请求优先级
+            character_id: 发起请求的角色ID
             
         Yields:
             响应文本片段
         """
-        payload = {
-            "model": self.config.model,
-            "messages": [msg.to_dict() for msg in messages],
-            "temperature": temperature or self.config.temperature,
-            "max_tokens": max_tokens or self.config.max_tokens,
-            "top_p": self.config.top_p,
-            "stream": True
-        }
+        payload = self._build_payload(messages, temperature, max_tokens)
+        payload["stream"] = True
         
+        try:
+            await self.scheduler.acquire(priority, character_id)
+        except SchedulerOverloaded as e:
+            print(f"LLM stream request rejected: {e}")
+            return
+        
+        outcome: Optional[bool] = None
         try:
             session = await self._get_session()
             async with session.post(
@@ -204,6 +334,8 @@ class LLMClient:
                 if response.status != 200:
                     error_text = await response.text()
                     print(f"LLM stream request failed: {response.status} - {error_text}")
+                    if response.status == 429 or response.status >= 500:
+                        outcome = False
                     return
                 
                 async for line in response.content:
@@ -221,16 +353,29 @@ class LLMClient:
                                 yield content
                         except json.JSONDecodeError:
                             continue
-                            
+                
+                outcome = True
+        
+        except GeneratorExit:
+            # 调用方提前关闭了流（如JSON已完整），视为成功
+            outcome = True
+            raise
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            outcome = False
+            print(f"LLM stream error: {e}")
         except Exception as e:
             print(f"LLM stream error: {e}")
+        finally:
+            self.scheduler.release(success=outcome)
     
     async def generate_with_system(
         self,
         system_prompt: str,
         user_prompt: str,
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        priority: RequestPriority = RequestPriority.DECISION,
+        character_id: Optional[int] = None
     ) -> LLMResponse:
         """
         使用系统提示词和用户输入生成响应
@@ -240,6 +385,8 @@ class LLMClient:
             user_prompt: 用户输入
             temperature: 温度参数
             max_tokens: 最大token数
+            priority: 请求优先级
+            character_id: 发起请求的角色ID
             
         Returns:
             LLMResponse对象
@@ -248,36 +395,153 @@ class LLMClient:
             Message(role="system", content=system_prompt),
             Message(role="user", content=user_prompt)
         ]
-        return await self.chat(messages, temperature, max_tokens)
+        return await self.chat(
+            messages, temperature, max_tokens,
+            priority=priority, character_id=character_id
+        )
     
     async def generate_json(
         self,
         system_prompt: str,
         user_prompt: str,
-        temperature: float = 0.3
-    ) -> Optional[Dict[str, Any]]:
+        temperature: float = 0.3,
+        priority: RequestPriority = RequestPriority.DECISION,
+        character_id: Optional[int] = None,
+        max_tokens: Optional[int] = None
+    ) -> Optional[JsonValue]:
         """
         生成JSON格式的响应
         
+        配置了stream_json时改用流式请求，JSON闭合后立即结束生成
+        
         Args:
             system_prompt: 系统提示词（应包含JSON格式要求）
             user_prompt: 用户输入
             temperature: 温度参数（较低以确保格式正确）
+            priority: 请求优先级
+            character_id: 发起请求的角色ID
+            max_tokens: 本次调用的token预算（默认使用json_token_budget）
             
         Returns:
-            解析后的JSON字典，失败返回None
+            解析后的JSON对象（或数组），失败返回None
         """
+        if self.config.stream_json:
+            return await self.generate_json_stream(
+                system_prompt, user_prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                priority=priority,
+                character_id=character_id
+            )
+        
+        return await self._generate_json_complete(
+            system_prompt, user_prompt, temperature, max_tokens, priority, character_id
+        )
+    
+    async def _generate_json_complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        priority: RequestPriority,
+        character_id: Optional[int]
+    ) -> Optional[JsonValue]:
+        """非流式生成JSON：等待完整响应后解析（经chat重试和退避）"""
         response = await self.generate_with_system(
-            system_prompt + "\n\n请只输出JSON格式的内容，不要有其他文字。",
+            system_prompt + JSON_INSTRUCTION,
             user_prompt,
-            temperature=temperature
+            temperature=temperature,
+            max_tokens=max_tokens or self.config.json_token_budget,
+            priority=priority,
+            character_id=character_id
         )
         
         if not response.success:
             return None
         
-        # 尝试解析JSON
-        content = response.content.strip()
+        return self._parse_json_content(response.content)
+    
+    async def generate_json_stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.3,
+        max_tokens: Optional[int] = None,
+        priority: RequestPriority = RequestPriority.DECISION,
+        character_id: Optional[int] = None
+    ) -> Optional[JsonValue]:
+        """
+        流式生成JSON：边接收边解析，顶层JSON闭合后立即关闭HTTP流
+        
+        小模型经常在JSON之后继续输出解释文字，提前断流可以缩短决策延迟，
+        并尽早释放推理服务的槽位。流式请求没有重试：流被拒绝、出错或
+        始终没有出现JSON时，退回带重试的非流式请求
+        
+        Args:
+            system_prompt: 系统提示词
+            user_prompt: 用户输入
+            temperature: 温度参数
+            max_tokens: 本次调用的token预算（默认使用json_token_budget）
+            priority: 请求优先级
+            character_id: 发起请求的角色ID
+            
+        Returns:
+            解析后的JSON对象（或数组），失败返回None
+        """
+        messages = [
+            Message(role="system", content=system_prompt + JSON_INSTRUCTION),
+            Message(role="user", content=user_prompt)
+        ]
+        budget = max_tokens or self.config.json_token_budget or self.config.max_tokens
+        
+        cache_key = None
+        payload = self._build_payload(messages, temperature, budget)
+        if self.cache and self.cache.accepts(payload):
+            cache_key = self.cache.make_key(payload)
+            cached = await self.cache.get_async(cache_key)
+            if cached is not None:
+                return self._parse_json_content(cached.get('content', ''))
+        
+        parser = IncrementalJsonParser()
+        stream = self.chat_stream(
+            messages,
+            temperature=temperature,
+            max_tokens=budget,
+            priority=priority,
+            character_id=character_id
+        )
+        try:
+            # token预算由服务端按max_tokens执行
+            async for chunk in stream:
+                if parser.feed(chunk) is not None:
+                    break
+        finally:
+            await stream.aclose()
+        
+        if not parser.started:
+            print("LLM JSON stream produced no JSON, retrying without streaming")
+            return await self._generate_json_complete(
+                system_prompt, user_prompt, temperature, budget, priority, character_id
+            )
+        
+        if not parser.complete:
+            if parser.started:
+                print(f"Incomplete JSON in stream: {parser.get_partial()[:200]}...")
+            return None
+        
+        content = parser.get_partial()
+        result = self._parse_json_content(content)
+        if result is not None and cache_key:
+            await self.cache.put_async(
+                cache_key, asdict(LLMResponse(content=content, model=self.config.model))
+            )
+        return result
+    
+    @staticmethod
+    def _parse_json_content(content: str) -> Optional[Any]:
+        """从LLM输出中提取并解析JSON"""
+        content = content.strip()
         
         # 尝试提取JSON块
         if "```json" in content:
@@ -311,7 +575,7 @@ def get_llm_client(config: Optional[LLMConfig] = None) -> LLMClient:
         _default_client = LLMClient(config)
     elif config:
         # 如果提供了新配置，更新客户端
-        _default_client.config = config
+        _default_client.set_config(config)
     
     return _default_client
 
@@ -0,0 +1,289 @@
+"""
+LLM请求调度模块
+
+在LLMClient与推理服务之间加一层准入控制：
+- 限制同时在途（in-flight）的请求数，避免本地推理服务过载
+- 按调用类型划分优先级：相遇对话 > 行动决策 > 动态互动 > 每日总结
+- 同一优先级内按角色轮转，避免某个角色的大量请求饿死其他角色
+- 请求失败时自适应退避：并发上限减半并暂停发送，成功后再逐步恢复
+- 提供队列深度、等待时间等统计指标
+"""
+
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Optional, Dict, Any, Deque
+
+
+class RequestPriority(IntEnum):
+    """请求优先级（数值越小越优先）"""
+    ENCOUNTER = 0   # 相遇对话（双方都在等待）
+    DECISION = 1    # 行动决策
+    FEED = 2        # 浏览动态、私信等社交互动
+    SUMMARY = 3     # 每日计划、总结等
+
+
+class SchedulerOverloaded(Exception):
+    """排队请求过多，新请求被拒绝"""
+    pass
+
+
+@dataclass
+class SchedulerConfig:
+    """调度配置"""
+    # 最大在途请求数
+    max_in_flight: int = 4
+
+    # 自适应调整时的最小在途请求数
+    min_in_flight: int = 1
+
+    # 最大排队数（超过后拒绝新请求）
+    max_queue_size: int = 256
+
+    # 退避基础时长与上限（秒）
+    backoff_base: float = 1.0
+    backoff_max: float = 30.0
+
+
+@dataclass
+class _Waiter:
+    """排队中的请求"""
+    future: asyncio.Future
+    priority: RequestPriority
+    character_id: Optional[int]
+    enqueued_at: float
+
+
+class RequestScheduler:
+    """
+    LLM请求调度器
+
+    使用方式：
+        await scheduler.acquire(RequestPriority.DECISION, character_id)
+        try:
+            ...  # 发送请求
+        finally:
+            scheduler.release(success=True)
+
+    或使用 async with scheduler.slot(priority, character_id)
+    """
+
+    def __init__(self, config: Optional[SchedulerConfig] = None):
+        self.config = config or SchedulerConfig()
+
+        # 当前自适应并发上限（浮点数，按加性增/乘性减调整）
+        self._limit: float = float(self.config.max_in_flight)
+        self._in_flight = 0
+
+        # priority -> (character_id -> 等待队列)，OrderedDict的顺序即轮转顺序
+        self._queues: Dict[RequestPriority, "OrderedDict[Optional[int], Deque[_Waiter]]"] = {
+            p: OrderedDict() for p in RequestPriority
+        }
+        self._queued = 0
+
+        # 退避状态
+        self._consecutive_failures = 0
+        self._backoff_until = 0.0
+        self._wakeup_handle: Optional[asyncio.TimerHandle] = None
+
+        # 统计
+        self._admitted: Dict[RequestPriority, int] = {p: 0 for p in RequestPriority}
+        self._total_wait: Dict[RequestPriority, float] = {p: 0.0 for p in RequestPriority}
+        self._max_wait: Dict[RequestPriority, float] = {p: 0.0 for p in RequestPriority}
+        self._rejected = 0
+        self._failures = 0
+        self._successes = 0
+
+    # ===== 配置 =====
+
+    def reconfigure(self, max_in_flight: int, max_queue_size: Optional[int] = None,
+                    backoff_base: Optional[float] = None):
+        """更新并发上限等配置"""
+        self.config.max_in_flight = max(1, max_in_flight)
+        if max_queue_size is not None:
+            self.config.max_queue_size = max_queue_size
+        if backoff_base is not None:
+            self.config.backoff_base = backoff_base
+        self._limit = min(self._limit, float(self.config.max_in_flight))
+        self._dispatch()
+
+    @property
+    def effective_limit(self) -> int:
+        """当前实际并发上限"""
+        return max(self.config.min_in_flight, int(self._limit))
+
+    # ===== 准入 =====
+
+    async def acquire(self, priority: RequestPriority = RequestPriority.DECISION,
+                      character_id: Optional[int] = None):
+        """
+        申请一个发送槽位，必要时排队等待
+
+        Raises:
+            SchedulerOverloaded: 排队数已达上限
+        """
+        now = time.monotonic()
+
+        if self._queued == 0 and self._can_admit(now):
+            self._in_flight += 1
+            self._record_wait(priority, 0.0)
+            return
+
+        if self._queued >= self.config.max_queue_size:
+            self._rejected += 1
+            raise SchedulerOverloaded(
+                f"LLM request queue is full ({self._queued} waiting)"
+            )
+
+        waiter = _Waiter(
+            future=asyncio.get_running_loop().create_future(),
+            priority=priority,
+            character_id=character_id,
+            enqueued_at=now
+        )
+        queue = self._queues[priority].setdefault(character_id, deque())
+        queue.append(waiter)
+        self._queued += 1
+
+        # 退避中需要定时唤醒
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 已分配槽位但调用方被取消，归还槽位
+                self.release(success=None)
+            raise
+
+    def release(self, success: Optional[bool] = True):
+        """
+        归还槽位
+
+        Args:
+            success: True=成功，False=可重试的失败（超时/服务端错误），
+                     None=与服务状态无关（如请求被取消、客户端错误）
+        """
+        self._in_flight = max(0, self._in_flight - 1)
+
+        if success is True:
+            self._successes += 1
+            self._consecutive_failures = 0
+            # 加性增
+            self._limit = min(
+                float(self.config.max_in_flight),
+                self._limit + 1.0 / max(self._limit, 1.0)
+            )
+        elif success is False:
+            self._failures += 1
+            self._consecutive_failures += 1
+            # 乘性减 + 指数退避（带抖动）
+            self._limit = max(float(self.config.min_in_flight), self._limit / 2)
+            delay = min(
+                self.config.backoff_max,
+                self.config.backoff_base * (2 ** (self._consecutive_failures - 1))
+            )
+            delay *= random.uniform(0.8, 1.2)
+            self._backoff_until = max(self._backoff_until, time.monotonic() + delay)
+
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: RequestPriority = RequestPriority.DECISION,
+                   character_id: Optional[int] = None):
+        """槽位上下文管理器（异常视为与服务状态无关）"""
+        await self.acquire(priority, character_id)
+        try:
+            yield
+        except BaseException:
+            self.release(success=None)
+            raise
+        else:
+            self.release(success=True)
+
+    # ===== 内部调度 =====
+
+    def _can_admit(self, now: float) -> bool:
+        return now >= self._backoff_until and self._in_flight < self.effective_limit
+
+    def _dispatch(self):
+        """把空闲槽位分配给排队中的请求"""
+        now = time.monotonic()
+
+        while self._queued > 0 and self._can_admit(now):
+            waiter = self._pop_next()
+            if waiter is None:
+                break
+            self._in_flight += 1
+            self._record_wait(waiter.priority, now - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+        # 退避期间安排定时唤醒
+        if self._queued > 0 and now < self._backoff_until and self._wakeup_handle is None:
+            loop = asyncio.get_running_loop()
+            self._wakeup_handle = loop.call_later(self._backoff_until - now, self._on_wakeup)
+
+    def _on_wakeup(self):
+        self._wakeup_handle = None
+        self._dispatch()
+
+    def _pop_next(self) -> Optional[_Waiter]:
+        """按优先级取下一个请求，同优先级内按角色轮转"""
+        for priority in RequestPriority:
+            queues = self._queues[priority]
+            while queues:
+                character_id, queue = next(iter(queues.items()))
+
+                # 跳过已被取消的请求
+                while queue and queue[0].future.done():
+                    queue.popleft()
+                    self._queued -= 1
+
+                if not queue:
+                    del queues[character_id]
+                    continue
+
+                waiter = queue.popleft()
+                self._queued -= 1
+                if queue:
+                    # 该角色还有请求，移到轮转末尾
+                    queues.move_to_end(character_id)
+                else:
+                    del queues[character_id]
+                return waiter
+        return None
+
+    def _record_wait(self, priority: RequestPriority, wait: float):
+        self._admitted[priority] += 1
+        self._total_wait[priority] += wait
+        self._max_wait[priority] = max(self._max_wait[priority], wait)
+
+    # ===== 统计 =====
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度统计"""
+        by_priority = {}
+        for p in RequestPriority:
+            admitted = self._admitted[p]
+            by_priority[p.name.lower()] = {
+                'queued': sum(len(q) for q in self._queues[p].values()),
+                'admitted': admitted,
+                'avg_wait_ms': round(self._total_wait[p] / admitted * 1000, 1) if admitted else 0.0,
+                'max_wait_ms': round(self._max_wait[p] * 1000, 1),
+            }
+
+        return {
+            'in_flight': self._in_flight,
+            'limit': self.effective_limit,
+            'max_in_flight': self.config.max_in_flight,
+            'queue_depth': self._queued,
+            'backing_off': time.monotonic() < self._backoff_until,
+            'successes': self._successes,
+            'failures': self._failures,
+            'rejected': self._rejected,
+            'by_priority': by_priority,
+        }
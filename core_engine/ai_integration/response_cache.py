@@ -0,0 +1,226 @@
+"""
+LLM响应缓存模块
+
+以请求内容（模型、消息、温度、最大token数等）的哈希为键，
+把成功的LLM响应持久化到本地SQLite文件中：
+- 重放同一场景的模拟或重跑测试时，无需再次访问推理服务
+- 支持按条目数的LRU淘汰和按时间的TTL过期
+- 统计命中/未命中次数
+
+默认只缓存温度不高于max_temperature的调用：高温度采样本应每次结果不同，
+缓存会让模拟失去随机性。重放模式（replay=True）不论温度缓存所有调用，
+用于重放同一场景或重跑测试时完全不访问推理服务
+
+默认不启用，在LLMConfig中设置cache_path后生效
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any
+
+
+class ResponseCache:
+    """
+    基于SQLite的LLM响应缓存
+
+    使用方式：
+        cache = ResponseCache("llm_cache.db", max_entries=10000, ttl=7 * 24 * 3600)
+        if cache.accepts(payload):
+            key = cache.make_key(payload)
+            cached = await cache.get_async(key)
+            if cached is None:
+                ...
+                await cache.put_async(key, response_dict)
+
+    get/put是同步的SQLite操作，在事件循环中应使用get_async/put_async，
+    由线程池执行，不阻塞其他协程
+    """
+
+    # 每写入多少条检查一次容量，避免每次写入都统计行数
+    EVICT_CHECK_INTERVAL = 100
+
+    def __init__(self, path: str, max_entries: int = 10000,
+                 ttl: Optional[float] = None, max_temperature: float = 0.3,
+                 replay: bool = False):
+        """
+        Args:
+            path: SQLite文件路径（":memory:"表示仅内存）
+            max_entries: 最大缓存条目数，超出后淘汰最久未使用的条目
+            ttl: 条目有效期（秒），None表示不过期
+            max_temperature: 只缓存温度不高于该值的调用
+            replay: 重放模式，不论温度缓存所有调用
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self.replay = replay
+
+        # 连接会在线程池的不同线程中使用，由锁保证同一时刻只有一个线程访问
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_response_cache (
+                cache_key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON llm_response_cache (last_access)"
+        )
+        self._conn.commit()
+
+        # 统计
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        self._puts_since_check = 0
+
+    def accepts(self, payload: Dict[str, Any]) -> bool:
+        """请求是否可以缓存（非重放模式下，未指定温度时由服务端决定，不缓存）"""
+        if self.replay:
+            return True
+        temperature = payload.get('temperature')
+        return temperature is not None and temperature <= self.max_temperature
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """根据请求参数生成缓存键"""
+        material = {
+            'model': payload.get('model'),
+            'messages': payload.get('messages'),
+            'temperature': payload.get('temperature'),
+            'max_tokens': payload.get('max_tokens'),
+            'top_p': payload.get('top_p'),
+            'stop': payload.get('stop'),
+        }
+        raw = json.dumps(material, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    async def get_async(self, key: str) -> Optional[Dict[str, Any]]:
+        """在线程池中读取缓存"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def put_async(self, key: str, response: Dict[str, Any]):
+        """在线程池中写入缓存"""
+        await asyncio.to_thread(self.put, key, response)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，未命中或已过期返回None"""
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT response, created_at FROM llm_response_cache WHERE cache_key = ?",
+            (key,)
+        ).fetchone()
+
+        now = time.time()
+        if row is None:
+            self._misses += 1
+            return None
+
+        response, created_at = row
+        if self.ttl is not None and now - created_at > self.ttl:
+            self._conn.execute("DELETE FROM llm_response_cache WHERE cache_key = ?", (key,))
+            self._conn.commit()
+            self._evictions += 1
+            self._misses += 1
+            return None
+
+        self._conn.execute(
+            "UPDATE llm_response_cache SET last_access = ? WHERE cache_key = ?",
+            (now, key)
+        )
+        self._conn.commit()
+        self._hits += 1
+        return json.loads(response)
+
+    def put(self, key: str, response: Dict[str, Any]):
+        """写入缓存"""
+        with self._lock:
+            self._put(key, response)
+
+    def _put(self, key: str, response: Dict[str, Any]):
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO llm_response_cache "
+            "(cache_key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(response, ensure_ascii=False), now, now)
+        )
+        self._conn.commit()
+        self._stores += 1
+
+        self._puts_since_check += 1
+        if self._puts_since_check >= self.EVICT_CHECK_INTERVAL:
+            self._puts_since_check = 0
+            self._evict()
+
+    def evict(self) -> int:
+        """淘汰过期条目和超出容量的最久未使用条目，返回淘汰数量"""
+        with self._lock:
+            return self._evict()
+
+    def _evict(self) -> int:
+        removed = 0
+
+        if self.ttl is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM llm_response_cache WHERE created_at < ?",
+                (time.time() - self.ttl,)
+            )
+            removed += cursor.rowcount
+
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_response_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM llm_response_cache WHERE cache_key IN ("
+                "SELECT cache_key FROM llm_response_cache ORDER BY last_access LIMIT ?)",
+                (overflow,)
+            )
+            removed += cursor.rowcount
+
+        self._conn.commit()
+        self._evictions += removed
+        return removed
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_response_cache")
+            self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        lookups = self._hits + self._misses
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM llm_response_cache"
+            ).fetchone()[0]
+        return {
+            'path': self.path,
+            'max_temperature': self.max_temperature,
+            'replay': self.replay,
+            'entries': entries,
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate': self._hits / lookups if lookups else 0.0,
+            'stores': self._stores,
+            'evictions': self._evictions,
+        }
@@ -5,13 +5,17 @@
 """
 
 from .memory import MemorySystem, MemoryType
+from .common_memory import CommonMemoryStore, CommonMemorySnapshot, get_common_memory_store
 from .inventory import Inventory, Item
 from .perception import PerceptionSystem
+from .prompt_builder import SystemPromptBuilder
 from .agent import CharacterAgent
 
 __all__ = [
     'MemorySystem', 'MemoryType',
+    'CommonMemoryStore', 'CommonMemorySnapshot', 'get_common_memory_store',
     'Inventory', 'Item',
     'PerceptionSystem',
+    'SystemPromptBuilder',
     'CharacterAgent'
 ]
@@ -2,13 +2,21 @@
 行动日志模块
 
 记录AI角色的每一步行动，支持查询和可视化
+
+默认每条日志单独提交；开启写后缓冲（start_write_behind）后，
+日志先进入内存队列，由后台任务按条数/时间批量插入，减少数据库提交次数。
+批量写入失败时日志放回队首、退避后重试，多次失败后改为逐条写入，只丢弃单独写入也失败的日志
 """
 
-from typing import Optional, Dict, List, Any
+import asyncio
+import time
+from typing import Optional, Dict, List, Any, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 
+from .llm_blob_store import get_llm_blob_store
+
 
 class ActionType(str, Enum):
     """行动类型"""
@@ -45,8 +53,10 @@ class ActionLogEntry:
     reason: str = ""
     result: str = ""
     success: bool = True
-    input_prompt: str = ""           # 发送给LLM的完整prompt
-    llm_response: str = ""           # LLM返回的原始响应
+    input_prompt: str = ""           # 发送给LLM的完整prompt（列表查询不加载，见get_log_detail）
+    llm_response: str = ""           # LLM返回的原始响应（同上）
+    input_prompt_hash: Optional[str] = None
+    llm_response_hash: Optional[str] = None
     extra_data: Dict[str, Any] = field(default_factory=dict)
     created_at: datetime = None
     
@@ -86,20 +96,257 @@ class ActionLogEntry:
         return f"{time_str} {self.action_name}: {self.description or self.result or ''}"
 
 
+@dataclass
+class WriteBehindConfig:
+    """写后缓冲配置"""
+    # 缓冲达到多少条时立即写入
+    flush_size: int = 50
+    
+    # 最长写入间隔（毫秒）
+    flush_interval_ms: float = 500.0
+    
+    # 缓冲上限：达到后在记录日志的调用方同步写入（背压）
+    max_pending: int = 1000
+    
+    # 批量写入失败后的重试：退避时间从retry_backoff_ms开始翻倍，不超过max_retry_backoff_ms；
+    # 连续失败超过max_retries次后改为逐条写入
+    max_retries: int = 3
+    retry_backoff_ms: float = 200.0
+    max_retry_backoff_ms: float = 5000.0
+
+
 class ActionLogger:
     """
     行动日志记录器
     
     负责记录和查询AI角色的行动历史
+    
+    写后缓冲模式：
+        logger.start_write_behind(WriteBehindConfig(flush_size=50))
+        logger.log_action(...)          # 只进入内存队列
+        await logger.stop_write_behind()  # 写入剩余日志并恢复逐条提交
     """
     
     def __init__(self, db_session=None):
         self._db = db_session
+        
+        # 写后缓冲（None表示逐条提交）
+        self._write_behind: Optional[WriteBehindConfig] = None
+        self._pending: List[Tuple[ActionLogEntry, Dict[str, Any]]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._wake_event: Optional[asyncio.Event] = None
+        self._stopping = False
+        
+        # 批量写入失败后的重试状态
+        self._consecutive_failures = 0
+        self._retry_at = 0.0  # time.monotonic() 早于此时间时不重试（强制写入除外）
+        
+        # 统计
+        self._flushes = 0
+        self._flushed_rows = 0
+        self._backpressure_flushes = 0
+        self._failed_flushes = 0
+        self._row_fallbacks = 0
+        self._dropped_rows = 0
     
     def set_db_session(self, db_session):
         """设置数据库会话"""
         self._db = db_session
     
+    # ===== 写后缓冲 =====
+    
+    @property
+    def is_write_behind(self) -> bool:
+        """是否处于写后缓冲模式"""
+        return self._write_behind is not None
+    
+    def start_write_behind(self, config: Optional[WriteBehindConfig] = None):
+        """
+        开启写后缓冲
+        
+        在事件循环中调用时启动后台写入任务；没有事件循环时，
+        缓冲达到flush_size条由log_action同步写入
+        """
+        self._write_behind = config or WriteBehindConfig()
+        
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        
+        self._stopping = False
+        self._wake_event = asyncio.Event()
+        self._flush_task = loop.create_task(self._flush_loop())
+    
+    async def stop_write_behind(self):
+        """停止后台写入任务，写入所有剩余日志并恢复逐条提交"""
+        task = self._flush_task
+        self._flush_task = None
+        if task is not None and not task.done():
+            # 通知后台任务退出（不使用cancel，避免与正在进行的等待竞争）
+            self._stopping = True
+            self._wake_event.set()
+            await task
+        
+        # 写入所有剩余日志：失败时按退避时间等待后重试，多次失败后逐条写入，因此一定会结束
+        while self._pending and self._db:
+            self.flush(force=True)
+            if self._pending:
+                await asyncio.sleep(max(0.0, self._retry_at - time.monotonic()))
+        self._write_behind = None
+        self._wake_event = None
+        self._stopping = False
+    
+    async def _flush_loop(self):
+        """后台写入：缓冲满flush_size条或间隔到期时写入"""
+        while not self._stopping:
+            interval = self._write_behind.flush_interval_ms / 1000
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
+            
+            if self._pending:
+                self.flush()
+    
+    def flush(self, force: bool = False) -> int:
+        """
+        把缓冲中的日志批量写入数据库
+        
+        失败时整批放回队首，退避后重试；连续失败超过max_retries次后逐条写入，
+        只丢弃单独写入也失败的日志
+        
+        Args:
+            force: 忽略退避时间立即尝试（背压和停止时使用）
+        
+        Returns:
+            写入的条数
+        """
+        if not self._pending or not self._db:
+            return 0
+        if not force and time.monotonic() < self._retry_at:
+            return 0
+        
+        batch, self._pending = self._pending, []
+        
+        try:
+            self._insert_rows([row for _, row in batch])
+        except Exception as e:
+            self._db.rollback()
+            get_llm_blob_store().forget_known_hashes()
+            self._failed_flushes += 1
+            self._consecutive_failures += 1
+            
+            config = self._write_behind or WriteBehindConfig()
+            if self._consecutive_failures <= config.max_retries:
+                # 放回队首（保持先后顺序），退避后重试
+                self._pending[:0] = batch
+                delay = min(
+                    config.retry_backoff_ms * 2 ** (self._consecutive_failures - 1),
+                    config.max_retry_backoff_ms
+                ) / 1000
+                self._retry_at = time.monotonic() + delay
+                print(f"ActionLogger flush error: {e} "
+                      f"(retry {self._consecutive_failures}/{config.max_retries} in {delay:.1f}s)")
+                return 0
+            
+            print(f"ActionLogger flush error: {e} (writing {len(batch)} logs one by one)")
+            return self._flush_rows(batch)
+        
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+        self._flushes += 1
+        self._flushed_rows += len(batch)
+        return len(batch)
+    
+    def _insert_rows(self, rows: List[Dict[str, Any]]):
+        """在一个事务中插入日志行（不修改传入的行）"""
+        from sqlalchemy import insert
+        from api_server import models
+        
+        rows = [dict(row) for row in rows]
+        self._externalize_llm_io(rows)
+        self._db.execute(insert(models.ActionLog), rows)
+        self._db.commit()
+    
+    def _flush_rows(self, batch: List[Tuple[ActionLogEntry, Dict[str, Any]]]) -> int:
+        """逐条写入（每条单独提交），只丢弃写入失败的日志"""
+        self._row_fallbacks += 1
+        written = 0
+        for entry, row in batch:
+            try:
+                self._insert_rows([row])
+                written += 1
+            except Exception as e:
+                self._db.rollback()
+                get_llm_blob_store().forget_known_hashes()
+                self._dropped_rows += 1
+                print(f"ActionLogger dropped log ({entry.character_id}: {entry.action_name}): {e}")
+        
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+        self._flushes += 1
+        self._flushed_rows += written
+        return written
+    
+    def _externalize_llm_io(self, rows: List[Dict[str, Any]]):
+        """把prompt/响应写入内容存储，日志行只保留哈希（在当前事务中）"""
+        texts = []
+        for row in rows:
+            texts.append(row.pop('input_prompt', None))
+            texts.append(row.pop('llm_response', None))
+        
+        hashes = get_llm_blob_store().put_many(self._db, texts)
+        for i, row in enumerate(rows):
+            row['input_prompt_hash'] = hashes[2 * i]
+            row['llm_response_hash'] = hashes[2 * i + 1]
+    
+    def _enqueue(self, entry: ActionLogEntry, row: Dict[str, Any]):
+        """日志进入缓冲队列，必要时触发写入"""
+        self._pending.append((entry, row))
+        
+        config = self._write_behind
+        if len(self._pending) >= config.max_pending:
+            # 后台写入跟不上，由调用方同步写入
+            self._backpressure_flushes += 1
+            self.flush(force=True)
+        elif len(self._pending) >= config.flush_size:
+            if self._flush_task is not None and not self._flush_task.done():
+                self._wake_event.set()
+            else:
+                self.flush()
+    
+    def _pending_entries(self, character_id: int = None, game_day: int = None,
+                         action_type: 'ActionType' = None) -> List[ActionLogEntry]:
+        """缓冲中尚未写入的日志（从新到旧）"""
+        return [
+            entry for entry, _ in reversed(self._pending)
+            if (character_id is None or entry.character_id == character_id)
+            and (game_day is None or entry.game_day == game_day)
+            and (action_type is None or entry.action_type == action_type)
+        ]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入统计"""
+        return {
+            'write_behind': self.is_write_behind,
+            'pending': len(self._pending),
+            'flushes': self._flushes,
+            'flushed_rows': self._flushed_rows,
+            'avg_batch_size': self._flushed_rows / self._flushes if self._flushes else 0.0,
+            'backpressure_flushes': self._backpressure_flushes,
+            'failed_flushes': self._failed_flushes,
+            'row_fallbacks': self._row_fallbacks,
+            'dropped_rows': self._dropped_rows,
+            'llm_blobs': get_llm_blob_store().get_stats(),
+        }
+    
+    # ===== 记录日志 =====
+    
     def log_action(
         self,
         character_id: int,
@@ -122,18 +369,36 @@ class ActionLogger:
         记录一条行动日志
         
         Returns:
-            日志ID，如果失败返回None
+            日志ID，如果失败返回None；写后缓冲模式下日志尚未写入，返回None
         """
         if not self._db:
             print(f"[ActionLog] (no db) {character_id}: {action_name} - {description}")
             return None
         
-        try:
-            from api_server import models
-            
-            log = models.ActionLog(
+        row = dict(
+            character_id=character_id,
+            action_type=action_type.value,  # 直接使用字符串值
+            action_name=action_name,
+            description=description,
+            location_id=location_id,
+            target_character_id=target_character_id,
+            game_day=game_day,
+            game_time=game_time,
+            duration=duration,
+            reason=reason,
+            result=result,
+            success=success,
+            input_prompt=input_prompt,
+            llm_response=llm_response,
+            extra_data=extra_data or {}
+        )
+        
+        if self._write_behind is not None:
+            # 记录时间在入队时确定，批量写入后仍保持先后顺序
+            row['created_at'] = datetime.now()
+            entry = ActionLogEntry(
                 character_id=character_id,
-                action_type=action_type.value,  # 直接使用字符串值
+                action_type=action_type,
                 action_name=action_name,
                 description=description,
                 location_id=location_id,
@@ -146,8 +411,17 @@ class ActionLogger:
                 success=success,
                 input_prompt=input_prompt,
                 llm_response=llm_response,
-                extra_data=extra_data or {}
+                extra_data=row['extra_data'],
+                created_at=row['created_at']
             )
+            self._enqueue(entry, row)
+            return None
+        
+        try:
+            from api_server import models
+            
+            self._externalize_llm_io([row])
+            log = models.ActionLog(**row)
             
             self._db.add(log)
             self._db.commit()
@@ -157,6 +431,7 @@ class ActionLogger:
         except Exception as e:
             print(f"ActionLogger error: {e}")
             self._db.rollback()
+            get_llm_blob_store().forget_known_hashes()
             return None
     
     def log_move(self, character_id: int, from_location: str, to_location: str,
@@ -349,6 +624,11 @@ class ActionLogger:
         if not self._db:
             return []
         
+        # 尚未写入的日志比数据库中的都新
+        entries = self._pending_entries(character_id, action_type=action_type)[:limit]
+        if len(entries) >= limit:
+            return entries
+        
         try:
             from api_server import models
             
@@ -360,12 +640,11 @@ class ActionLogger:
             if action_type is not None:
                 query = query.filter(models.ActionLog.action_type == models.ActionLogType(action_type.value))
             
-            query = query.order_by(models.ActionLog.created_at.desc()).limit(limit)
+            query = query.order_by(models.ActionLog.created_at.desc()).limit(limit - len(entries))
             
             logs = query.all()
             
             # 转换为 ActionLogEntry
-            entries = []
             for log in logs:
                 entry = ActionLogEntry(
                     id=log.id,
@@ -381,8 +660,8 @@ class ActionLogger:
                     reason=log.reason or "",
                     result=log.result or "",
                     success=log.success,
-                    input_prompt=log.input_prompt or "",
-                    llm_response=log.llm_response or "",
+                    input_prompt_hash=log.input_prompt_hash,
+                    llm_response_hash=log.llm_response_hash,
                     extra_data=log.extra_data or {},
                     created_at=log.created_at
                 )
@@ -416,6 +695,11 @@ class ActionLogger:
         if not self._db:
             return []
         
+        # 尚未写入的日志比数据库中的都新
+        entries = self._pending_entries(character_id, game_day)[:limit]
+        if len(entries) >= limit:
+            return entries
+        
         try:
             from api_server import models
             
@@ -426,11 +710,10 @@ class ActionLogger:
             if game_day is not None:
                 query = query.filter(models.ActionLog.game_day == game_day)
             
-            query = query.order_by(models.ActionLog.created_at.desc()).limit(limit)
+            query = query.order_by(models.ActionLog.created_at.desc()).limit(limit - len(entries))
             
             logs = query.all()
             
-            entries = []
             for log in logs:
                 entry = ActionLogEntry(
                     id=log.id,
@@ -446,8 +729,8 @@ class ActionLogger:
                     reason=log.reason or "",
                     result=log.result or "",
                     success=log.success,
-                    input_prompt=log.input_prompt or "",
-                    llm_response=log.llm_response or "",
+                    input_prompt_hash=log.input_prompt_hash,
+                    llm_response_hash=log.llm_response_hash,
                     extra_data=log.extra_data or {},
                     created_at=log.created_at
                 )
@@ -465,6 +748,65 @@ class ActionLogger:
             print(f"Get character logs error: {e}")
             return []
 
+    
+    def get_log_detail(self, log_id: int) -> Optional[ActionLogEntry]:
+        """
+        获取单条日志详情（包含完整的prompt和LLM响应）
+        
+        列表查询不加载prompt/响应，需要查看时调用本方法
+        """
+        if not self._db:
+            return None
+        
+        try:
+            from api_server import models
+            
+            log = self._db.query(models.ActionLog).filter(models.ActionLog.id == log_id).first()
+            if not log:
+                return None
+            
+            texts = get_llm_blob_store().get_many(
+                self._db, [log.input_prompt_hash, log.llm_response_hash]
+            )
+            
+            entry = ActionLogEntry(
+                id=log.id,
+                character_id=log.character_id,
+                action_type=ActionType(log.action_type.value),
+                action_name=log.action_name,
+                description=log.description or "",
+                location_id=log.location_id,
+                target_character_id=log.target_character_id,
+                game_day=log.game_day or 0,
+                game_time=log.game_time or "",
+                duration=log.duration or 0,
+                reason=log.reason or "",
+                result=log.result or "",
+                success=log.success,
+                # 旧日志没有哈希，回退到原来的文本列
+                input_prompt=(texts.get(log.input_prompt_hash) if log.input_prompt_hash
+                              else log.input_prompt) or "",
+                llm_response=(texts.get(log.llm_response_hash) if log.llm_response_hash
+                              else log.llm_response) or "",
+                input_prompt_hash=log.input_prompt_hash,
+                llm_response_hash=log.llm_response_hash,
+                extra_data=log.extra_data or {},
+                created_at=log.created_at
+            )
+            
+            if log.character:
+                entry.character_name = log.character.nickname or log.character.username
+            if log.target_character:
+                entry.target_character_name = log.target_character.nickname or log.target_character.username
+            if log.location:
+                entry.location_name = log.location.name
+            
+            return entry
+            
+        except Exception as e:
+            print(f"Get log detail error: {e}")
+            return None
+
 
 # 全局实例
 _action_logger: Optional[ActionLogger] = None
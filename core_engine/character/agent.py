@@ -6,16 +6,21 @@ AI角色Agent模块
 
 import asyncio
 import json
+import time
 from dataclasses import dataclass, field
 from typing import Optional, Dict, List, Any, Callable, Awaitable
 from datetime import datetime
 from enum import Enum
 
 from .memory import MemorySystem, MemoryType
+from .common_memory import get_common_memory_store
 from .inventory import Inventory, Item, ItemTemplates
 from .perception import PerceptionSystem, EnvironmentPerception, PhysicalState, EmotionState
 from .action_logger import ActionLogger, ActionType, get_action_logger
+from .prompt_builder import SystemPromptBuilder
 from ..ai_integration.llm_client import LLMClient, Message, get_llm_client
+from ..ai_integration.request_scheduler import RequestPriority
+from ..ai_integration.batch_dispatcher import BatchDispatcher
 
 
 class AgentState(str, Enum):
@@ -141,6 +146,7 @@ class CharacterAgent:
         self.inventory = Inventory(self.character_id, db_session=db_session)
         self.perception = PerceptionSystem(db_session=db_session)
         self.action_logger = get_action_logger(db_session)
+        self.prompt_builder = SystemPromptBuilder(profile, self.memory)
         
         # 状态
         self.state = AgentState.IDLE
@@ -178,13 +184,27 @@ class CharacterAgent:
         """注册行动处理器"""
         self._action_handlers[action] = handler
     
-    async def initialize(self):
-        """初始化Agent"""
+    async def initialize(self, memory_rows: Optional[List[Any]] = None,
+                         inventory_rows: Optional[List[Any]] = None):
+        """
+        初始化Agent
+        
+        Args:
+            memory_rows: 预先查询好的个人记忆行（批量创建时由AgentManager提供），
+                         None表示自行从数据库加载
+            inventory_rows: 预先查询好的物品行，None表示自行从数据库加载
+        """
         # 加载记忆
-        self.memory.load_from_db()
+        if memory_rows is not None:
+            self.memory.load_from_rows(memory_rows)
+        else:
+            self.memory.load_from_db()
         
         # 加载物品栏
-        self.inventory.load_from_db()
+        if inventory_rows is not None:
+            self.inventory.load_from_rows(inventory_rows)
+        else:
+            self.inventory.load_from_db()
         
         # 确保有手机
         if not self.inventory.get_by_name("手机"):
@@ -196,29 +216,13 @@ class CharacterAgent:
     # ===== 系统提示词 =====
     
     def _build_system_prompt(self, context: str = "") -> str:
-        """构建系统提示词"""
-        prompt_parts = [
-            "你是一个生活在虚拟社区中的AI角色，需要像真人一样生活、思考和行动。",
-            "",
-            self.profile.to_prompt(),
-            "",
-            self.memory.build_memory_prompt([MemoryType.COMMON, MemoryType.IMPORTANT]),
-        ]
-        
-        if context:
-            prompt_parts.append("")
-            prompt_parts.append(context)
-        
-        prompt_parts.extend([
-            "",
-            "【行为准则】",
-            "1. 根据自己的性格特点做出符合角色的反应",
-            "2. 记住之前发生的事情，保持行为的连贯性",
-            "3. 与其他角色交流时表现自然",
-            "4. 做出决策时考虑当前的身体状态和环境"
-        ])
+        """
+        构建系统提示词
         
-        return "\n".join(prompt_parts)
+        稳定部分（准则、共同记忆、角色设定、重要记忆）在前并被缓存，
+        本次调用的上下文在最后，以便推理服务复用前缀缓存
+        """
+        return self.prompt_builder.build(context)
     
     # ===== 每日流程 =====
     
@@ -268,7 +272,9 @@ class CharacterAgent:
         response = await self._llm.generate_with_system(
             self._build_system_prompt(),
             wake_up_context,
-            temperature=0.8
+            temperature=0.8,
+            priority=RequestPriority.SUMMARY,
+            character_id=self.character_id
         )
         
         plan_text = response.content if response.success else "新的一天开始了..."
@@ -334,7 +340,9 @@ class CharacterAgent:
             self._build_system_prompt(),
             summary_prompt,
             temperature=0.7,
-            max_tokens=200
+            max_tokens=200,
+            priority=RequestPriority.SUMMARY,
+            character_id=self.character_id
         )
         
         summary = response.content if response.success else f"第{game_day}天结束了。"
@@ -355,10 +363,16 @@ class CharacterAgent:
     
     # ===== 环境感知与决策 =====
     
-    async def perceive_and_decide(self) -> Optional[Dict[str, Any]]:
+    async def perceive_and_decide(
+        self, dispatcher: Optional[BatchDispatcher] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         感知环境并做出决策
         
+        Args:
+            dispatcher: 可选的批量调度器，提供时决策请求会与
+                        同一时刻其他角色的请求合并为一个多角色请求发送
+        
         Returns:
             决策结果，包含要执行的行动和预计时长（duration）
         """
@@ -439,10 +453,13 @@ class CharacterAgent:
 {{"action_index": 数字, "reason": "选择这个行动的原因", "custom_duration": 可选的自定义时长（分钟）}}
 """
         
-        response = await self._llm.generate_json(
+        generate_json = dispatcher.generate_json if dispatcher else self._llm.generate_json
+        response = await generate_json(
             self._build_system_prompt(),
             decision_prompt,
-            temperature=0.6
+            temperature=0.6,
+            priority=RequestPriority.DECISION,
+            character_id=self.character_id
         )
         
         # 将LLM响应转为字符串用于记录
@@ -626,14 +643,8 @@ class CharacterAgent:
                     else:
                         walk_time = 10
                     
-                    # 更新角色位置到目标地点中心
-                    center_x, center_y = location.center
-                    self._world.set_character_position(
-                        self.character_id, 
-                        center_x, 
-                        center_y, 
-                        location_id
-                    )
+                    # 前往目标地点中心（行动结束时到达）
+                    self._world.move_character_to(self.character_id, location_id, walk_time)
                     self.current_location_id = location_id
                     
                     return ActionResult(
@@ -860,7 +871,9 @@ class CharacterAgent:
         response = await self._llm.generate_with_system(
             self._build_system_prompt(context),
             f"开始与{partner_name}的对话",
-            temperature=0.8
+            temperature=0.8,
+            priority=RequestPriority.ENCOUNTER,
+            character_id=self.character_id
         )
         
         if response.success:
@@ -898,7 +911,11 @@ class CharacterAgent:
             Message(role="system", content=self._build_system_prompt(context))
         ] + self.conversation_history
         
-        response = await self._llm.chat(messages, temperature=0.8)
+        response = await self._llm.chat(
+            messages, temperature=0.8,
+            priority=RequestPriority.ENCOUNTER,
+            character_id=self.character_id
+        )
         
         if response.success:
             self.conversation_history.append(
@@ -937,7 +954,9 @@ class CharacterAgent:
             self._build_system_prompt(),
             summary_prompt,
             temperature=0.5,
-            max_tokens=100
+            max_tokens=100,
+            priority=RequestPriority.ENCOUNTER,
+            character_id=self.character_id
         )
         
         if response.success and response.content != "普通的交流":
@@ -958,41 +977,95 @@ class CharacterAgent:
     
     # ===== 社交网络行为 =====
     
-    async def browse_feed(self, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def browse_feed(self, posts: List[Dict[str, Any]],
+                          mode: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         浏览社交网络帖子
         
         Args:
             posts: 帖子列表（包含评论信息）
+            mode: 反应生成方式，None表示读取配置ai_feed_reaction_mode
+                  - batch: 一次请求对所有帖子做出反应，失败时逐条并发补充
+                  - concurrent: 每条帖子单独请求，并发发送（受LLM客户端并发上限约束）
+                  - sequential: 每条帖子单独请求，依次发送
             
         Returns:
-            对每个帖子的反应（是否点赞、评论内容）
+            对每个帖子的反应（是否点赞、评论内容），顺序与posts一致
         """
+        posts = posts[:5]  # 最多看5条
+        if not posts:
+            return []
+        
+        if mode is None:
+            from shared.config import get_settings
+            mode = get_settings().ai_feed_reaction_mode
+        
+        if mode == "batch":
+            return await self._react_to_posts_batch(posts)
+        
+        if mode == "concurrent":
+            return list(await asyncio.gather(
+                *[self._react_to_post(post) for post in posts]
+            ))
+        
         reactions = []
+        for post in posts:
+            reactions.append(await self._react_to_post(post))
+        return reactions
+    
+    @staticmethod
+    def _format_post_comments(post: Dict[str, Any]) -> str:
+        """构建帖子评论区的显示文本"""
+        comments = post.get('comments', [])
+        if not comments:
+            return ""
+        
+        comments_text = "\n评论区：\n"
+        for c in comments[:10]:  # 最多显示10条评论
+            prefix = "（我的评论）" if c.get('is_mine') else ""
+            comments_text += f"  - {c['author_name']}{prefix}：{c['content']}\n"
+        return comments_text
+    
+    @staticmethod
+    def _parse_flag(value: Any) -> bool:
+        """解析LLM回复中的布尔字段（模型有时会返回"false"等字符串）"""
+        if isinstance(value, str):
+            return value.strip().lower() in ('true', 'yes', 'y', '1', '是')
+        if isinstance(value, (bool, int, float)):
+            return bool(value)
+        return False
+    
+    @classmethod
+    def _make_reaction(cls, post: Dict[str, Any], response: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """把LLM的回复整理为反应记录"""
+        if not response:
+            return {'post_id': post.get('id'), 'like': False, 'comment': ''}
         
-        for post in posts[:5]:  # 最多看5条
-            author_name = post.get('author_name', '某人')
-            content = post.get('content', '')
-            comments = post.get('comments', [])
-            has_commented = post.get('has_commented', False)
-            
-            # 构建评论区显示
-            comments_text = ""
-            if comments:
-                comments_text = "\n评论区：\n"
-                for c in comments[:10]:  # 最多显示10条评论
-                    prefix = "（我的评论）" if c.get('is_mine') else ""
-                    comments_text += f"  - {c['author_name']}{prefix}：{c['content']}\n"
-            
-            # 如果已评论，提示不要重复评论
-            comment_instruction = ""
-            if has_commented:
-                comment_instruction = "\n注意：你已经评论过这条帖子了，不需要再评论。"
-            
-            reaction_prompt = f"""
+        # 如果已评论过，强制不再评论
+        comment = response.get('comment', '') or ''
+        if post.get('has_commented', False):
+            comment = ''
+        
+        return {
+            'post_id': post.get('id'),
+            'like': cls._parse_flag(response.get('like', False)),
+            'comment': comment
+        }
+    
+    async def _react_to_post(self, post: Dict[str, Any]) -> Dict[str, Any]:
+        """对单条帖子做出反应"""
+        author_name = post.get('author_name', '某人')
+        content = post.get('content', '')
+        
+        # 如果已评论，提示不要重复评论
+        comment_instruction = ""
+        if post.get('has_commented', False):
+            comment_instruction = "\n注意：你已经评论过这条帖子了，不需要再评论。"
+        
+        reaction_prompt = f"""
 你在浏览社交网络，看到了{author_name}发的帖子：
 "{content}"
-{comments_text}
+{self._format_post_comments(post)}
 请决定你的反应：
 1. 是否点赞？（true/false）
 2. 是否评论？如果是，写什么？（留空表示不评论）{comment_instruction}
@@ -1000,32 +1073,77 @@ class CharacterAgent:
 用JSON格式回复：
 {{"like": true/false, "comment": "评论内容或空字符串"}}
 """
-            
-            response = await self._llm.generate_json(
-                self._build_system_prompt(),
-                reaction_prompt,
-                temperature=0.7
-            )
-            
-            if response:
-                # 如果已评论过，强制不再评论
-                comment = response.get('comment', '')
-                if has_commented:
-                    comment = ''
-                
-                reactions.append({
-                    'post_id': post.get('id'),
-                    'like': response.get('like', False),
-                    'comment': comment
-                })
+        
+        response = await self._llm.generate_json(
+            self._build_system_prompt(),
+            reaction_prompt,
+            temperature=0.7,
+            priority=RequestPriority.FEED,
+            character_id=self.character_id
+        )
+        
+        return self._make_reaction(post, response)
+    
+    async def _react_to_posts_batch(self, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        一次请求对多条帖子做出反应
+        
+        LLM未返回（或返回格式不对）的帖子，再逐条并发请求补充
+        """
+        post_blocks = []
+        for post in posts:
+            block = f"""[帖子ID: {post.get('id')}] {post.get('author_name', '某人')}发的帖子：
+"{post.get('content', '')}"
+{self._format_post_comments(post)}"""
+            if post.get('has_commented', False):
+                block += "（你已经评论过这条帖子了，不需要再评论）\n"
+            post_blocks.append(block)
+        
+        posts_text = "\n".join(post_blocks)
+        reaction_prompt = f"""
+你在浏览社交网络，看到了以下{len(posts)}条帖子：
+
+{posts_text}
+请对每条帖子分别决定你的反应：
+1. 是否点赞？（true/false）
+2. 是否评论？如果是，写什么？（留空表示不评论）
+
+用JSON格式回复，reactions中每条帖子一项：
+{{"reactions": [{{"post_id": 帖子ID, "like": true/false, "comment": "评论内容或空字符串"}}]}}
+"""
+        
+        response = await self._llm.generate_json(
+            self._build_system_prompt(),
+            reaction_prompt,
+            temperature=0.7,
+            priority=RequestPriority.FEED,
+            character_id=self.character_id
+        )
+        
+        # 按帖子ID整理回复
+        by_post_id: Dict[Any, Dict[str, Any]] = {}
+        items = response.get('reactions') if isinstance(response, dict) else response
+        if isinstance(items, list):
+            for item in items:
+                if isinstance(item, dict) and 'post_id' in item:
+                    by_post_id[str(item['post_id'])] = item
+        
+        reactions: List[Optional[Dict[str, Any]]] = []
+        missing = []
+        for i, post in enumerate(posts):
+            item = by_post_id.get(str(post.get('id')))
+            if item is None:
+                reactions.append(None)
+                missing.append(i)
             else:
-                reactions.append({
-                    'post_id': post.get('id'),
-                    'like': False,
-                    'comment': ''
-                })
-            
-            await asyncio.sleep(0.1)  # 避免过快请求
+                reactions.append(self._make_reaction(post, item))
+        
+        # 回退：缺失的帖子逐条并发请求
+        if missing:
+            print(f"[{self.profile.name}] Batch feed reaction missed {len(missing)} posts, falling back")
+            fallback = await asyncio.gather(*[self._react_to_post(posts[i]) for i in missing])
+            for i, reaction in zip(missing, fallback):
+                reactions[i] = reaction
         
         return reactions
     
@@ -1088,7 +1206,9 @@ class CharacterAgent:
                 self._build_system_prompt(),
                 summary_prompt,
                 temperature=0.6,
-                max_tokens=200
+                max_tokens=200,
+                priority=RequestPriority.SUMMARY,
+                character_id=self.character_id
             )
             
             if response and response.success and response.content:
@@ -1134,7 +1254,9 @@ class CharacterAgent:
         response = await self._llm.generate_json(
             self._build_system_prompt(),
             post_prompt,
-            temperature=0.9
+            temperature=0.9,
+            priority=RequestPriority.FEED,
+            character_id=self.character_id
         )
         
         if response and response.get('content'):
@@ -1181,9 +1303,15 @@ class AgentManager:
     
     _instance = None
     
+    # 批量查询时IN列表的最大长度
+    HYDRATE_CHUNK_SIZE = 500
+    
     def __init__(self):
         self._agents: Dict[int, CharacterAgent] = {}
         self._llm_client: Optional[LLMClient] = None
+        
+        # 最近一次批量创建的耗时统计
+        self._last_hydration: Optional[Dict[str, Any]] = None
     
     @classmethod
     def get_instance(cls) -> 'AgentManager':
@@ -1227,6 +1355,123 @@ class AgentManager:
         self._agents[character_id] = agent
         return agent
     
+    async def create_agents(self, character_ids: List[int],
+                            db_session=None) -> List[CharacterAgent]:
+        """
+        批量创建Agent
+        
+        角色信息、个人记忆、物品栏各用一次集合查询加载（ID很多时按HYDRATE_CHUNK_SIZE分批），
+        共同记忆由共享存储加载一次，然后并发初始化各Agent
+        
+        Args:
+            character_ids: 角色ID列表
+            db_session: 数据库会话（所有Agent共用）
+            
+        Returns:
+            按character_ids顺序排列的Agent列表（已存在的直接返回，数据库中不存在的角色被跳过）
+        """
+        started = time.perf_counter()
+        
+        ids = list(dict.fromkeys(character_ids))
+        missing_ids = [cid for cid in ids if cid not in self._agents]
+        
+        timings = {'profiles_ms': 0.0, 'memories_ms': 0.0, 'inventory_ms': 0.0, 'build_ms': 0.0}
+        created = 0
+        
+        if missing_ids:
+            phase = time.perf_counter()
+            profiles = self._load_profiles(missing_ids, db_session)
+            timings['profiles_ms'] = (time.perf_counter() - phase) * 1000
+            
+            for cid in missing_ids:
+                if cid not in profiles:
+                    print(f"Character {cid} not found, skipped")
+            
+            memory_rows: Dict[int, List[Any]] = {}
+            inventory_rows: Dict[int, List[Any]] = {}
+            if db_session and profiles:
+                from api_server.models import Memory as MemoryModel, Inventory as InventoryModel
+                
+                phase = time.perf_counter()
+                get_common_memory_store().ensure_loaded(db_session)
+                memory_rows = self._load_rows_by_user(db_session, MemoryModel, list(profiles))
+                timings['memories_ms'] = (time.perf_counter() - phase) * 1000
+                
+                phase = time.perf_counter()
+                inventory_rows = self._load_rows_by_user(db_session, InventoryModel, list(profiles))
+                timings['inventory_ms'] = (time.perf_counter() - phase) * 1000
+            
+            phase = time.perf_counter()
+            agents = [
+                CharacterAgent(profile=profile, llm_client=self._llm_client, db_session=db_session)
+                for profile in profiles.values()
+            ]
+            if db_session:
+                await asyncio.gather(*[
+                    agent.initialize(
+                        memory_rows=memory_rows.get(agent.character_id, []),
+                        inventory_rows=inventory_rows.get(agent.character_id, [])
+                    )
+                    for agent in agents
+                ])
+            else:
+                await asyncio.gather(*[agent.initialize() for agent in agents])
+            
+            for agent in agents:
+                self._agents[agent.character_id] = agent
+            created = len(agents)
+            timings['build_ms'] = (time.perf_counter() - phase) * 1000
+        
+        self._last_hydration = {
+            'requested': len(ids),
+            'created': created,
+            **timings,
+            'total_ms': (time.perf_counter() - started) * 1000,
+        }
+        print(
+            f"Hydrated {self._last_hydration['created']} agents in "
+            f"{self._last_hydration['total_ms']:.0f}ms "
+            f"(profiles {timings['profiles_ms']:.0f}ms, memories {timings['memories_ms']:.0f}ms, "
+            f"inventory {timings['inventory_ms']:.0f}ms, build {timings['build_ms']:.0f}ms)"
+        )
+        
+        return [self._agents[cid] for cid in ids if cid in self._agents]
+    
+    def _load_profiles(self, character_ids: List[int],
+                       db_session) -> Dict[int, CharacterProfile]:
+        """批量加载角色配置（保持传入顺序）"""
+        if not db_session:
+            return {
+                cid: CharacterProfile(
+                    id=cid,
+                    name=f"角色{cid}",
+                    description="一个普通的社区居民"
+                )
+                for cid in character_ids
+            }
+        
+        from api_server.models import User
+        
+        users = {}
+        for i in range(0, len(character_ids), self.HYDRATE_CHUNK_SIZE):
+            chunk = character_ids[i:i + self.HYDRATE_CHUNK_SIZE]
+            for user in db_session.query(User).filter(User.id.in_(chunk)).all():
+                users[user.id] = user
+        
+        return {
+            cid: CharacterProfile.from_db_row(users[cid])
+            for cid in character_ids if cid in users
+        }
+    
+    def _load_rows_by_user(self, db_session, model, user_ids: List[int]) -> Dict[int, List[Any]]:
+        """按user_id批量查询并分组"""
+        grouped: Dict[int, List[Any]] = {}
+        for i in range(0, len(user_ids), self.HYDRATE_CHUNK_SIZE):
+            chunk = user_ids[i:i + self.HYDRATE_CHUNK_SIZE]
+            for row in db_session.query(model).filter(model.user_id.in_(chunk)).all():
+                grouped.setdefault(row.user_id, []).append(row)
+        return grouped
+    
     async def _load_profile(self, character_id: int, 
                             db_session) -> Optional[CharacterProfile]:
         """从数据库加载角色配置"""
@@ -1263,6 +1508,7 @@ class AgentManager:
         """获取管理器统计"""
         return {
             'total_agents': len(self._agents),
+            'last_hydration': self._last_hydration,
             'agents': [
                 {'id': aid, 'name': a.profile.name, 'state': a.state.value}
                 for aid, a in self._agents.items()
@@ -0,0 +1,168 @@
+"""
+共同记忆（世界设定）共享存储
+
+共同记忆对所有角色都相同，进程内只加载一份：
+- 所有MemorySystem引用同一个只读快照，不再各自查询和保存副本
+- 快照中预先渲染好提示词片段，构建提示词时直接拼接
+- 共同记忆变化时生成新快照并递增版本号，依赖它的缓存（如系统提示词前缀）随之失效
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from .memory import Memory, MemoryType
+
+
+@dataclass(frozen=True)
+class CommonMemorySnapshot:
+    """共同记忆的只读快照"""
+    version: int
+    memories: Tuple[Memory, ...] = ()
+    text: str = ""             # 各条内容按行拼接
+    prompt_block: str = ""     # 用于系统提示词的片段，没有共同记忆时为空
+
+    @classmethod
+    def build(cls, version: int, memories: Tuple[Memory, ...]) -> 'CommonMemorySnapshot':
+        text = "\n".join(m.content for m in memories)
+        return cls(
+            version=version,
+            memories=memories,
+            text=text,
+            prompt_block="【世界设定】\n" + text if memories else ""
+        )
+
+
+class CommonMemoryStore:
+    """
+    共同记忆存储
+
+    使用方式：
+        store = get_common_memory_store()
+        store.ensure_loaded(db)                 # 只有首次或失效后才查询
+        block = store.snapshot.prompt_block
+
+    通过 add/update/remove 修改共同记忆会立即生成新快照；
+    在其他地方直接修改了数据库时调用 invalidate()
+    """
+
+    def __init__(self):
+        self._snapshot = CommonMemorySnapshot(version=0)
+        self._loaded = False
+
+    @property
+    def snapshot(self) -> CommonMemorySnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def ensure_loaded(self, db) -> CommonMemorySnapshot:
+        """未加载或已失效时从数据库加载"""
+        if not self._loaded and db is not None:
+            self.reload(db)
+        return self._snapshot
+
+    def reload(self, db) -> CommonMemorySnapshot:
+        """从数据库重新加载，生成新快照"""
+        from api_server.models import Memory as MemoryModel
+
+        rows = db.query(MemoryModel).filter(
+            MemoryModel.memory_type == MemoryType.COMMON.value
+        ).order_by(MemoryModel.id).all()
+
+        memories = tuple(
+            Memory(
+                id=row.id,
+                memory_type=MemoryType.COMMON,
+                content=row.content,
+                character_id=row.user_id,
+                created_at=row.created_at,
+                updated_at=row.created_at,
+                game_day=row.game_day or 1,
+                importance=row.importance / 10.0 if row.importance else 0.5
+            )
+            for row in rows
+        )
+
+        self._snapshot = CommonMemorySnapshot.build(self._snapshot.version + 1, memories)
+        self._loaded = True
+        return self._snapshot
+
+    def invalidate(self, db=None):
+        """
+        标记共同记忆已变化
+
+        Args:
+            db: 提供时立即重新加载，否则在下次ensure_loaded时加载
+        """
+        self._loaded = False
+        if db is not None:
+            self.reload(db)
+
+    # ===== 修改 =====
+
+    def add(self, db, content: str, owner_id: int, importance: float = 0.5) -> Memory:
+        """
+        添加一条共同记忆
+
+        Args:
+            owner_id: 记录归属的用户ID（memories.user_id不能为空）
+        """
+        from api_server.models import Memory as MemoryModel
+
+        row = MemoryModel(
+            memory_type=MemoryType.COMMON.value,
+            content=content,
+            user_id=owner_id,
+            importance=int(importance * 10)
+        )
+        db.add(row)
+        db.commit()
+
+        self.reload(db)
+        return next(m for m in self._snapshot.memories if m.id == row.id)
+
+    def update(self, db, memory_id: int, content: str) -> bool:
+        """修改一条共同记忆"""
+        from api_server.models import Memory as MemoryModel
+
+        updated = db.query(MemoryModel).filter(
+            MemoryModel.id == memory_id,
+            MemoryModel.memory_type == MemoryType.COMMON.value
+        ).update({MemoryModel.content: content}, synchronize_session=False)
+        db.commit()
+
+        if updated:
+            self.reload(db)
+        return bool(updated)
+
+    def remove(self, db, memory_id: int) -> bool:
+        """删除一条共同记忆"""
+        from api_server.models import Memory as MemoryModel
+
+        deleted = db.query(MemoryModel).filter(
+            MemoryModel.id == memory_id,
+            MemoryModel.memory_type == MemoryType.COMMON.value
+        ).delete(synchronize_session=False)
+        db.commit()
+
+        if deleted:
+            self.reload(db)
+        return bool(deleted)
+
+
+# 全局实例
+_common_memory_store: Optional[CommonMemoryStore] = None
+
+
+def get_common_memory_store() -> CommonMemoryStore:
+    """获取全局CommonMemoryStore实例"""
+    global _common_memory_store
+    if _common_memory_store is None:
+        _common_memory_store = CommonMemoryStore()
+    return _common_memory_store
@@ -217,6 +217,10 @@ class Inventory:
             InventoryModel.user_id == self.character_id
         ).all()
         
+        self.load_from_rows(rows)
+    
+    def load_from_rows(self, rows):
+        """用已查询出的物品行初始化（批量加载多个角色时使用）"""
         for row in rows:
             item = self._item_from_db_row(row)
             self._items[item.id] = item
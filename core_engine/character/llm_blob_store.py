@@ -0,0 +1,208 @@
+"""
+LLM输入/输出内容存储模块
+
+行动日志中的完整prompt和LLM原始响应体积大、重复多（系统提示词几乎每次相同），
+这里把它们按内容的SHA-256寻址、zlib压缩后存入llm_blobs表：
+- 相同内容只存一份
+- action_logs只保存哈希，列表查询不读取大文本
+- 查看日志详情时再按哈希加载
+"""
+
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Optional, Dict, List, Iterable
+
+
+class LLMBlobStore:
+    """
+    按内容寻址的压缩文本存储
+
+    使用方式：
+        store = get_llm_blob_store()
+        hashes = store.put_many(db, [prompt, response])   # 不提交，由调用方commit
+        texts = store.get_many(db, hashes)
+    """
+
+    CODEC = "zlib"
+    COMPRESS_LEVEL = 6
+
+    # 记住最近写入/读到的哈希，重复内容不必再查库
+    KNOWN_HASHES_LIMIT = 4096
+
+    def __init__(self):
+        self._known_hashes: "OrderedDict[str, None]" = OrderedDict()
+
+        # 统计
+        self._stored = 0
+        self._deduplicated = 0
+        self._raw_bytes = 0
+        self._stored_bytes = 0
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """计算内容哈希"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def compress(cls, text: str) -> bytes:
+        return zlib.compress(text.encode('utf-8'), cls.COMPRESS_LEVEL)
+
+    @staticmethod
+    def decompress(codec: str, data: bytes) -> str:
+        if codec == "zlib":
+            return zlib.decompress(data).decode('utf-8')
+        if codec == "raw":
+            return data.decode('utf-8')
+        raise ValueError(f"Unknown blob codec: {codec}")
+
+    def _remember(self, hash_value: str):
+        self._known_hashes[hash_value] = None
+        self._known_hashes.move_to_end(hash_value)
+        while len(self._known_hashes) > self.KNOWN_HASHES_LIMIT:
+            self._known_hashes.popitem(last=False)
+
+    def put_many(self, db, texts: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """
+        写入一组文本（在当前事务中，不提交）
+
+        Args:
+            db: 数据库会话
+            texts: 文本列表，空文本不存储
+
+        Returns:
+            与输入一一对应的哈希列表，空文本对应None
+        """
+        from sqlalchemy import insert
+        from api_server.models import LLMBlob
+
+        hashes: List[Optional[str]] = []
+        new_texts: Dict[str, str] = {}
+        for text in texts:
+            if not text:
+                hashes.append(None)
+                continue
+            hash_value = self.hash_text(text)
+            hashes.append(hash_value)
+            if hash_value in self._known_hashes:
+                self._remember(hash_value)
+                self._deduplicated += 1
+            elif hash_value in new_texts:
+                self._deduplicated += 1
+            else:
+                new_texts[hash_value] = text
+
+        if new_texts:
+            existing = {
+                row[0] for row in db.query(LLMBlob.hash).filter(
+                    LLMBlob.hash.in_(list(new_texts))
+                ).all()
+            }
+            self._deduplicated += len(existing)
+
+            rows = []
+            for hash_value, text in new_texts.items():
+                if hash_value in existing:
+                    continue
+                data = self.compress(text)
+                rows.append({
+                    'hash': hash_value,
+                    'codec': self.CODEC,
+                    'data': data,
+                    'raw_size': len(text.encode('utf-8')),
+                })
+                self._raw_bytes += rows[-1]['raw_size']
+                self._stored_bytes += len(data)
+
+            if rows:
+                # 并发写入相同内容时忽略主键冲突
+                stmt = insert(LLMBlob)
+                dialect = db.get_bind().dialect.name
+                if dialect == "mysql":
+                    stmt = stmt.prefix_with("IGNORE")
+                elif dialect == "sqlite":
+                    stmt = stmt.prefix_with("OR IGNORE")
+                db.execute(stmt, rows)
+                self._stored += len(rows)
+
+            for hash_value in new_texts:
+                self._remember(hash_value)
+
+        return hashes
+
+    def forget_known_hashes(self):
+        """
+        清空已知哈希记录
+
+        写入所在的事务回滚后调用，避免之后把未落库的内容当作已存在
+        """
+        self._known_hashes.clear()
+
+    def get_many(self, db, hashes: Iterable[Optional[str]]) -> Dict[str, str]:
+        """
+        按哈希批量读取文本
+
+        Returns:
+            hash -> 文本（不存在的哈希不包含在结果中）
+        """
+        from api_server.models import LLMBlob
+
+        wanted = {h for h in hashes if h}
+        if not wanted:
+            return {}
+
+        rows = db.query(LLMBlob.hash, LLMBlob.codec, LLMBlob.data).filter(
+            LLMBlob.hash.in_(list(wanted))
+        ).all()
+        return {row.hash: self.decompress(row.codec, row.data) for row in rows}
+
+    def get(self, db, hash_value: Optional[str]) -> Optional[str]:
+        """按哈希读取文本"""
+        if not hash_value:
+            return None
+        return self.get_many(db, [hash_value]).get(hash_value)
+
+    def collect_garbage(self, db) -> int:
+        """
+        删除不再被任何行动日志引用的内容（在当前事务中，不提交）
+
+        Returns:
+            删除的条数
+        """
+        from sqlalchemy import select, union
+        from api_server.models import LLMBlob, ActionLog
+
+        referenced = union(
+            select(ActionLog.input_prompt_hash).where(ActionLog.input_prompt_hash.isnot(None)),
+            select(ActionLog.llm_response_hash).where(ActionLog.llm_response_hash.isnot(None))
+        ).subquery()
+
+        deleted = db.query(LLMBlob).filter(
+            LLMBlob.hash.notin_(select(referenced.c[0]))
+        ).delete(synchronize_session=False)
+        self._known_hashes.clear()
+        return deleted
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取存储统计"""
+        return {
+            'stored': self._stored,
+            'deduplicated': self._deduplicated,
+            'raw_bytes': self._raw_bytes,
+            'stored_bytes': self._stored_bytes,
+            'compression_ratio': (
+                self._stored_bytes / self._raw_bytes if self._raw_bytes else 0.0
+            ),
+        }
+
+
+# 全局实例
+_llm_blob_store: Optional[LLMBlobStore] = None
+
+
+def get_llm_blob_store() -> LLMBlobStore:
+    """获取全局LLMBlobStore实例"""
+    global _llm_blob_store
+    if _llm_blob_store is None:
+        _llm_blob_store = LLMBlobStore()
+    return _llm_blob_store
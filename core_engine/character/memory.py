@@ -2,14 +2,21 @@
 记忆系统模块
 
 管理AI角色的各类记忆：共同记忆、日常记忆、重要记忆、知识记忆、关系记忆
+
+数据库写入采用工作单元模式：记忆的增删改先记录在内存中，
+flush() 时在一个事务里统一写入；MemorySystem.flush_all() 可以把多个角色的
+变更合并到一个事务（如模拟器在日期切换时调用）
 """
 
 from enum import Enum
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Iterable, Set, Tuple, TYPE_CHECKING
 from datetime import datetime
 import json
 
+if TYPE_CHECKING:
+    from .common_memory import CommonMemoryStore
+
 
 class MemoryType(str, Enum):
     """记忆类型"""
@@ -102,12 +109,26 @@ class MemorySystem:
     MAX_KNOWLEDGE_MEMORIES = 50
     MAX_RELATIONSHIP_PER_TARGET = 1
     
-    def __init__(self, character_id: int, db_session=None):
+    def __init__(self, character_id: int, db_session=None, auto_flush: bool = True,
+                 common_store: 'CommonMemoryStore' = None):
+        """
+        Args:
+            character_id: 角色ID
+            db_session: 数据库会话，None表示仅内存
+            auto_flush: 每次修改记忆后立即写入数据库；
+                        为False时由调用方在合适的时机调用flush()/flush_all()
+            common_store: 共同记忆存储，默认使用进程内共享的全局实例
+        """
+        from .common_memory import get_common_memory_store
+        
         self.character_id = character_id
         self._db = db_session
+        self.auto_flush = auto_flush
+        
+        # 共同记忆（所有角色共享一份只读快照）
+        self._common_store = common_store or get_common_memory_store()
         
         # 内存缓存
-        self._common_memories: List[Memory] = []
         self._daily_memories: List[Memory] = []
         self._important_memory: Optional[Memory] = None
         self._knowledge_memories: List[Memory] = []
@@ -115,6 +136,29 @@ class MemorySystem:
         
         # ID计数器（内存模式）
         self._next_id = 1
+        
+        # 工作单元：尚未写入数据库的变更
+        # 新记忆在写入前使用负数临时ID，写入后替换为数据库ID
+        self._new: Dict[int, Memory] = {}      # 临时ID -> 记忆
+        self._dirty: Dict[int, Memory] = {}    # 记忆ID -> 记忆
+        self._deleted: Set[int] = set()
+        self._next_temp_id = -1
+        
+        # 版本号：记忆每次变化时递增，用于让依赖记忆的缓存（如系统提示词前缀）失效
+        self.version = 0
+    
+    def _bump_version(self):
+        """记忆发生变化"""
+        self.version += 1
+    
+    @property
+    def common_version(self) -> int:
+        """共同记忆的版本号（共同记忆变化时递增）"""
+        return self._common_store.version
+    
+    @property
+    def _common_memories(self) -> Tuple[Memory, ...]:
+        return self._common_store.snapshot.memories
     
     def load_from_db(self):
         """从数据库加载记忆"""
@@ -123,21 +167,22 @@ class MemorySystem:
         
         from api_server.models import Memory as MemoryModel
         
-        # 加载共同记忆（user_id为0或NULL表示共同记忆）
-        common_rows = self._db.query(MemoryModel).filter(
-            MemoryModel.memory_type == MemoryType.COMMON.value
-        ).all()
-        
-        for row in common_rows:
-            # 共同记忆：user_id可能为空或指向特殊用户
-            memory = self._memory_from_db_row(row)
-            self._common_memories.append(memory)
+        # 共同记忆由全局存储加载一次，所有角色共享
+        self._common_store.ensure_loaded(self._db)
         
         # 加载个人记忆
         personal_rows = self._db.query(MemoryModel).filter(
             MemoryModel.user_id == self.character_id
         ).all()
         
+        self.load_from_rows(personal_rows)
+    
+    def load_from_rows(self, personal_rows: Iterable[Any]):
+        """
+        用已查询出的个人记忆行初始化（批量加载多个角色时使用）
+        
+        共同记忆仍由全局存储提供，调用方需保证已加载
+        """
         for row in personal_rows:
             memory = self._memory_from_db_row(row)
             
@@ -155,8 +200,7 @@ class MemorySystem:
         self._daily_memories.sort(key=lambda m: m.game_day, reverse=True)
         
         # 更新ID计数器
-        all_ids = ([m.id for m in self._common_memories] +
-                   [m.id for m in self._daily_memories] +
+        all_ids = ([m.id for m in self._daily_memories] +
                    [m.id for m in self._knowledge_memories] +
                    [m.id for m in self._relationship_memories.values()])
         if self._important_memory:
@@ -164,6 +208,8 @@ class MemorySystem:
         
         if all_ids:
             self._next_id = max(all_ids) + 1
+        
+        self._bump_version()
     
     def _memory_from_db_row(self, row) -> Memory:
         """从数据库行创建Memory对象（适配数据库字段）"""
@@ -198,67 +244,180 @@ class MemorySystem:
         )
     
     def _generate_id(self) -> int:
-        """生成新的记忆ID"""
+        """生成新的记忆ID（数据库模式下为临时ID）"""
+        if self._db:
+            id = self._next_temp_id
+            self._next_temp_id -= 1
+            return id
         id = self._next_id
         self._next_id += 1
         return id
     
-    def _save_to_db(self, memory: Memory):
-        """保存记忆到数据库"""
+    # ===== 工作单元 =====
+    
+    @property
+    def has_pending_changes(self) -> bool:
+        """是否有尚未写入数据库的变更"""
+        return bool(self._new or self._dirty or self._deleted)
+    
+    def _mark_saved(self, memory: Memory):
+        """记录新增或修改的记忆"""
+        self._bump_version()
         if not self._db:
             return
         
-        from api_server.models import Memory as MemoryModel
+        if memory.id < 0:
+            self._new[memory.id] = memory
+        else:
+            self._dirty[memory.id] = memory
+    
+    def _mark_deleted(self, memory: Memory):
+        """记录删除的记忆"""
+        self._bump_version()
+        if not self._db:
+            return
         
-        # 检查是否已存在
-        existing = self._db.query(MemoryModel).filter(
-            MemoryModel.id == memory.id
-        ).first()
+        if memory.id < 0:
+            # 尚未写入数据库，直接丢弃
+            self._new.pop(memory.id, None)
+        else:
+            self._dirty.pop(memory.id, None)
+            self._deleted.add(memory.id)
+    
+    def _after_change(self):
+        """公开的修改方法结束时调用"""
+        if self.auto_flush:
+            self.flush()
+    
+    @staticmethod
+    def _to_db_memory_type(memory_type: MemoryType) -> str:
+        """转换memory_type（处理relationship vs relation差异）"""
+        value = memory_type.value
+        return 'relation' if value == 'relationship' else value
+    
+    def _collect_changes(self) -> Tuple[List[int], List[Dict[str, Any]], List[Tuple[Memory, Any]]]:
+        """
+        取出待写入的变更
         
-        # 转换memory_type（处理relationship vs relation差异）
-        db_memory_type = memory.memory_type.value
-        if db_memory_type == 'relationship':
-            db_memory_type = 'relation'
+        Returns:
+            (删除的ID列表, 按主键更新的行, (新记忆, 数据库对象) 列表)
+        """
+        from api_server.models import Memory as MemoryModel
         
-        if existing:
-            existing.content = memory.content
-            existing.importance = int(memory.importance * 10)  # 转换为1-10
-        else:
-            db_memory = MemoryModel(
-                memory_type=db_memory_type,
+        updates = [
+            {
+                'id': memory.id,
+                'content': memory.content,
+                'importance': int(memory.importance * 10)  # 转换为1-10
+            }
+            for memory in self._dirty.values()
+        ]
+        
+        inserts = [
+            (memory, MemoryModel(
+                memory_type=self._to_db_memory_type(memory.memory_type),
                 content=memory.content,
                 user_id=memory.character_id if memory.character_id else None,
                 target_user_id=memory.target_id,
                 game_day=memory.game_day,
                 importance=int(memory.importance * 10)
-            )
-            self._db.add(db_memory)
-            self._db.flush()  # 获取自动生成的ID
-            memory.id = db_memory.id
+            ))
+            for memory in self._new.values()
+        ]
         
-        self._db.commit()
+        return list(self._deleted), updates, inserts
     
-    def _delete_from_db(self, memory_id: int):
-        """从数据库删除记忆"""
-        if not self._db:
-            return
+    def _finish_flush(self, inserted_ids: List[Tuple[Memory, int]]):
+        """事务提交后：新记忆换上数据库ID，清空变更记录"""
+        for memory, memory_id in inserted_ids:
+            memory.id = memory_id
+        self._new.clear()
+        self._dirty.clear()
+        self._deleted.clear()
+    
+    def flush(self) -> bool:
+        """
+        把本角色的变更在一个事务中写入数据库
         
+        Returns:
+            是否成功（失败时变更保留，下次flush重试）
+        """
+        if not self._db or not self.has_pending_changes:
+            return True
+        return MemorySystem.flush_all([self]) >= 0
+    
+    @staticmethod
+    def flush_all(systems: Iterable['MemorySystem'], db_session=None) -> int:
+        """
+        把多个角色的变更合并到一个事务中写入
+        
+        删除合并为一条 DELETE ... IN，修改按主键批量UPDATE（无需先查询），
+        新增记忆一次性加入会话后flush获取ID
+        
+        Args:
+            systems: 记忆系统列表
+            db_session: 使用的数据库会话，默认使用第一个有变更的记忆系统的会话
+            
+        Returns:
+            写入的记忆系统数量，失败返回-1
+        """
+        pending = [m for m in systems if m._db and m.has_pending_changes]
+        if not pending:
+            return 0
+        
+        from sqlalchemy import update
         from api_server.models import Memory as MemoryModel
         
-        self._db.query(MemoryModel).filter(MemoryModel.id == memory_id).delete()
-        self._db.commit()
+        db = db_session or pending[0]._db
+        
+        deleted: List[int] = []
+        updates: List[Dict[str, Any]] = []
+        collected = []
+        for system in pending:
+            system_deleted, system_updates, system_inserts = system._collect_changes()
+            deleted.extend(system_deleted)
+            updates.extend(system_updates)
+            collected.append((system, system_inserts))
+        
+        try:
+            if deleted:
+                db.query(MemoryModel).filter(
+                    MemoryModel.id.in_(deleted)
+                ).delete(synchronize_session=False)
+            
+            if updates:
+                db.execute(update(MemoryModel), updates)
+            
+            new_objects = [db_memory for _, inserts in collected for _, db_memory in inserts]
+            if new_objects:
+                db.add_all(new_objects)
+                db.flush()  # 获取自动生成的ID
+            
+            # 在提交前读取ID：提交后对象过期（expire_on_commit），读取会逐个触发SELECT
+            inserted_ids = [
+                [(memory, db_memory.id) for memory, db_memory in inserts]
+                for _, inserts in collected
+            ]
+            
+            db.commit()
+        except Exception as e:
+            print(f"Memory flush error: {e}")
+            db.rollback()
+            return -1
+        
+        for (system, _), system_ids in zip(collected, inserted_ids):
+            system._finish_flush(system_ids)
+        return len(pending)
     
     # ===== 共同记忆 =====
     
     def get_common_memories(self) -> List[Memory]:
         """获取所有共同记忆"""
-        return self._common_memories.copy()
+        return list(self._common_memories)
     
     def get_common_memory_text(self) -> str:
         """获取共同记忆的文本表示"""
-        if not self._common_memories:
-            return ""
-        return "\n".join([m.content for m in self._common_memories])
+        return self._common_store.snapshot.text
     
     # ===== 日常记忆 =====
     
@@ -274,7 +433,8 @@ class MemorySystem:
                 # 更新现有记忆
                 mem.content = content
                 mem.updated_at = datetime.now()
-                self._save_to_db(mem)
+                self._mark_saved(mem)
+                self._after_change()
                 return mem
         
         # 创建新记忆
@@ -291,9 +451,10 @@ class MemorySystem:
         # 检查数量限制
         while len(self._daily_memories) > self.MAX_DAILY_MEMORIES:
             old_memory = self._daily_memories.pop()
-            self._delete_from_db(old_memory.id)
+            self._mark_deleted(old_memory)
         
-        self._save_to_db(memory)
+        self._mark_saved(memory)
+        self._after_change()
         return memory
     
     def get_daily_memories(self, limit: int = 14) -> List[Memory]:
@@ -333,7 +494,8 @@ class MemorySystem:
                 importance=1.0
             )
         
-        self._save_to_db(self._important_memory)
+        self._mark_saved(self._important_memory)
+        self._after_change()
         return self._important_memory
     
     def get_important_memory(self) -> Optional[Memory]:
@@ -380,9 +542,10 @@ class MemorySystem:
         if len(self._knowledge_memories) > self.MAX_KNOWLEDGE_MEMORIES:
             self._knowledge_memories.sort(key=lambda m: m.importance)
             old_memory = self._knowledge_memories.pop(0)
-            self._delete_from_db(old_memory.id)
+            self._mark_deleted(old_memory)
         
-        self._save_to_db(memory)
+        self._mark_saved(memory)
+        self._after_change()
         return memory
     
     def get_knowledge_memories(self) -> List[Memory]:
@@ -420,7 +583,8 @@ class MemorySystem:
             )
             self._relationship_memories[target_id] = memory
         
-        self._save_to_db(memory)
+        self._mark_saved(memory)
+        self._after_change()
         return memory
     
     def get_relationship_memory(self, target_id: int) -> Optional[Memory]:
@@ -477,7 +641,7 @@ class MemorySystem:
         sections = []
         
         if MemoryType.COMMON in include_types and self._common_memories:
-            sections.append("【世界设定】\n" + self.get_common_memory_text())
+            sections.append(self._common_store.snapshot.prompt_block)
         
         if MemoryType.IMPORTANT in include_types and self._important_memory:
             sections.append("【重要记忆】\n" + self.get_important_memory_text())
@@ -516,9 +680,12 @@ class MemorySystem:
         return {
             'character_id': self.character_id,
             'common_count': len(self._common_memories),
+            'common_version': self.common_version,
             'daily_count': len(self._daily_memories),
             'has_important': self._important_memory is not None,
             'important_length': len(self.get_important_memory_text()),
             'knowledge_count': len(self._knowledge_memories),
-            'relationship_count': len(self._relationship_memories)
+            'relationship_count': len(self._relationship_memories),
+            'version': self.version,
+            'pending_changes': len(self._new) + len(self._dirty) + len(self._deleted)
         }
@@ -0,0 +1,90 @@
+"""
+系统提示词组装模块
+
+按稳定性从高到低拼接系统提示词，让不同调用之间尽量共享相同的前缀，
+使LM Studio / llama.cpp 的前缀缓存（KV cache）能够命中：
+
+1. 全局固定内容：角色扮演说明、行为准则
+2. 共同记忆（所有角色相同）
+3. 角色设定（每个角色固定）
+4. 重要记忆（偶尔变化）
+5. 本次调用的上下文（每次都不同）
+
+前4部分渲染后缓存在Agent上，只有记忆系统或共同记忆发生变化时才重新渲染
+"""
+
+from typing import Optional, Tuple, TYPE_CHECKING
+
+from .memory import MemoryType
+
+if TYPE_CHECKING:
+    from .agent import CharacterProfile
+    from .memory import MemorySystem
+
+
+class SystemPromptBuilder:
+    """
+    系统提示词构建器
+
+    使用方式：
+        builder = SystemPromptBuilder(profile, memory)
+        system_prompt = builder.build(context)
+    """
+
+    INTRO = "你是一个生活在虚拟社区中的AI角色，需要像真人一样生活、思考和行动。"
+
+    RULES = "\n".join([
+        "【行为准则】",
+        "1. 根据自己的性格特点做出符合角色的反应",
+        "2. 记住之前发生的事情，保持行为的连贯性",
+        "3. 与其他角色交流时表现自然",
+        "4. 做出决策时考虑当前的身体状态和环境"
+    ])
+
+    def __init__(self, profile: 'CharacterProfile', memory: 'MemorySystem'):
+        self.profile = profile
+        self.memory = memory
+
+        self._cached_prefix: Optional[str] = None
+        self._cached_version: Optional[Tuple] = None
+
+    def _current_version(self) -> Tuple:
+        """前缀依赖的状态版本"""
+        return (self.memory.version, self.memory.common_version)
+
+    def get_stable_prefix(self) -> str:
+        """获取稳定前缀（记忆未变化时直接返回缓存）"""
+        version = self._current_version()
+        if self._cached_prefix is None or self._cached_version != version:
+            self._cached_prefix = self._render_prefix()
+            self._cached_version = version
+        return self._cached_prefix
+
+    def _render_prefix(self) -> str:
+        """渲染稳定前缀"""
+        parts = [self.INTRO, self.RULES]
+
+        # 共同记忆的提示词片段由共享存储预先渲染
+        common = self.memory.build_memory_prompt([MemoryType.COMMON])
+        if common:
+            parts.append(common)
+
+        parts.append(self.profile.to_prompt())
+
+        important = self.memory.build_memory_prompt([MemoryType.IMPORTANT])
+        if important:
+            parts.append(important)
+
+        return "\n\n".join(parts)
+
+    def build(self, context: str = "") -> str:
+        """构建完整的系统提示词（易变的上下文放在最后）"""
+        prefix = self.get_stable_prefix()
+        if context:
+            return prefix + "\n\n" + context
+        return prefix
+
+    def invalidate(self):
+        """使缓存失效（如角色设定被修改后）"""
+        self._cached_prefix = None
+        self._cached_version = None
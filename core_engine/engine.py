@@ -5,15 +5,18 @@
 """
 
 import asyncio
+import heapq
+import time
 from enum import Enum
 from dataclasses import dataclass, field
-from typing import Optional, Dict, Any, List, Callable, Awaitable
+from typing import Optional, Dict, Any, List, Callable, Awaitable, Tuple
 from datetime import datetime
 import json
 
 from .event_system.events import GameEvent, EventStatus, EventType
-from .event_system.event_queue import EventQueue
+from .event_system.event_queue import create_event_queue
 from .event_system.handlers import EventHandlerRegistry
+from .event_system.event_groups import group_independent_events
 
 
 class EngineState(str, Enum):
@@ -164,6 +167,30 @@ class GameState:
         return cls.from_dict(data)
 
 
+@dataclass
+class TimeSubscription:
+    """
+    时间订阅
+    
+    游戏时间每跨过一个边界触发一次回调：
+    - interval > 0：边界为所有满足 (t - offset) % interval == 0 的时刻（每N分钟、整点、零点）
+    - interval = 0：只在 offset 这一时刻触发一次
+    """
+    id: int
+    callback: Callable[[Any], Awaitable[None]]
+    interval: int = 0
+    offset: int = 0
+    name: str = "time"       # 出错日志中的回调名称
+    pass_day: bool = False   # 回调参数为当前天数（否则为GameTime）
+    next_time: int = 0       # 下一次触发的时间
+    
+    def first_after(self, time: int) -> int:
+        """time之后（不含）的第一个边界；一次性订阅返回其触发时间"""
+        if self.interval <= 0:
+            return self.offset
+        return time + self.interval - (time - self.offset) % self.interval
+
+
 class GameEngine:
     """
     游戏引擎
@@ -173,27 +200,59 @@ class GameEngine:
     - 事件调度和执行
     - 游戏状态管理
     - 暂停/恢复机制
+    
+    时间推进直接跳到下一个事件或订阅边界，不逐分钟循环；
+    回调通过 every / on_hour_change / on_day_change / at 订阅自己关心的时间边界。
+    游戏时间只由事件和订阅驱动：队列为空且没有订阅时时钟停止，
+    直到 schedule_event、新的订阅或 stop() 唤醒主循环；
+    需要空闲时时间照常流逝的调用方应订阅 on_tick 或 every
+    
+    同一时刻到期的事件一起取出：处理器为 parallel_safe 的事件按涉及的角色/地点分组，
+    互不相关的组并发执行（组内串行），执行完成后按出队顺序统一提交
+    （计数、推进时间、完成回调），结果与执行先后无关
     """
     
-    def __init__(self, db_session_factory: Optional[Callable] = None):
+    def __init__(self, db_session_factory: Optional[Callable] = None,
+                 event_queue_backend: str = "heap",
+                 max_concurrent_events: int = 8):
+        """
+        Args:
+            db_session_factory: 数据库会话工厂
+            event_queue_backend: 事件队列后端，'heap' 或 'timing_wheel'
+            max_concurrent_events: 同一时刻最多并发执行的事件组数（1表示全部串行）
+        """
         self.state = GameState()
-        self.event_queue = EventQueue()
+        self.event_queue = create_event_queue(event_queue_backend, self.state.game_time.total_minutes)
         self.handler_registry = EventHandlerRegistry.get_instance()
         self._db_session_factory = db_session_factory
+        self.max_concurrent_events = max(1, max_concurrent_events)
         
         # 运行控制
         self._running = False
         self._paused = False
         self._pause_event = asyncio.Event()
         self._pause_event.set()  # 初始不暂停
+        self._wakeup = asyncio.Event()  # 空闲时等待新的事件或订阅
+        
+        # 时间订阅
+        self._subscriptions: Dict[int, TimeSubscription] = {}
+        self._subscription_heap: List[Tuple[int, int]] = []  # (下次触发时间, 订阅ID)
+        self._subscriptions_time: int = self.game_time.total_minutes  # 订阅的触发时间基于的游戏时间
+        self._next_subscription_id = 1
         
         # 回调
-        self._on_tick_callbacks: List[Callable[[GameTime], Awaitable[None]]] = []
-        self._on_day_change_callbacks: List[Callable[[int], Awaitable[None]]] = []
         self._on_event_complete_callbacks: List[Callable[[GameEvent], Awaitable[None]]] = []
         
         # 当前正在执行的事件
-        self._current_event: Optional[GameEvent] = None
+        self._running_events: List[GameEvent] = []
+        
+        # 并发执行统计
+        self._concurrent_batches = 0
+        self._concurrent_events = 0
+        
+        # 主循环连续运行超过该时长（秒）后让出一次控制权
+        self.yield_interval = 0.005
+        self._last_yield = time.monotonic()
     
     @property
     def game_time(self) -> GameTime:
@@ -223,7 +282,9 @@ class GameEngine:
             print(f"Event conflict detected: {event} conflicts with {conflicts}")
             return None
         
-        return self.event_queue.add(event)
+        event_id = self.event_queue.add(event)
+        self._wakeup.set()
+        return event_id
     
     def cancel_event(self, event_id: int) -> bool:
         """取消事件"""
@@ -254,6 +315,7 @@ class GameEngine:
         self._running = False
         self._paused = False
         self._pause_event.set()
+        self._wakeup.set()
         self.state.engine_state = EngineState.STOPPED
         print(f"Game engine stopped at {self.game_time}")
     
@@ -273,13 +335,67 @@ class GameEngine:
             self.state.engine_state = EngineState.RUNNING
             print(f"Game engine resumed at {self.game_time}")
     
-    def on_tick(self, callback: Callable[[GameTime], Awaitable[None]]):
-        """注册每tick回调"""
-        self._on_tick_callbacks.append(callback)
+    # ===== 时间订阅 =====
+    
+    def _subscribe(self, callback: Callable[[Any], Awaitable[None]], interval: int = 0,
+                   offset: int = 0, name: str = "time", pass_day: bool = False) -> int:
+        subscription = TimeSubscription(
+            id=self._next_subscription_id,
+            callback=callback,
+            interval=interval,
+            offset=offset,
+            name=name,
+            pass_day=pass_day
+        )
+        self._next_subscription_id += 1
+        
+        self._sync_subscriptions()
+        subscription.next_time = subscription.first_after(self._subscriptions_time)
+        self._subscriptions[subscription.id] = subscription
+        heapq.heappush(self._subscription_heap, (subscription.next_time, subscription.id))
+        self._wakeup.set()
+        return subscription.id
+    
+    def every(self, minutes: int, callback: Callable[[GameTime], Awaitable[None]],
+              offset: int = 0) -> int:
+        """
+        订阅每N分钟的边界（游戏时间跨过 offset + k*minutes 时触发）
+        
+        Returns:
+            订阅ID
+        """
+        if minutes <= 0:
+            raise ValueError(f"Subscription interval must be positive, got {minutes}")
+        return self._subscribe(callback, interval=minutes, offset=offset, name="interval")
+    
+    def at(self, total_minutes: int, callback: Callable[[GameTime], Awaitable[None]]) -> int:
+        """
+        订阅指定时刻（只触发一次；时间已过时在下一次时间推进时触发）
+        
+        Returns:
+            订阅ID
+        """
+        return self._subscribe(callback, offset=total_minutes, name="time")
+    
+    def unsubscribe(self, subscription_id: int) -> bool:
+        """取消时间订阅"""
+        if self._subscriptions.pop(subscription_id, None) is None:
+            return False
+        self._subscription_heap = [(s.next_time, s.id) for s in self._subscriptions.values()]
+        heapq.heapify(self._subscription_heap)
+        return True
+    
+    def on_tick(self, callback: Callable[[GameTime], Awaitable[None]]) -> int:
+        """注册每tick（每游戏分钟）回调，只关心较粗的时间边界时应使用 every"""
+        return self._subscribe(callback, interval=1, name="tick")
     
-    def on_day_change(self, callback: Callable[[int], Awaitable[None]]):
-        """注册日期变更回调"""
-        self._on_day_change_callbacks.append(callback)
+    def on_hour_change(self, callback: Callable[[GameTime], Awaitable[None]]) -> int:
+        """注册整点回调"""
+        return self._subscribe(callback, interval=60, name="hour change")
+    
+    def on_day_change(self, callback: Callable[[int], Awaitable[None]]) -> int:
+        """注册日期变更回调（参数为新的天数）"""
+        return self._subscribe(callback, interval=24 * 60, name="day change", pass_day=True)
     
     def on_event_complete(self, callback: Callable[[GameEvent], Awaitable[None]]):
         """注册事件完成回调"""
@@ -298,8 +414,14 @@ class GameEngine:
             next_event = self.event_queue.peek()
             
             if next_event is None:
-                # 没有事件，推进1分钟
-                await self._advance_time(1)
+                # 没有事件：直接跳到下一个订阅边界；也没有订阅时等待新的事件
+                next_boundary = self._next_subscription_time()
+                if next_boundary is None:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                else:
+                    await self._advance_time(max(0, next_boundary - self.game_time.total_minutes))
+                    await self._yield_if_busy()
                 continue
             
             # 计算到下一个事件的时间
@@ -309,40 +431,154 @@ class GameEngine:
                 # 推进时间到事件开始
                 await self._advance_time(time_to_event)
             
-            # 执行事件
-            event = self.event_queue.pop()
-            if event:
-                await self._execute_event(event)
+            # 执行事件：队首连续的 parallel_safe 事件一起取出并发执行，其他事件逐个执行
+            if self.max_concurrent_events > 1 and self._is_parallel_safe(self.event_queue.peek()):
+                await self._execute_concurrently(self._pop_parallel_batch())
+            else:
+                event = self.event_queue.pop()
+                if event:
+                    await self._execute_event(event)
             
-            # 短暂让出控制权
-            await asyncio.sleep(0.01)
+            # 有其他协程时让出控制权
+            await self._yield_if_busy()
+    
+    async def _yield_if_busy(self):
+        """距上次让出超过 yield_interval 时让出一次控制权，避免主循环长时间占用事件循环"""
+        now = time.monotonic()
+        if now - self._last_yield >= self.yield_interval:
+            await asyncio.sleep(0)
+            self._last_yield = time.monotonic()
+    
+    def _next_subscription_time(self) -> Optional[int]:
+        """下一个订阅边界的时间"""
+        self._sync_subscriptions()
+        return self._subscription_heap[0][0] if self._subscription_heap else None
+    
+    def _sync_subscriptions(self):
+        """游戏时间被直接修改过（如加载存档）时，从当前时间重新计算周期订阅的下一次触发时间"""
+        now = self.game_time.total_minutes
+        if now == self._subscriptions_time:
+            return
+        
+        for subscription in self._subscriptions.values():
+            subscription.next_time = subscription.first_after(now)
+        self._subscription_heap = [(s.next_time, s.id) for s in self._subscriptions.values()]
+        heapq.heapify(self._subscription_heap)
+        self._subscriptions_time = now
     
     async def _advance_time(self, minutes: int):
-        """推进游戏时间"""
-        old_day = self.game_time.day
+        """
+        推进游戏时间
         
-        for _ in range(minutes):
-            self.game_time.advance(1)
+        直接跳过没有订阅边界的时间段；跨过的每个边界按时间顺序各触发一次，
+        触发时游戏时间为该边界，同一边界上的订阅按注册顺序触发
+        """
+        self._sync_subscriptions()
+        target = self.game_time.total_minutes + minutes
+        heap = self._subscription_heap
+        
+        while heap and heap[0][0] <= target:
+            boundary = heap[0][0]
+            due = []
+            while heap and heap[0][0] == boundary:
+                due.append(heapq.heappop(heap)[1])
+            
+            if boundary > self.game_time.total_minutes:
+                self.game_time.total_minutes = boundary
+            self._subscriptions_time = self.game_time.total_minutes
             
-            # 触发tick回调
-            for callback in self._on_tick_callbacks:
+            for subscription_id in sorted(due):
+                subscription = self._subscriptions.get(subscription_id)
+                if subscription is None:
+                    continue  # 在同一边界上被其他回调取消
+                
+                if subscription.interval > 0:
+                    subscription.next_time = boundary + subscription.interval
+                    heapq.heappush(self._subscription_heap, (subscription.next_time, subscription.id))
+                else:
+                    del self._subscriptions[subscription_id]
+                
+                arg = self.game_time.day if subscription.pass_day else self.game_time
                 try:
-                    await callback(self.game_time)
+                    await subscription.callback(arg)
                 except Exception as e:
-                    print(f"Error in tick callback: {e}")
+                    print(f"Error in {subscription.name} callback: {e}")
             
-            # 检查日期变更
-            if self.game_time.day != old_day:
-                old_day = self.game_time.day
-                for callback in self._on_day_change_callbacks:
-                    try:
-                        await callback(self.game_time.day)
-                    except Exception as e:
-                        print(f"Error in day change callback: {e}")
+            heap = self._subscription_heap  # 回调中取消订阅会重建堆
+        
+        self.game_time.total_minutes = target
+        self._subscriptions_time = target
+    
+    def _is_parallel_safe(self, event: Optional[GameEvent]) -> bool:
+        if event is None:
+            return False
+        handler = self.handler_registry.get_handler(event.event_type)
+        return handler is not None and handler.parallel_safe
+    
+    def _pop_parallel_batch(self) -> List[GameEvent]:
+        """
+        取出队首所有已到期、连续的 parallel_safe 事件
+        
+        遇到其他事件就停止：它们可能修改全局状态（或取消后面的事件），留在队列中单独执行
+        """
+        now = self.game_time.total_minutes
+        batch = []
+        while True:
+            event = self.event_queue.peek()
+            if event is None or event.scheduled_time > now or not self._is_parallel_safe(event):
+                break
+            batch.append(self.event_queue.pop())
+        return batch
+    
+    async def _execute_concurrently(self, events: List[GameEvent]):
+        """把互不相关的事件组并发执行，再按出队顺序提交"""
+        if not events:
+            return
+        
+        groups = group_independent_events(events)
+        if len(groups) == 1:
+            for event in events:
+                await self._execute_event(event)
+            return
+        
+        semaphore = asyncio.Semaphore(self.max_concurrent_events)
+        results: Dict[int, bool] = {}
+        
+        async def run_group(group: List[GameEvent]):
+            async with semaphore:
+                for event in group:
+                    results[id(event)] = await self._run_handler(event)
+        
+        await asyncio.gather(*(run_group(group) for group in groups))
+        self._concurrent_batches += 1
+        self._concurrent_events += len(events)
+        
+        # 按出队顺序提交；各事件同时开始，时间推进到最晚结束的事件
+        completed = [event for event in events if results.get(id(event))]
+        self.state.events_processed += len(completed)
+        duration = max((event.duration for event in completed), default=0)
+        if duration > 0:
+            await self._advance_time(duration)
+        for event in completed:
+            await self._fire_event_complete(event)
     
     async def _execute_event(self, event: GameEvent):
         """执行事件"""
-        self._current_event = event
+        success = await self._run_handler(event)
+        if not success:
+            return
+        
+        self.state.events_processed += 1
+        
+        # 推进事件持续时间
+        if event.duration > 0:
+            await self._advance_time(event.duration)
+        
+        await self._fire_event_complete(event)
+    
+    async def _run_handler(self, event: GameEvent) -> bool:
+        """调用事件处理器（不推进时间、不触发完成回调）"""
+        self._running_events.append(event)
         
         context = {
             'engine': self,
@@ -350,36 +586,31 @@ class GameEngine:
             'state': self.state,
         }
         
-        # 添加数据库会话
+        # 添加数据库会话（并发执行的事件各用各的会话）
         if self._db_session_factory:
             context['db'] = self._db_session_factory()
         
         try:
-            success = await self.handler_registry.execute(event, context)
-            
-            if success:
-                self.state.events_processed += 1
-                
-                # 推进事件持续时间
-                if event.duration > 0:
-                    await self._advance_time(event.duration)
-                
-                # 触发事件完成回调
-                for callback in self._on_event_complete_callbacks:
-                    try:
-                        await callback(event)
-                    except Exception as e:
-                        print(f"Error in event complete callback: {e}")
-            
+            return await self.handler_registry.execute(event, context)
+        
         except Exception as e:
             print(f"Error executing event {event}: {e}")
             event.status = EventStatus.FAILED
+            return False
         
         finally:
-            self._current_event = None
+            self._running_events.remove(event)
             if 'db' in context and hasattr(context['db'], 'close'):
                 context['db'].close()
     
+    async def _fire_event_complete(self, event: GameEvent):
+        """触发事件完成回调"""
+        for callback in self._on_event_complete_callbacks:
+            try:
+                await callback(event)
+            except Exception as e:
+                print(f"Error in event complete callback: {e}")
+    
     def save_state(self, filepath: str):
         """保存游戏状态"""
         self.state.save_to_file(filepath)
@@ -423,6 +654,14 @@ class GameEngine:
                 'indoor': self.state.indoor_temperature
             },
             'events_in_queue': len(self.event_queue),
+            'event_queue': self.event_queue.get_stats(),
             'events_processed': self.state.events_processed,
-            'current_event': self._current_event.to_dict() if self._current_event else None
+            'time_subscriptions': len(self._subscriptions),
+            'current_event': self._running_events[0].to_dict() if self._running_events else None,
+            'running_events': len(self._running_events),
+            'concurrency': {
+                'max_concurrent_events': self.max_concurrent_events,
+                'concurrent_batches': self._concurrent_batches,
+                'concurrent_events': self._concurrent_events,
+            }
         }
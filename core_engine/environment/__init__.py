@@ -2,6 +2,8 @@
 
 from .locations import Location, LocationType, LocationManager
 from .world import World, WorldConfig
+from .spatial_index import SpatialGrid, RectIndex
+from .position_store import PositionStore
 
 __all__ = [
     'Location',
@@ -9,4 +11,7 @@ __all__ = [
     'LocationManager',
     'World',
     'WorldConfig',
+    'SpatialGrid',
+    'RectIndex',
+    'PositionStore',
 ]
@@ -9,6 +9,8 @@ from dataclasses import dataclass, field
 from typing import Optional, Dict, List, Any, Set
 import math
 
+from .spatial_index import RectIndex
+
 
 class LocationType(str, Enum):
     """地点类型"""
@@ -178,32 +180,68 @@ class LocationManager:
     地点管理器
     
     管理游戏世界中的所有地点
+    
+    地点按矩形范围建立R树索引（全部地点一棵，每种类型各一棵），按名称/类型建立哈希索引，
+    位置查询不再遍历所有地点。地点的位置或大小变化后需要重新add
     """
     
     def __init__(self):
         self._locations: Dict[int, Location] = {}
         self._locations_by_type: Dict[LocationType, List[Location]] = {}
+        self._locations_by_name: Dict[str, List[Location]] = {}
         self._character_locations: Dict[int, int] = {}  # character_id -> location_id
+        
+        # 空间索引
+        self._spatial_index = RectIndex()
+        self._spatial_index_by_type: Dict[LocationType, RectIndex] = {}
     
     def add(self, location: Location):
-        """添加地点"""
+        """添加地点（ID已存在时替换）"""
+        if location.id in self._locations:
+            self._unindex(self._locations[location.id])
         self._locations[location.id] = location
         
         if location.location_type not in self._locations_by_type:
             self._locations_by_type[location.location_type] = []
         self._locations_by_type[location.location_type].append(location)
+        self._locations_by_name.setdefault(location.name, []).append(location)
+        
+        self._spatial_index.insert(location.id, location.bounds, location)
+        if location.location_type not in self._spatial_index_by_type:
+            self._spatial_index_by_type[location.location_type] = RectIndex()
+        self._spatial_index_by_type[location.location_type].insert(
+            location.id, location.bounds, location
+        )
     
     def remove(self, location_id: int):
         """移除地点"""
         if location_id in self._locations:
             location = self._locations[location_id]
             del self._locations[location_id]
-            
-            if location.location_type in self._locations_by_type:
-                self._locations_by_type[location.location_type] = [
-                    loc for loc in self._locations_by_type[location.location_type]
-                    if loc.id != location_id
-                ]
+            self._unindex(location)
+    
+    def _unindex(self, location: Location):
+        """从各索引中移除地点"""
+        location_id = location.id
+        if location.location_type in self._locations_by_type:
+            self._locations_by_type[location.location_type] = [
+                loc for loc in self._locations_by_type[location.location_type]
+                if loc.id != location_id
+            ]
+        
+        same_name = [
+            loc for loc in self._locations_by_name.get(location.name, [])
+            if loc.id != location_id
+        ]
+        if same_name:
+            self._locations_by_name[location.name] = same_name
+        else:
+            self._locations_by_name.pop(location.name, None)
+        
+        self._spatial_index.remove(location_id)
+        type_index = self._spatial_index_by_type.get(location.location_type)
+        if type_index:
+            type_index.remove(location_id)
     
     def get(self, location_id: int) -> Optional[Location]:
         """获取地点"""
@@ -211,10 +249,8 @@ class LocationManager:
     
     def get_by_name(self, name: str) -> Optional[Location]:
         """根据名称获取地点"""
-        for location in self._locations.values():
-            if location.name == name:
-                return location
-        return None
+        same_name = self._locations_by_name.get(name)
+        return same_name[0] if same_name else None
     
     def get_by_type(self, location_type: LocationType) -> List[Location]:
         """获取指定类型的所有地点"""
@@ -225,31 +261,30 @@ class LocationManager:
         return list(self._locations.values())
     
     def find_at_point(self, x: float, y: float) -> Optional[Location]:
-        """查找包含指定点的地点"""
-        for location in self._locations.values():
-            if location.contains_point(x, y):
-                return location
-        return None
+        """查找包含指定点的地点（多个地点重叠时返回最先添加的）"""
+        candidates = self._spatial_index.search_point(x, y)
+        return candidates[0] if candidates else None
     
     def find_nearby(self, x: float, y: float, radius: float) -> List[Location]:
-        """查找指定范围内的地点"""
-        nearby = []
-        for location in self._locations.values():
-            if location.distance_to_point(x, y) <= radius:
-                nearby.append(location)
+        """查找指定范围内的地点（按中心点距离）"""
+        # 中心点在圆内的地点，其矩形一定与圆的外接正方形相交
+        candidates = self._spatial_index.search(x - radius, y - radius, x + radius, y + radius)
+        nearby = [loc for loc in candidates if loc.distance_to_point(x, y) <= radius]
         return sorted(nearby, key=lambda loc: loc.distance_to_point(x, y))
     
     def find_nearest(self, x: float, y: float, 
                      location_type: Optional[LocationType] = None) -> Optional[Location]:
-        """查找最近的地点"""
-        candidates = self._locations.values()
+        """查找最近的地点（按中心点距离）"""
+        index = self._spatial_index
         if location_type:
-            candidates = self._locations_by_type.get(location_type, [])
-        
-        if not candidates:
-            return None
+            index = self._spatial_index_by_type.get(location_type)
+            if index is None:
+                return None
         
-        return min(candidates, key=lambda loc: loc.distance_to_point(x, y))
+        # 到中心点的距离不小于到矩形的距离，可以直接用作最佳优先搜索的距离
+        for _, location in index.iter_nearest(x, y, lambda loc: loc.distance_to_point(x, y)):
+            return location
+        return None
     
     def get_character_location(self, character_id: int) -> Optional[Location]:
         """获取角色当前所在地点"""
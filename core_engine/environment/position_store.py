@@ -0,0 +1,359 @@
+"""
+角色位置列式存储
+
+所有角色的位置和移动状态按列存放在数组中（每个角色一行）：
+- x, y: 当前位置
+- target_x, target_y: 移动目标（没有目标时为NaN）
+- speed: 移动速度（单位/分钟）
+- location_id, target_location_id: 当前/目标地点（没有时为-1）
+- moving: 是否正在移动
+
+时间推进时所有移动中的角色一次向量化计算完成，距离查询也按批计算。
+安装了numpy时使用numpy数组，否则退回到纯Python列表（结果相同，速度较慢）
+"""
+
+import math
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖
+    np = None
+
+HAS_NUMPY = np is not None
+
+NO_LOCATION = -1
+
+
+class PositionStore:
+    """
+    角色位置列式存储
+
+    使用方式：
+        store = PositionStore(on_move=grid.update)
+        store.add(character_id, x, y, location_id)
+        store.start_movement(character_id, tx, ty, speed)
+        arrived = store.advance(minutes)       # 所有移动中的角色一起推进
+
+    删除角色时用最后一行填补空位，行号会变化，外部应通过角色ID访问
+    """
+
+    INITIAL_CAPACITY = 64
+
+    FLOAT_COLUMNS = ('x', 'y', 'target_x', 'target_y', 'speed')
+    INT_COLUMNS = ('location_id', 'target_location_id')
+    BOOL_COLUMNS = ('moving',)
+
+    def __init__(self, default_speed: float = 5.0,
+                 on_move: Optional[Callable[[int, float, float], None]] = None):
+        """
+        Args:
+            default_speed: 默认移动速度
+            on_move: 位置变化回调 (character_id, x, y)，用于同步空间索引
+        """
+        self.default_speed = default_speed
+        self.on_move = on_move
+
+        self._size = 0
+        self._capacity = 0
+        self._rows: Dict[int, int] = {}      # character_id -> 行号
+        self._ids: list = []                 # 行号 -> character_id
+        self._columns: Dict[str, object] = {}
+        self._allocate(self.INITIAL_CAPACITY)
+
+    # ===== 存储管理 =====
+
+    def _new_column(self, name: str, capacity: int):
+        if name in self.FLOAT_COLUMNS:
+            fill = math.nan if name.startswith('target') else 0.0
+            if HAS_NUMPY:
+                return np.full(capacity, fill, dtype=np.float64)
+            return [fill] * capacity
+        if name in self.INT_COLUMNS:
+            if HAS_NUMPY:
+                return np.full(capacity, NO_LOCATION, dtype=np.int64)
+            return [NO_LOCATION] * capacity
+        if HAS_NUMPY:
+            return np.zeros(capacity, dtype=bool)
+        return [False] * capacity
+
+    def _allocate(self, capacity: int):
+        """扩容（按倍数增长）"""
+        for name in self.FLOAT_COLUMNS + self.INT_COLUMNS + self.BOOL_COLUMNS:
+            column = self._new_column(name, capacity)
+            old = self._columns.get(name)
+            if old is not None:
+                column[:self._size] = old[:self._size]
+            self._columns[name] = column
+        self._capacity = capacity
+
+    def column(self, name: str):
+        """获取某一列的有效部分（numpy下为视图，修改会写回存储）"""
+        return self._columns[name][:self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, character_id: int) -> bool:
+        return character_id in self._rows
+
+    @property
+    def character_ids(self) -> List[int]:
+        """按行号排列的角色ID"""
+        return list(self._ids)
+
+    def row_of(self, character_id: int) -> int:
+        """
+        获取角色所在行号
+
+        Raises:
+            KeyError: 角色不存在
+        """
+        return self._rows[character_id]
+
+    def add(self, character_id: int, x: float, y: float,
+            location_id: Optional[int] = None) -> int:
+        """添加角色（已存在时只更新位置），返回行号"""
+        if character_id in self._rows:
+            self.set_position(character_id, x, y, location_id)
+            return self._rows[character_id]
+
+        if self._size == self._capacity:
+            self._allocate(self._capacity * 2)
+
+        row = self._size
+        self._size += 1
+        self._rows[character_id] = row
+        self._ids.append(character_id)
+
+        cols = self._columns
+        cols['x'][row] = x
+        cols['y'][row] = y
+        cols['target_x'][row] = math.nan
+        cols['target_y'][row] = math.nan
+        cols['speed'][row] = self.default_speed
+        cols['location_id'][row] = location_id if location_id is not None else NO_LOCATION
+        cols['target_location_id'][row] = NO_LOCATION
+        cols['moving'][row] = False
+
+        if self.on_move:
+            self.on_move(character_id, x, y)
+        return row
+
+    def remove(self, character_id: int) -> bool:
+        """移除角色（用最后一行填补）"""
+        row = self._rows.pop(character_id, None)
+        if row is None:
+            return False
+
+        last = self._size - 1
+        if row != last:
+            for column in self._columns.values():
+                column[row] = column[last]
+            moved_id = self._ids[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._ids.pop()
+        self._size -= 1
+        return True
+
+    # ===== 单个角色 =====
+
+    def get(self, character_id: int, name: str):
+        """读取某个角色的一列值（NaN/-1 转换为None）"""
+        value = self._columns[name][self._rows[character_id]]
+        if name in self.FLOAT_COLUMNS:
+            value = float(value)
+            return None if math.isnan(value) else value
+        if name in self.INT_COLUMNS:
+            value = int(value)
+            return None if value == NO_LOCATION else value
+        return bool(value)
+
+    def set(self, character_id: int, name: str, value):
+        """写入某个角色的一列值（None 转换为NaN/-1）"""
+        if value is None:
+            value = math.nan if name in self.FLOAT_COLUMNS else NO_LOCATION
+        self._columns[name][self._rows[character_id]] = value
+        if name in ('x', 'y') and self.on_move:
+            self.on_move(character_id, *self.get_xy(character_id))
+
+    def get_xy(self, character_id: int) -> Tuple[float, float]:
+        row = self._rows[character_id]
+        return float(self._columns['x'][row]), float(self._columns['y'][row])
+
+    def set_position(self, character_id: int, x: float, y: float,
+                     location_id: Optional[int] = None):
+        """设置位置和所在地点"""
+        row = self._rows[character_id]
+        cols = self._columns
+        cols['x'][row] = x
+        cols['y'][row] = y
+        cols['location_id'][row] = location_id if location_id is not None else NO_LOCATION
+        if self.on_move:
+            self.on_move(character_id, x, y)
+
+    def start_movement(self, character_id: int, target_x: float, target_y: float,
+                       speed: Optional[float] = None,
+                       target_location_id: Optional[int] = None):
+        """设置移动目标"""
+        row = self._rows[character_id]
+        cols = self._columns
+        cols['target_x'][row] = target_x
+        cols['target_y'][row] = target_y
+        cols['speed'][row] = speed if speed is not None else self.default_speed
+        cols['target_location_id'][row] = (
+            target_location_id if target_location_id is not None else NO_LOCATION
+        )
+        cols['moving'][row] = True
+
+    def stop_movement(self, character_id: int):
+        """清除移动目标"""
+        row = self._rows[character_id]
+        cols = self._columns
+        cols['target_x'][row] = math.nan
+        cols['target_y'][row] = math.nan
+        cols['target_location_id'][row] = NO_LOCATION
+        cols['moving'][row] = False
+
+    # ===== 批量计算 =====
+
+    def advance(self, minutes: float) -> List[Tuple[int, Optional[int]]]:
+        """
+        所有移动中的角色按各自速度向目标移动minutes分钟
+
+        Returns:
+            本次到达目标的 (角色ID, 目标地点ID) 列表
+        """
+        if minutes <= 0 or self._size == 0:
+            return []
+        if HAS_NUMPY:
+            moved_rows, arrived_rows = self._advance_numpy(minutes)
+        else:
+            moved_rows, arrived_rows = self._advance_python(minutes)
+
+        cols = self._columns
+        if self.on_move:
+            for row in moved_rows:
+                self.on_move(self._ids[row], float(cols['x'][row]), float(cols['y'][row]))
+
+        arrived = []
+        for row in arrived_rows:
+            target_location = int(cols['target_location_id'][row])
+            arrived.append((
+                self._ids[row],
+                None if target_location == NO_LOCATION else target_location
+            ))
+            cols['target_location_id'][row] = NO_LOCATION
+        return arrived
+
+    def _advance_numpy(self, minutes: float):
+        n = self._size
+        cols = self._columns
+        rows = np.flatnonzero(cols['moving'][:n])
+        if rows.size == 0:
+            return [], []
+
+        x, y = cols['x'][rows], cols['y'][rows]
+        dx = cols['target_x'][rows] - x
+        dy = cols['target_y'][rows] - y
+        dist = np.hypot(dx, dy)
+        step = cols['speed'][rows] * minutes
+
+        arrive = step >= dist
+        ratio = np.divide(step, dist, out=np.ones_like(dist), where=dist > 0)
+        ratio = np.where(arrive, 1.0, ratio)
+
+        cols['x'][rows] = x + dx * ratio
+        cols['y'][rows] = y + dy * ratio
+
+        arrived_rows = rows[arrive]
+        cols['moving'][arrived_rows] = False
+        cols['target_x'][arrived_rows] = np.nan
+        cols['target_y'][arrived_rows] = np.nan
+        return rows.tolist(), arrived_rows.tolist()
+
+    def _advance_python(self, minutes: float):
+        cols = self._columns
+        xs, ys, txs, tys = cols['x'], cols['y'], cols['target_x'], cols['target_y']
+        moved_rows, arrived_rows = [], []
+        for row in range(self._size):
+            if not cols['moving'][row]:
+                continue
+            dx, dy = txs[row] - xs[row], tys[row] - ys[row]
+            dist = math.hypot(dx, dy)
+            step = cols['speed'][row] * minutes
+            moved_rows.append(row)
+            if step >= dist:
+                xs[row], ys[row] = txs[row], tys[row]
+                txs[row] = tys[row] = math.nan
+                cols['moving'][row] = False
+                arrived_rows.append(row)
+            else:
+                xs[row] += dx * step / dist
+                ys[row] += dy * step / dist
+        return moved_rows, arrived_rows
+
+    def _rows_for(self, character_ids: Sequence[int]):
+        rows = [self._rows[c] for c in character_ids]
+        return np.asarray(rows, dtype=np.int64) if HAS_NUMPY else rows
+
+    def distances_to_point(self, x: float, y: float,
+                           character_ids: Optional[Sequence[int]] = None) -> list:
+        """
+        一组角色（默认全部，按行号顺序）到某点的距离
+
+        Returns:
+            距离数组（numpy下为ndarray）
+        """
+        if character_ids is None:
+            xs, ys = self.column('x'), self.column('y')
+        else:
+            rows = self._rows_for(character_ids)
+            if HAS_NUMPY:
+                xs, ys = self._columns['x'][rows], self._columns['y'][rows]
+            else:
+                xs = [self._columns['x'][r] for r in rows]
+                ys = [self._columns['y'][r] for r in rows]
+
+        if HAS_NUMPY:
+            return np.hypot(xs - x, ys - y)
+        return [math.hypot(px - x, py - y) for px, py in zip(xs, ys)]
+
+    def pairwise_distances(self, ids_a: Sequence[int],
+                           ids_b: Optional[Sequence[int]] = None):
+        """
+        两组角色之间的距离矩阵（ids_b默认与ids_a相同）
+
+        Returns:
+            len(ids_a) x len(ids_b) 的矩阵（numpy下为ndarray，否则为嵌套列表）
+        """
+        if ids_b is None:
+            ids_b = ids_a
+        rows_a, rows_b = self._rows_for(ids_a), self._rows_for(ids_b)
+        xs, ys = self._columns['x'], self._columns['y']
+
+        if HAS_NUMPY:
+            ax, ay = xs[rows_a], ys[rows_a]
+            bx, by = xs[rows_b], ys[rows_b]
+            return np.hypot(ax[:, None] - bx[None, :], ay[:, None] - by[None, :])
+        return [
+            [math.hypot(xs[a] - xs[b], ys[a] - ys[b]) for b in rows_b]
+            for a in rows_a
+        ]
+
+    def travel_times(self, character_ids: Sequence[int],
+                     target_xs: Sequence[float], target_ys: Sequence[float],
+                     speed: float) -> List[int]:
+        """一组角色以给定速度走到各自目标所需的分钟数（至少1分钟）"""
+        rows = self._rows_for(character_ids)
+        xs, ys = self._columns['x'], self._columns['y']
+
+        if HAS_NUMPY:
+            dist = np.hypot(np.asarray(target_xs, dtype=np.float64) - xs[rows],
+                            np.asarray(target_ys, dtype=np.float64) - ys[rows])
+            return np.maximum(1, (dist / speed).astype(np.int64)).tolist()
+        return [
+            max(1, int(math.hypot(tx - xs[r], ty - ys[r]) / speed))
+            for r, tx, ty in zip(rows, target_xs, target_ys)
+        ]
@@ -0,0 +1,462 @@
+"""
+空间索引模块
+
+- SpatialGrid: 均匀网格（空间哈希）索引，用于频繁移动的角色位置
+  - 半径查询只检查覆盖圆的网格，代价与附近的角色数量相关，而不是总人数
+  - k近邻查询按网格环向外扩展，找够k个且不可能有更近的点时停止
+- RectIndex: STR批量构建的R树，用于很少变化的地点矩形
+  - 点查询、范围查询、最近邻查询都只访问相关的节点
+"""
+
+import heapq
+import math
+from typing import Callable, Dict, List, Optional, Set, Tuple, Iterable, Iterator
+
+Cell = Tuple[int, int]
+
+
+class SpatialGrid:
+    """
+    均匀网格空间索引
+
+    使用方式：
+        grid = SpatialGrid(cell_size=20.0)
+        grid.update(character_id, x, y)
+        nearby = grid.query_radius(x, y, 30.0)
+        nearest = grid.nearest(x, y, k=5)
+
+    cell_size 取常用查询半径的量级时效果最好
+    """
+
+    def __init__(self, cell_size: float = 20.0):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+
+        self._cells: Dict[Cell, Set[int]] = {}
+        self._positions: Dict[int, Tuple[float, float]] = {}
+        self._item_cells: Dict[int, Cell] = {}
+
+        # 出现过点的网格范围 (min_cx, min_cy, max_cx, max_cy)，只扩大不收缩
+        self._bounds: Tuple[int, int, int, int] = (0, 0, 0, 0)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._positions
+
+    def _cell_of(self, x: float, y: float) -> Cell:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    # ===== 维护 =====
+
+    def update(self, item_id: int, x: float, y: float):
+        """插入或更新一个点"""
+        cell = self._cell_of(x, y)
+        old_cell = self._item_cells.get(item_id)
+
+        if old_cell != cell:
+            if old_cell is not None:
+                self._discard_from_cell(old_cell, item_id)
+            if not self._positions:
+                self._bounds = (cell[0], cell[1], cell[0], cell[1])
+            else:
+                min_cx, min_cy, max_cx, max_cy = self._bounds
+                self._bounds = (min(min_cx, cell[0]), min(min_cy, cell[1]),
+                                max(max_cx, cell[0]), max(max_cy, cell[1]))
+            self._cells.setdefault(cell, set()).add(item_id)
+            self._item_cells[item_id] = cell
+
+        self._positions[item_id] = (x, y)
+
+    def remove(self, item_id: int):
+        """移除一个点"""
+        cell = self._item_cells.pop(item_id, None)
+        if cell is not None:
+            self._discard_from_cell(cell, item_id)
+        self._positions.pop(item_id, None)
+
+    def clear(self):
+        self._cells.clear()
+        self._positions.clear()
+        self._item_cells.clear()
+
+    def _discard_from_cell(self, cell: Cell, item_id: int):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(item_id)
+            if not members:
+                del self._cells[cell]
+
+    def get_position(self, item_id: int) -> Optional[Tuple[float, float]]:
+        return self._positions.get(item_id)
+
+    # ===== 查询 =====
+
+    def _cells_in_range(self, min_cx: int, max_cx: int,
+                        min_cy: int, max_cy: int) -> Iterable[Set[int]]:
+        """矩形网格范围内的非空网格（范围很大时改为遍历已占用的网格）"""
+        span = (max_cx - min_cx + 1) * (max_cy - min_cy + 1)
+        if span > len(self._cells):
+            for (cx, cy), members in self._cells.items():
+                if min_cx <= cx <= max_cx and min_cy <= cy <= max_cy:
+                    yield members
+        else:
+            cells = self._cells
+            for cx in range(min_cx, max_cx + 1):
+                for cy in range(min_cy, max_cy + 1):
+                    members = cells.get((cx, cy))
+                    if members:
+                        yield members
+
+    def query_radius_with_distance(self, x: float, y: float,
+                                   radius: float) -> List[Tuple[int, float]]:
+        """
+        半径查询
+
+        Returns:
+            (ID, 距离) 列表，按距离从近到远排序
+        """
+        if radius < 0 or not self._positions:
+            return []
+
+        min_cx, min_cy = self._cell_of(x - radius, y - radius)
+        max_cx, max_cy = self._cell_of(x + radius, y + radius)
+
+        radius_sq = radius * radius
+        positions = self._positions
+        result = []
+        for members in self._cells_in_range(min_cx, max_cx, min_cy, max_cy):
+            for item_id in members:
+                px, py = positions[item_id]
+                dist_sq = (px - x) ** 2 + (py - y) ** 2
+                if dist_sq <= radius_sq:
+                    result.append((item_id, dist_sq))
+
+        result.sort(key=lambda r: (r[1], r[0]))
+        return [(item_id, math.sqrt(dist_sq)) for item_id, dist_sq in result]
+
+    def query_radius(self, x: float, y: float, radius: float) -> List[int]:
+        """半径查询，返回按距离排序的ID列表"""
+        return [item_id for item_id, _ in self.query_radius_with_distance(x, y, radius)]
+
+    def nearest(self, x: float, y: float, k: int = 1,
+                max_radius: Optional[float] = None,
+                exclude: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        """
+        k近邻查询
+
+        Args:
+            k: 返回数量
+            max_radius: 最大搜索半径，None表示不限
+            exclude: 排除的ID（如查询者自己）
+
+        Returns:
+            (ID, 距离) 列表，按距离从近到远排序
+        """
+        if k <= 0 or not self._cells:
+            return []
+
+        exclude = exclude or set()
+        cx0, cy0 = self._cell_of(x, y)
+
+        # 超出所有点的范围后不必继续扩展
+        min_cx, min_cy, max_cx, max_cy = self._bounds
+        max_ring = max(cx0 - min_cx, max_cx - cx0, cy0 - min_cy, max_cy - cy0)
+
+        positions = self._positions
+        candidates: List[Tuple[float, int]] = []
+        ring = 0
+        while True:
+            # 检查第ring圈网格
+            if ring == 0:
+                ring_cells = [(cx0, cy0)]
+            else:
+                ring_cells = []
+                for d in range(-ring, ring + 1):
+                    ring_cells.append((cx0 + d, cy0 - ring))
+                    ring_cells.append((cx0 + d, cy0 + ring))
+                for d in range(-ring + 1, ring):
+                    ring_cells.append((cx0 - ring, cy0 + d))
+                    ring_cells.append((cx0 + ring, cy0 + d))
+
+            for cell in ring_cells:
+                members = self._cells.get(cell)
+                if not members:
+                    continue
+                for item_id in members:
+                    if item_id in exclude:
+                        continue
+                    px, py = positions[item_id]
+                    candidates.append(((px - x) ** 2 + (py - y) ** 2, item_id))
+
+            # 未检查的点距离至少为 ring * cell_size
+            searched = ring * self.cell_size
+            if len(candidates) >= k:
+                candidates.sort()
+                if candidates[k - 1][0] <= searched * searched:
+                    break
+            if max_radius is not None and searched >= max_radius:
+                break
+            if ring >= max_ring:
+                break
+            ring += 1
+
+        candidates.sort()
+        result = []
+        for dist_sq, item_id in candidates[:k]:
+            dist = math.sqrt(dist_sq)
+            if max_radius is not None and dist > max_radius:
+                break
+            result.append((item_id, dist))
+        return result
+
+    def pairs_within(self, radius: float) -> List[Tuple[int, int]]:
+        """
+        找出所有距离不超过radius的点对（每对只出现一次，小ID在前）
+
+        每个网格只与自身和右/下方向的相邻网格比较
+        """
+        if radius < 0:
+            return []
+
+        reach = max(1, math.ceil(radius / self.cell_size))
+        radius_sq = radius * radius
+        positions = self._positions
+        cells = self._cells
+
+        pairs = []
+        for (cx, cy), members in cells.items():
+            members_list = list(members)
+            # 同一网格内
+            for i, a in enumerate(members_list):
+                ax, ay = positions[a]
+                for b in members_list[i + 1:]:
+                    bx, by = positions[b]
+                    if (ax - bx) ** 2 + (ay - by) ** 2 <= radius_sq:
+                        pairs.append((a, b) if a < b else (b, a))
+
+            # 相邻网格（只取一半方向，避免重复）
+            for dx in range(0, reach + 1):
+                for dy in range(-reach, reach + 1):
+                    if dx == 0 and dy <= 0:
+                        continue
+                    other = cells.get((cx + dx, cy + dy))
+                    if not other:
+                        continue
+                    for a in members_list:
+                        ax, ay = positions[a]
+                        for b in other:
+                            bx, by = positions[b]
+                            if (ax - bx) ** 2 + (ay - by) ** 2 <= radius_sq:
+                                pairs.append((a, b) if a < b else (b, a))
+        return pairs
+
+
+Bounds = Tuple[float, float, float, float]  # (min_x, min_y, max_x, max_y)
+
+
+class RectIndex:
+    """
+    矩形R树索引（STR批量构建）
+
+    用于地点这类很少变化的矩形：
+    - 构建时按STR（Sort-Tile-Recursive）算法把矩形打包成节点，树高约为 log16(N)
+    - 新增的矩形先放入待合并列表，删除只做标记；
+      改动累计超过阈值后，在下一次查询前整体重建
+
+    使用方式：
+        index = RectIndex()
+        index.insert(location.id, location.bounds, location)
+        items = index.search(x1, y1, x2, y2)
+        for dist, item in index.iter_nearest(x, y, distance_fn): ...
+    """
+
+    NODE_CAPACITY = 16
+
+    # 待合并/已删除的数量超过 max(REBUILD_MIN, 总数 * REBUILD_RATIO) 时重建
+    REBUILD_MIN = 32
+    REBUILD_RATIO = 0.1
+
+    def __init__(self):
+        # item_id -> (seq, bounds, item)；seq为插入顺序，结果相同时按插入顺序返回
+        self._entries: Dict[int, Tuple[int, Bounds, object]] = {}
+        self._seq = 0
+
+        self._root: Optional[list] = None
+        self._tree_ids: Set[int] = set()
+        self._pending: Set[int] = set()    # 构建后新增，尚未进入树
+        self._removed: Set[int] = set()    # 树中已删除或已被替换的条目
+
+        self.rebuild_count = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._entries
+
+    # ===== 维护 =====
+
+    def insert(self, item_id: int, bounds: Bounds, item: object):
+        """插入或替换一个矩形"""
+        if item_id in self._tree_ids:
+            self._removed.add(item_id)
+        self._entries[item_id] = (self._seq, bounds, item)
+        self._seq += 1
+        self._pending.add(item_id)
+
+    def remove(self, item_id: int):
+        """删除一个矩形"""
+        if self._entries.pop(item_id, None) is None:
+            return
+        self._pending.discard(item_id)
+        if item_id in self._tree_ids:
+            self._removed.add(item_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._root = None
+        self._tree_ids.clear()
+        self._pending.clear()
+        self._removed.clear()
+
+    def _maybe_rebuild(self):
+        changes = len(self._pending) + len(self._removed)
+        if changes > max(self.REBUILD_MIN, len(self._entries) * self.REBUILD_RATIO):
+            self.rebuild()
+
+    def rebuild(self):
+        """用当前全部矩形重新构建树"""
+        leaves = [
+            (bounds[0], bounds[1], bounds[2], bounds[3], (seq, item_id, item))
+            for item_id, (seq, bounds, item) in self._entries.items()
+        ]
+        self._root = self._pack(leaves, is_leaf=True) if leaves else None
+        self._tree_ids = set(self._entries)
+        self._pending.clear()
+        self._removed.clear()
+        self.rebuild_count += 1
+
+    def _pack(self, children: list, is_leaf: bool) -> list:
+        """
+        STR打包：按x排序切成竖条，每条内按y排序后每NODE_CAPACITY个组成一个节点，
+        逐层向上直到只剩一个根节点
+
+        节点结构：[min_x, min_y, max_x, max_y, children, is_leaf]
+        """
+        cap = self.NODE_CAPACITY
+        while True:
+            n_nodes = math.ceil(len(children) / cap)
+            n_slices = math.ceil(math.sqrt(n_nodes))
+            slice_size = n_slices * cap
+
+            children.sort(key=lambda c: c[0] + c[2])
+            nodes = []
+            for i in range(0, len(children), slice_size):
+                strip = sorted(children[i:i + slice_size], key=lambda c: c[1] + c[3])
+                for j in range(0, len(strip), cap):
+                    group = strip[j:j + cap]
+                    nodes.append([
+                        min(c[0] for c in group), min(c[1] for c in group),
+                        max(c[2] for c in group), max(c[3] for c in group),
+                        group, is_leaf
+                    ])
+
+            if len(nodes) == 1:
+                return nodes[0]
+            children = nodes
+            is_leaf = False
+
+    # ===== 查询 =====
+
+    def search(self, min_x: float, min_y: float,
+               max_x: float, max_y: float) -> List[object]:
+        """查找与矩形范围相交的所有条目，按插入顺序返回"""
+        self._maybe_rebuild()
+
+        found = []
+        removed = self._removed
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            for c in node[4]:
+                if c[0] > max_x or c[2] < min_x or c[1] > max_y or c[3] < min_y:
+                    continue
+                if node[5]:
+                    if c[4][1] not in removed:
+                        found.append(c[4])
+                else:
+                    stack.append(c)
+
+        for item_id in self._pending:
+            seq, bounds, item = self._entries[item_id]
+            if not (bounds[0] > max_x or bounds[2] < min_x or
+                    bounds[1] > max_y or bounds[3] < min_y):
+                found.append((seq, item_id, item))
+
+        found.sort(key=lambda f: f[0])
+        return [item for _, _, item in found]
+
+    def search_point(self, x: float, y: float) -> List[object]:
+        """查找包含某点的所有条目，按插入顺序返回"""
+        return self.search(x, y, x, y)
+
+    @staticmethod
+    def _min_dist(x: float, y: float, min_x: float, min_y: float,
+                  max_x: float, max_y: float) -> float:
+        """点到矩形的最短距离"""
+        dx = max(min_x - x, 0.0, x - max_x)
+        dy = max(min_y - y, 0.0, y - max_y)
+        return math.sqrt(dx * dx + dy * dy)
+
+    def iter_nearest(self, x: float, y: float,
+                     distance: Optional[Callable[[object], float]] = None
+                     ) -> Iterator[Tuple[float, object]]:
+        """
+        按距离从近到远遍历条目（最佳优先搜索）
+
+        Args:
+            distance: 条目到查询点的距离，默认为到矩形的最短距离；
+                自定义距离不能小于到矩形的最短距离（如到矩形中心的距离）
+
+        Yields:
+            (距离, 条目)，距离相同时按插入顺序
+        """
+        self._maybe_rebuild()
+
+        min_dist = self._min_dist
+        removed = self._removed
+        heap: list = []
+        counter = 0
+
+        def item_distance(bounds, item):
+            if distance is None:
+                return min_dist(x, y, *bounds)
+            return distance(item)
+
+        # 堆元素：(距离下界, 次序, 类型, 对象)；节点的次序为-1，距离相同时先展开节点
+        if self._root:
+            root = self._root
+            heap.append((min_dist(x, y, root[0], root[1], root[2], root[3]), -1, counter, root))
+        for item_id in self._pending:
+            seq, bounds, item = self._entries[item_id]
+            counter += 1
+            heapq.heappush(heap, (item_distance(bounds, item), seq, counter, item))
+
+        while heap:
+            dist, seq, _, obj = heapq.heappop(heap)
+            if seq >= 0:
+                yield dist, obj
+                continue
+            node = obj
+            for c in node[4]:
+                counter += 1
+                if node[5]:
+                    c_seq, item_id, item = c[4]
+                    if item_id in removed:
+                        continue
+                    heapq.heappush(heap, (item_distance(c[:4], item), c_seq, counter, item))
+                else:
+                    heapq.heappush(heap, (min_dist(x, y, c[0], c[1], c[2], c[3]), -1, counter, c))
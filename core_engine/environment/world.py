@@ -5,11 +5,13 @@
 """
 
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Any, Set
+from typing import Optional, Dict, List, Any, Set, Tuple
 from enum import Enum
 import random
 
 from .locations import Location, LocationType, LocationManager
+from .spatial_index import SpatialGrid
+from .position_store import PositionStore
 
 
 class Weather(str, Enum):
@@ -49,6 +51,12 @@ class WorldConfig:
     default_walk_speed: float = 5.0   # 默认步行速度（单位/分钟）
     default_run_speed: float = 10.0   # 默认跑步速度
     
+    # 开启时move_character_to沿路线逐步移动（由advance_movement推进），关闭时直接到达
+    continuous_movement: bool = False
+    
+    # 空间索引网格边长，取常用查询半径（感知30、相遇5）的量级
+    spatial_cell_size: float = 20.0
+    
     # 疲劳配置
     fatigue_per_minute_active: float = 0.1   # 活动时每分钟疲劳消耗
     fatigue_per_minute_walking: float = 0.2  # 行走时每分钟疲劳消耗
@@ -64,30 +72,99 @@ class WorldConfig:
     })
 
 
-@dataclass
 class CharacterPosition:
-    """角色位置信息"""
-    character_id: int
-    x: float
-    y: float
-    location_id: Optional[int] = None
-    is_moving: bool = False
-    target_x: Optional[float] = None
-    target_y: Optional[float] = None
+    """
+    角色位置信息
+    
+    PositionStore中一行的视图，读写属性直接访问存储中的数据。
+    单独创建时（不传store）使用一个只有自己一行的私有存储
+    """
+    
+    __slots__ = ('character_id', '_store')
+    
+    def __init__(self, character_id: int, x: float = 0.0, y: float = 0.0,
+                 location_id: Optional[int] = None, is_moving: bool = False,
+                 target_x: Optional[float] = None, target_y: Optional[float] = None,
+                 store: Optional[PositionStore] = None):
+        self.character_id = character_id
+        if store is None:
+            store = PositionStore()
+            store.add(character_id, x, y, location_id)
+            if is_moving and target_x is not None:
+                store.start_movement(character_id, target_x, target_y)
+        self._store = store
+    
+    @classmethod
+    def view(cls, store: PositionStore, character_id: int) -> 'CharacterPosition':
+        """创建存储中已有角色的视图"""
+        return cls(character_id, store=store)
+    
+    @property
+    def x(self) -> float:
+        return self._store.get(self.character_id, 'x')
+    
+    @x.setter
+    def x(self, value: float):
+        self._store.set(self.character_id, 'x', value)
+    
+    @property
+    def y(self) -> float:
+        return self._store.get(self.character_id, 'y')
+    
+    @y.setter
+    def y(self, value: float):
+        self._store.set(self.character_id, 'y', value)
+    
+    @property
+    def location_id(self) -> Optional[int]:
+        return self._store.get(self.character_id, 'location_id')
+    
+    @location_id.setter
+    def location_id(self, value: Optional[int]):
+        self._store.set(self.character_id, 'location_id', value)
+    
+    @property
+    def is_moving(self) -> bool:
+        return self._store.get(self.character_id, 'moving')
+    
+    @is_moving.setter
+    def is_moving(self, value: bool):
+        self._store.set(self.character_id, 'moving', value)
+    
+    @property
+    def target_x(self) -> Optional[float]:
+        return self._store.get(self.character_id, 'target_x')
+    
+    @target_x.setter
+    def target_x(self, value: Optional[float]):
+        self._store.set(self.character_id, 'target_x', value)
+    
+    @property
+    def target_y(self) -> Optional[float]:
+        return self._store.get(self.character_id, 'target_y')
+    
+    @target_y.setter
+    def target_y(self, value: Optional[float]):
+        self._store.set(self.character_id, 'target_y', value)
+    
+    @property
+    def speed(self) -> float:
+        return self._store.get(self.character_id, 'speed')
     
     def update_position(self, new_x: float, new_y: float):
         """更新位置"""
-        self.x = new_x
-        self.y = new_y
+        self._store.set_position(self.character_id, new_x, new_y, self.location_id)
         
         # 检查是否到达目标
         if self.is_moving and self.target_x is not None:
             distance = ((self.target_x - new_x) ** 2 + 
                        (self.target_y - new_y) ** 2) ** 0.5
             if distance < 1.0:
-                self.is_moving = False
-                self.target_x = None
-                self.target_y = None
+                self._store.stop_movement(self.character_id)
+    
+    def __repr__(self) -> str:
+        return (f"CharacterPosition(character_id={self.character_id}, x={self.x}, y={self.y}, "
+                f"location_id={self.location_id}, is_moving={self.is_moving})")
 
 
 class World:
@@ -108,7 +185,12 @@ class World:
         self.outdoor_temperature: float = 20.0
         self.indoor_temperature: float = 22.0
         
-        # 角色位置跟踪
+        # 角色位置跟踪（位置数据在列式存储中，_character_positions保存各角色的视图）
+        self._spatial_index = SpatialGrid(self.config.spatial_cell_size)
+        self._positions = PositionStore(
+            default_speed=self.config.default_walk_speed,
+            on_move=self._spatial_index.update
+        )
         self._character_positions: Dict[int, CharacterPosition] = {}
     
     def initialize(self, db_session=None):
@@ -200,58 +282,142 @@ class World:
     
     def set_character_position(self, character_id: int, x: float, y: float,
                                location_id: Optional[int] = None):
-        """设置角色位置"""
+        """设置角色位置（会中断正在进行的移动）"""
         if character_id not in self._character_positions:
-            self._character_positions[character_id] = CharacterPosition(
-                character_id=character_id,
-                x=x,
-                y=y,
-                location_id=location_id
+            self._positions.add(character_id, x, y, location_id)
+            self._character_positions[character_id] = CharacterPosition.view(
+                self._positions, character_id
             )
         else:
-            pos = self._character_positions[character_id]
-            pos.x = x
-            pos.y = y
-            pos.location_id = location_id
+            self._positions.set_position(character_id, x, y, location_id)
+            # 直接设置的位置优先，避免advance_movement继续把角色拉回旧目标
+            self._positions.stop_movement(character_id)
         
         # 同步到地点管理器
         if location_id:
             self.location_manager.move_character(character_id, location_id)
     
     def start_character_movement(self, character_id: int,
-                                  target_x: float, target_y: float) -> bool:
-        """开始角色移动"""
-        pos = self.get_character_position(character_id)
-        if not pos:
+                                  target_x: float, target_y: float,
+                                  speed: Optional[float] = None,
+                                  target_location_id: Optional[int] = None) -> bool:
+        """
+        开始角色移动（由advance_movement推进）
+        
+        Args:
+            speed: 移动速度（单位/分钟），默认步行速度
+            target_location_id: 目标地点，到达后进入该地点
+        """
+        if character_id not in self._positions:
             return False
         
-        pos.is_moving = True
-        pos.target_x = target_x
-        pos.target_y = target_y
+        self._positions.start_movement(character_id, target_x, target_y,
+                                       speed, target_location_id)
         return True
     
+    def move_character_to(self, character_id: int, location_id: int,
+                          duration: int) -> bool:
+        """
+        让角色前往某个地点，在duration分钟后到达
+        
+        continuous_movement关闭或角色还没有位置时直接到达
+        """
+        location = self.location_manager.get(location_id)
+        if not location:
+            return False
+        
+        center_x, center_y = location.center
+        if not self.config.continuous_movement or character_id not in self._positions:
+            self.set_character_position(character_id, center_x, center_y, location_id)
+            return True
+        
+        x, y = self._positions.get_xy(character_id)
+        distance = ((center_x - x) ** 2 + (center_y - y) ** 2) ** 0.5
+        speed = distance / max(1, duration)
+        return self.start_character_movement(character_id, center_x, center_y,
+                                             speed, location_id)
+    
+    def advance_movement(self, minutes: int) -> List[int]:
+        """
+        所有移动中的角色同时推进minutes分钟
+        
+        Returns:
+            本次到达目标的角色ID列表
+        """
+        arrived = self._positions.advance(minutes)
+        for character_id, target_location_id in arrived:
+            if target_location_id is not None:
+                self._positions.set(character_id, 'location_id', target_location_id)
+                self.location_manager.move_character(character_id, target_location_id)
+        return [character_id for character_id, _ in arrived]
+    
+    def remove_character_position(self, character_id: int):
+        """移除角色位置（角色离开模拟时调用）"""
+        pos = self._character_positions.pop(character_id, None)
+        if pos and pos.location_id:
+            location = self.location_manager.get(pos.location_id)
+            if location:
+                location.leave(character_id)
+        self._positions.remove(character_id)
+        self._spatial_index.remove(character_id)
+    
     def calculate_movement_time(self, character_id: int,
                                 target_x: float, target_y: float,
                                 running: bool = False) -> int:
         """计算移动到目标位置需要的时间（分钟）"""
-        pos = self.get_character_position(character_id)
-        if not pos:
+        if character_id not in self._positions:
             return 0
         
-        distance = ((target_x - pos.x) ** 2 + (target_y - pos.y) ** 2) ** 0.5
+        return self.calculate_movement_times([character_id], [target_x], [target_y], running)[0]
+    
+    def calculate_movement_times(self, character_ids: List[int],
+                                 target_xs: List[float], target_ys: List[float],
+                                 running: bool = False) -> List[int]:
+        """批量计算一组角色移动到各自目标需要的时间（分钟），角色都必须已有位置"""
         speed = self.config.default_run_speed if running else self.config.default_walk_speed
-        
-        return max(1, int(distance / speed))
+        return self._positions.travel_times(character_ids, target_xs, target_ys, speed)
+    
+    def get_distances(self, character_id: int, other_ids: List[int]) -> List[float]:
+        """批量计算某角色到一组角色的距离"""
+        if character_id not in self._positions:
+            return []
+        x, y = self._positions.get_xy(character_id)
+        distances = self._positions.distances_to_point(x, y, other_ids)
+        return [float(d) for d in distances]
+    
+    @property
+    def positions(self) -> PositionStore:
+        """角色位置列式存储（批量计算用）"""
+        return self._positions
     
     def get_nearby_characters(self, x: float, y: float, 
                               radius: float = 20.0) -> List[int]:
-        """获取附近的角色ID列表"""
-        nearby = []
-        for char_id, pos in self._character_positions.items():
-            distance = ((pos.x - x) ** 2 + (pos.y - y) ** 2) ** 0.5
-            if distance <= radius:
-                nearby.append(char_id)
-        return nearby
+        """获取附近的角色ID列表（按距离从近到远）"""
+        return self._spatial_index.query_radius(x, y, radius)
+    
+    def get_nearest_characters(self, x: float, y: float, k: int = 5,
+                               max_radius: Optional[float] = None,
+                               exclude: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        """
+        获取离某点最近的k个角色
+        
+        Args:
+            max_radius: 最大距离，None表示不限
+            exclude: 排除的角色ID
+        
+        Returns:
+            (角色ID, 距离) 列表，按距离从近到远排序
+        """
+        return self._spatial_index.nearest(x, y, k, max_radius=max_radius, exclude=exclude)
+    
+    def find_encounter_pairs(self, radius: float = 5.0) -> List[Tuple[int, int]]:
+        """
+        一次找出所有距离不超过radius的角色对
+        
+        Returns:
+            (小ID, 大ID) 列表，每对只出现一次
+        """
+        return self._spatial_index.pairs_within(radius)
     
     def get_characters_at_location(self, location_id: int) -> List[int]:
         """获取指定地点的所有角色"""
@@ -272,18 +438,11 @@ class World:
         if not pos:
             return []
         
-        encounters = []
-        for other_id, other_pos in self._character_positions.items():
-            if other_id == character_id:
-                continue
-            
-            distance = ((pos.x - other_pos.x) ** 2 + 
-                       (pos.y - other_pos.y) ** 2) ** 0.5
-            
-            if distance <= encounter_radius:
-                encounters.append(other_id)
-        
-        return encounters
+        return [
+            other_id
+            for other_id in self._spatial_index.query_radius(pos.x, pos.y, encounter_radius)
+            if other_id != character_id
+        ]
     
     def get_environment_description(self, character_id: int) -> Dict[str, Any]:
         """
@@ -4,8 +4,10 @@ from .events import (
     GameEvent, EventType, EventPriority, EventStatus,
     PersonalEvent, CollectiveEvent, EmergencyEvent
 )
-from .event_queue import EventQueue
+from .event_queue import EventQueue, create_event_queue
+from .timing_wheel import TimingWheelEventQueue
 from .handlers import EventHandler, EventHandlerRegistry
+from .event_groups import event_resources, group_independent_events
 
 __all__ = [
     'GameEvent',
@@ -16,6 +18,10 @@ __all__ = [
     'CollectiveEvent',
     'EmergencyEvent',
     'EventQueue',
+    'TimingWheelEventQueue',
+    'create_event_queue',
     'EventHandler',
     'EventHandlerRegistry',
+    'event_resources',
+    'group_independent_events',
 ]
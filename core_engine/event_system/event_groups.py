@@ -0,0 +1,76 @@
+"""
+事件分组模块
+
+把同一时刻到期的一批事件按它们涉及的角色和地点分组：
+涉及同一角色或同一地点的事件（直接或间接）归入同一组，组内按出队顺序串行执行，
+不同组之间互不相关，可以并发执行
+"""
+
+from typing import Dict, Hashable, List, Set, Tuple
+
+from .events import GameEvent
+
+# 事件数据中表示其他参与角色/地点的字段
+CHARACTER_DATA_KEYS = ('other_character_id', 'receiver_id', 'target_character_id')
+CHARACTER_LIST_DATA_KEYS = ('participant_ids',)
+LOCATION_DATA_KEYS = ('location_id', 'target_location_id')
+
+
+def event_resources(event: GameEvent) -> Set[Tuple[str, Hashable]]:
+    """
+    事件涉及的角色和地点
+
+    Returns:
+        {('character', 角色ID), ('location', 地点ID), ...}
+    """
+    resources = {('character', event.character_id)}
+
+    for character_id in getattr(event, 'participant_ids', None) or ():
+        resources.add(('character', character_id))
+
+    data = event.data or {}
+    for key in CHARACTER_DATA_KEYS:
+        if data.get(key) is not None:
+            resources.add(('character', data[key]))
+    for key in CHARACTER_LIST_DATA_KEYS:
+        for character_id in data.get(key) or ():
+            resources.add(('character', character_id))
+    for key in LOCATION_DATA_KEYS:
+        if data.get(key) is not None:
+            resources.add(('location', data[key]))
+
+    return resources
+
+
+def group_independent_events(events: List[GameEvent]) -> List[List[GameEvent]]:
+    """
+    把事件分成互不相关的组（并查集）
+
+    Returns:
+        分组列表；组内保持原顺序，各组按其第一个事件的位置排序
+    """
+    parent = list(range(len(events)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner: Dict[Tuple[str, Hashable], int] = {}  # 资源 -> 最先涉及它的事件
+    for i, event in enumerate(events):
+        for resource in event_resources(event):
+            j = owner.setdefault(resource, i)
+            if j != i:
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    # 以较早的事件为根，分组顺序与出队顺序一致
+                    if root_i < root_j:
+                        parent[root_j] = root_i
+                    else:
+                        parent[root_i] = root_j
+
+    groups: Dict[int, List[GameEvent]] = {}
+    for i, event in enumerate(events):
+        groups.setdefault(find(i), []).append(event)
+    return list(groups.values())
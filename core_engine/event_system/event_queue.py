@@ -5,9 +5,10 @@
 """
 
 import heapq
-from typing import List, Optional, Dict, Set, Callable
+from typing import List, Optional, Dict, Any
 from dataclasses import dataclass, field
 from .events import GameEvent, EventStatus, EventPriority
+from .interval_index import CharacterIntervalIndex
 
 
 @dataclass(order=True)
@@ -17,11 +18,11 @@ class PrioritizedEvent:
     event: GameEvent = field(compare=False)
     
     @classmethod
-    def from_event(cls, event: GameEvent) -> 'PrioritizedEvent':
+    def from_event(cls, event: GameEvent, seq: int = 0) -> 'PrioritizedEvent':
         """从事件创建优先级包装器"""
-        # 排序键：(scheduled_time, priority, id)
+        # 排序键：(scheduled_time, priority, 加入顺序)
         return cls(
-            sort_key=(event.scheduled_time, event.priority.value, id(event)),
+            sort_key=(event.scheduled_time, event.priority.value, seq),
             event=event
         )
 
@@ -35,13 +36,84 @@ class EventQueue:
     - 按时间获取事件
     - 按角色筛选事件
     - 冲突检测
+    
+    使用带位置索引的二叉堆：取消和重新调度直接在堆中删除/调整对应条目（O(log n)），
+    堆中不留已取消的条目，队列长度就是堆的大小。
+    每个角色的待执行事件另外按时间区间建立索引，
+    冲突检测和按角色查询只访问该角色相关时间段内的事件
     """
     
     def __init__(self):
         self._heap: List[PrioritizedEvent] = []
-        self._event_map: Dict[int, GameEvent] = {}  # id -> event
-        self._cancelled: Set[int] = set()  # 已取消的事件ID
+        self._positions: Dict[int, int] = {}  # 事件ID -> 在堆中的位置
         self._next_id: int = 1
+        self._seq: int = 0  # 加入顺序，时间和优先级相同时先加入的先执行
+        self._intervals = CharacterIntervalIndex()  # 待执行事件的角色时间区间
+        
+        # 统计
+        self._added = 0
+        self._popped = 0
+        self._cancelled = 0
+        self._rescheduled = 0
+    
+    # ===== 堆操作 =====
+    
+    def _set(self, index: int, pe: PrioritizedEvent):
+        self._heap[index] = pe
+        self._positions[pe.event.id] = index
+    
+    def _sift_up(self, index: int):
+        heap, positions = self._heap, self._positions
+        pe = heap[index]
+        key = pe.sort_key
+        while index > 0:
+            parent = (index - 1) >> 1
+            parent_pe = heap[parent]
+            if parent_pe.sort_key <= key:
+                break
+            heap[index] = parent_pe
+            positions[parent_pe.event.id] = index
+            index = parent
+        heap[index] = pe
+        positions[pe.event.id] = index
+    
+    def _sift_down(self, index: int):
+        heap, positions = self._heap, self._positions
+        size = len(heap)
+        pe = heap[index]
+        key = pe.sort_key
+        child = 2 * index + 1
+        while child < size:
+            child_pe = heap[child]
+            right = child + 1
+            if right < size and heap[right].sort_key < child_pe.sort_key:
+                child = right
+                child_pe = heap[right]
+            if key <= child_pe.sort_key:
+                break
+            heap[index] = child_pe
+            positions[child_pe.event.id] = index
+            index = child
+            child = 2 * index + 1
+        heap[index] = pe
+        positions[pe.event.id] = index
+    
+    def _remove_at(self, index: int) -> PrioritizedEvent:
+        """删除堆中指定位置的条目"""
+        heap = self._heap
+        removed = heap[index]
+        del self._positions[removed.event.id]
+        
+        last = heap.pop()
+        if index < len(heap):
+            self._set(index, last)
+            if index > 0 and last.sort_key < heap[(index - 1) >> 1].sort_key:
+                self._sift_up(index)
+            else:
+                self._sift_down(index)
+        return removed
+    
+    # ===== 队列操作 =====
     
     def add(self, event: GameEvent) -> int:
         """
@@ -53,40 +125,60 @@ class EventQueue:
         if event.id is None:
             event.id = self._next_id
             self._next_id += 1
+        elif event.id >= self._next_id:
+            # 带ID加入的事件（如从存档加载），之后生成的ID从它之后开始
+            self._next_id = event.id + 1
+        
+        if event.id in self._positions:
+            # 同一ID重复加入，视为替换
+            self._remove_at(self._positions[event.id])
         
-        self._event_map[event.id] = event
-        heapq.heappush(self._heap, PrioritizedEvent.from_event(event))
+        self._seq += 1
+        self._heap.append(PrioritizedEvent.from_event(event, self._seq))
+        self._sift_up(len(self._heap) - 1)
+        self._intervals.add(event)
+        self._added += 1
         return event.id
     
     def cancel(self, event_id: int) -> bool:
-        """
-        取消事件
+        """取消事件（立即从队列中移除）"""
+        index = self._positions.get(event_id)
+        if index is None:
+            return False
         
-        使用懒删除策略，标记为已取消但不立即从堆中移除
-        """
-        if event_id in self._event_map:
-            self._event_map[event_id].status = EventStatus.CANCELLED
-            self._cancelled.add(event_id)
-            return True
-        return False
+        pe = self._remove_at(index)
+        pe.event.status = EventStatus.CANCELLED
+        self._intervals.remove(event_id)
+        self._cancelled += 1
+        return True
+    
+    def get(self, event_id: int) -> Optional[GameEvent]:
+        """按ID获取队列中的事件"""
+        index = self._positions.get(event_id)
+        return self._heap[index].event if index is not None else None
     
     def peek(self) -> Optional[GameEvent]:
         """查看队首事件（不移除）"""
-        self._cleanup()
         if self._heap:
             return self._heap[0].event
         return None
     
     def pop(self) -> Optional[GameEvent]:
         """取出队首事件"""
-        self._cleanup()
-        if self._heap:
-            pe = heapq.heappop(self._heap)
-            event = pe.event
-            if event.id in self._event_map:
-                del self._event_map[event.id]
-            return event
-        return None
+        if not self._heap:
+            return None
+        
+        event = self._remove_at(0).event
+        self._intervals.remove(event.id)
+        self._popped += 1
+        return event
+    
+    def pop_due(self, game_time: int) -> List[GameEvent]:
+        """按顺序取出所有计划时间不晚于 game_time 的事件"""
+        due = []
+        while self._heap and self._heap[0].sort_key[0] <= game_time:
+            due.append(self.pop())
+        return due
     
     def get_next_events(self, game_time: int, count: int = 1) -> List[GameEvent]:
         """
@@ -95,36 +187,25 @@ class EventQueue:
         Args:
             game_time: 当前游戏时间
             count: 最多返回的事件数
-            
+        
         Returns:
             事件列表
         """
-        self._cleanup()
-        events = []
-        temp = []
-        
-        while self._heap and len(events) < count:
-            pe = heapq.heappop(self._heap)
-            if pe.event.scheduled_time >= game_time and pe.event.status == EventStatus.PENDING:
-                events.append(pe.event)
-            temp.append(pe)
-        
-        # 放回堆中
-        for pe in temp:
-            heapq.heappush(self._heap, pe)
-        
-        return events
+        candidates = [
+            pe for pe in self._heap
+            if pe.event.scheduled_time >= game_time and pe.event.status == EventStatus.PENDING
+        ]
+        return [pe.event for pe in heapq.nsmallest(count, candidates, key=lambda pe: pe.sort_key)]
     
     def get_events_in_range(self, start_time: int, end_time: int) -> List[GameEvent]:
         """获取时间范围内的所有事件"""
-        self._cleanup()
         return [
             pe.event for pe in self._heap
             if start_time <= pe.event.scheduled_time < end_time
             and pe.event.status == EventStatus.PENDING
         ]
     
-    def get_character_events(self, character_id: int, 
+    def get_character_events(self, character_id: int,
                              start_time: Optional[int] = None,
                              end_time: Optional[int] = None) -> List[GameEvent]:
         """
@@ -135,45 +216,28 @@ class EventQueue:
             start_time: 开始时间（可选）
             end_time: 结束时间（可选）
         """
-        self._cleanup()
-        events = []
-        for pe in self._heap:
-            event = pe.event
-            if event.character_id != character_id:
-                continue
-            if event.status != EventStatus.PENDING:
-                continue
-            if start_time is not None and event.scheduled_time < start_time:
-                continue
-            if end_time is not None and event.scheduled_time >= end_time:
-                continue
-            events.append(event)
-        
+        heap, positions = self._heap, self._positions
+        events = [
+            heap[positions[event_id]].event
+            for event_id in self._intervals.in_range(character_id, start_time, end_time)
+        ]
+        events = [e for e in events if e.status == EventStatus.PENDING]
         return sorted(events, key=lambda e: (e.scheduled_time, e.priority.value))
     
     def check_conflict(self, new_event: GameEvent) -> List[GameEvent]:
         """
         检查新事件与现有事件的冲突
         
-        返回冲突的事件列表
+        返回冲突的事件列表（不包括新事件自身）
         """
         conflicts = []
-        new_start = new_event.scheduled_time
-        new_end = new_event.end_time
-        
-        for pe in self._heap:
-            event = pe.event
-            if event.character_id != new_event.character_id:
-                continue
-            if event.status != EventStatus.PENDING:
+        for event_id in self._intervals.overlapping(
+            new_event.character_id, new_event.scheduled_time, new_event.end_time
+        ):
+            event = self._heap[self._positions[event_id]].event
+            if event is new_event or event.status != EventStatus.PENDING:
                 continue
-            
-            # 检查时间重叠
-            event_start = event.scheduled_time
-            event_end = event.end_time
-            
-            if not (new_end <= event_start or new_start >= event_end):
-                conflicts.append(event)
+            conflicts.append(event)
         
         return conflicts
     
@@ -183,16 +247,18 @@ class EventQueue:
     
     def reschedule(self, event_id: int, new_time: int) -> bool:
         """
-        重新调度事件
+        重新调度事件（事件ID不变）
         
         Args:
             event_id: 事件ID
             new_time: 新的计划时间
         """
-        if event_id not in self._event_map:
+        index = self._positions.get(event_id)
+        if index is None:
             return False
         
-        event = self._event_map[event_id]
+        pe = self._heap[index]
+        event = pe.event
         old_time = event.scheduled_time
         event.scheduled_time = new_time
         
@@ -203,41 +269,77 @@ class EventQueue:
             event.scheduled_time = old_time
             return False
         
-        # 重新加入堆（使用懒更新策略）
-        self._cancelled.add(event_id)
-        event.id = self._next_id
-        self._next_id += 1
-        self._event_map[event.id] = event
-        heapq.heappush(self._heap, PrioritizedEvent.from_event(event))
+        # 在堆中原地调整位置
+        pe.sort_key = (new_time,) + pe.sort_key[1:]
+        if new_time < old_time:
+            self._sift_up(index)
+        else:
+            self._sift_down(index)
         
+        self._intervals.add(event)
+        self._rescheduled += 1
         return True
     
-    def _cleanup(self):
-        """清理已取消的事件"""
-        while self._heap:
-            if self._heap[0].event.id in self._cancelled:
-                pe = heapq.heappop(self._heap)
-                self._cancelled.discard(pe.event.id)
-                if pe.event.id in self._event_map:
-                    del self._event_map[pe.event.id]
-            else:
-                break
-    
     def __len__(self) -> int:
-        """队列中的有效事件数"""
-        return len(self._event_map) - len(self._cancelled)
+        """队列中的事件数"""
+        return len(self._heap)
     
     def __bool__(self) -> bool:
         return len(self) > 0
     
+    def __contains__(self, event_id: int) -> bool:
+        return event_id in self._positions
+    
     def clear(self):
         """清空队列"""
         self._heap.clear()
-        self._event_map.clear()
-        self._cancelled.clear()
+        self._positions.clear()
+        self._intervals.clear()
     
     def to_list(self) -> List[GameEvent]:
         """将队列转换为有序列表"""
-        self._cleanup()
-        events = [pe.event for pe in self._heap if pe.event.status == EventStatus.PENDING]
-        return sorted(events, key=lambda e: (e.scheduled_time, e.priority.value))
+        entries = [pe for pe in self._heap if pe.event.status == EventStatus.PENDING]
+        return [pe.event for pe in sorted(entries, key=lambda pe: pe.sort_key)]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取队列统计
+        
+        取消和重新调度都直接修改堆，tombstones 恒为0；
+        heap_entries、indexed_events 与 size 不一致说明内部状态出错
+        """
+        return {
+            'backend': 'heap',
+            'size': len(self._heap),
+            'heap_entries': len(self._heap),
+            'indexed_events': len(self._intervals),
+            'tombstones': len(self._heap) - len(self._positions),
+            'added': self._added,
+            'popped': self._popped,
+            'cancelled': self._cancelled,
+            'rescheduled': self._rescheduled,
+        }
+
+
+# 可选的事件队列后端
+EVENT_QUEUE_BACKENDS = ('heap', 'timing_wheel')
+
+
+def create_event_queue(backend: str = 'heap', start_time: int = 0):
+    """
+    按名称创建事件队列
+    
+    Args:
+        backend: 'heap'（二叉堆，默认）或 'timing_wheel'（分层时间轮，
+                 适合大量事件集中在未来一天内的场景）
+        start_time: 时间轮游标的初始时间（一般为当前游戏时间），heap忽略此参数
+    
+    Raises:
+        ValueError: 未知的后端名称
+    """
+    if backend == 'heap':
+        return EventQueue()
+    if backend == 'timing_wheel':
+        from .timing_wheel import TimingWheelEventQueue
+        return TimingWheelEventQueue(start_time=start_time)
+    raise ValueError(f"Unknown event queue backend: {backend} (expected one of {EVENT_QUEUE_BACKENDS})")
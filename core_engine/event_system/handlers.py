@@ -14,8 +14,16 @@ class EventHandler(ABC):
     事件处理器基类
     
     所有事件处理器需要继承此类并实现handle方法
+    
+    parallel_safe 为 True 时，引擎可以把同一时刻、涉及的角色/地点互不相关的这类事件
+    并发执行（见 event_groups）。处理器需要满足：
+    - 内存中只修改事件涉及的角色/地点的状态
+    - 数据库只通过 context['db'] 访问（每个事件各自的会话），不经过共享会话的全局实例
+    - 对其他角色数据（如别人帖子的点赞/评论数）的修改用原子更新，在自己的事务中提交
     """
     
+    parallel_safe: bool = False
+    
     @abstractmethod
     async def handle(self, event: GameEvent, context: Dict[str, Any]) -> bool:
         """
@@ -0,0 +1,130 @@
+"""
+角色事件区间索引
+
+为每个角色维护按开始时间排序的事件区间 [scheduled_time, end_time)：
+- 冲突检测：只需二分定位开始时间落在 [start - 最长时长, end) 内的区间，再逐个精确判断
+- 时间范围查询：二分定位开始时间在 [start, end) 内的区间
+
+索引记录每个事件加入时的时间，事件的时间被修改后需要先remove再add
+"""
+
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+
+class _CharacterIntervals:
+    """单个角色的事件区间（按 (开始时间, 事件ID) 排序）"""
+
+    __slots__ = ('entries', 'durations', 'max_duration')
+
+    def __init__(self):
+        self.entries: List[Tuple[int, int, int]] = []   # (start, event_id, end)
+        self.durations: Counter = Counter()
+        self.max_duration = 0
+
+    def add(self, start: int, end: int, event_id: int):
+        insort(self.entries, (start, event_id, end))
+        duration = end - start
+        self.durations[duration] += 1
+        if duration > self.max_duration:
+            self.max_duration = duration
+
+    def remove(self, start: int, end: int, event_id: int) -> bool:
+        i = bisect_left(self.entries, (start, event_id))
+        if i >= len(self.entries) or self.entries[i][:2] != (start, event_id):
+            return False
+        del self.entries[i]
+
+        duration = end - start
+        self.durations[duration] -= 1
+        if not self.durations[duration]:
+            del self.durations[duration]
+            if duration == self.max_duration:
+                self.max_duration = max(self.durations, default=0)
+        return True
+
+    def overlapping(self, start: int, end: int) -> List[int]:
+        """与 [start, end) 重叠的事件ID（判断方式与EventQueue.check_conflict一致）"""
+        entries = self.entries
+        # 开始时间早于 start - max_duration 的区间不可能延伸到start之后
+        i = bisect_left(entries, (start - self.max_duration,))
+        result = []
+        while i < len(entries):
+            e_start, event_id, e_end = entries[i]
+            if e_start >= end:
+                break
+            if not (end <= e_start or start >= e_end):
+                result.append(event_id)
+            i += 1
+        return result
+
+    def in_range(self, start: Optional[int], end: Optional[int]) -> List[int]:
+        """开始时间在 [start, end) 内的事件ID"""
+        entries = self.entries
+        lo = bisect_left(entries, (start,)) if start is not None else 0
+        hi = bisect_left(entries, (end,)) if end is not None else len(entries)
+        return [event_id for _, event_id, _ in entries[lo:hi]]
+
+
+class CharacterIntervalIndex:
+    """
+    按角色划分的事件区间索引
+
+    使用方式：
+        index = CharacterIntervalIndex()
+        index.add(event)
+        conflict_ids = index.overlapping(character_id, start, end)
+        index.remove(event.id)
+    """
+
+    def __init__(self):
+        self._characters: Dict[int, _CharacterIntervals] = {}
+        # event_id -> (character_id, start, end)，记录加入索引时的区间
+        self._events: Dict[int, Tuple[int, int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __contains__(self, event_id: int) -> bool:
+        return event_id in self._events
+
+    def add(self, event) -> None:
+        """加入事件（已存在时先移除旧区间）"""
+        if event.id in self._events:
+            self.remove(event.id)
+
+        start, end = event.scheduled_time, event.end_time
+        self._events[event.id] = (event.character_id, start, end)
+        intervals = self._characters.get(event.character_id)
+        if intervals is None:
+            intervals = self._characters[event.character_id] = _CharacterIntervals()
+        intervals.add(start, end, event.id)
+
+    def remove(self, event_id: int) -> bool:
+        """移除事件"""
+        record = self._events.pop(event_id, None)
+        if record is None:
+            return False
+
+        character_id, start, end = record
+        intervals = self._characters[character_id]
+        intervals.remove(start, end, event_id)
+        if not intervals.entries:
+            del self._characters[character_id]
+        return True
+
+    def overlapping(self, character_id: int, start: int, end: int) -> List[int]:
+        """角色与 [start, end) 重叠的事件ID（按开始时间排序）"""
+        intervals = self._characters.get(character_id)
+        return intervals.overlapping(start, end) if intervals else []
+
+    def in_range(self, character_id: int, start: Optional[int] = None,
+                 end: Optional[int] = None) -> List[int]:
+        """角色开始时间在 [start, end) 内的事件ID（按开始时间排序）"""
+        intervals = self._characters.get(character_id)
+        return intervals.in_range(start, end) if intervals else []
+
+    def clear(self):
+        self._characters.clear()
+        self._events.clear()
@@ -0,0 +1,434 @@
+"""
+分层时间轮事件队列
+
+游戏时间是整数分钟，绝大多数事件落在未来24小时内，
+用 分钟轮(60格) → 小时轮(24格) → 天轮(DAY_SLOTS格) 三层时间轮代替二叉堆：
+- 加入/取消/重新调度：直接放入或移出对应格子，O(1)
+- 到期：游标走到某一分钟时，整格事件一起转入就绪队列；
+  游标跨过小时/天时，把对应格子的事件下放到更细的轮子（每个事件最多下放3次）
+- 超出天轮范围的事件放在溢出区，最早的溢出事件进入天轮范围（或天轮为空）时再展开
+
+对外接口与 EventQueue 相同，另外提供 pop_due 一次取出所有到期事件。
+游标只会向前走：加入的事件时间不晚于游标时直接进入就绪队列，
+就绪队列总是先于轮子中的事件取出，因此整体顺序与 EventQueue 一致
+"""
+
+import heapq
+from typing import Any, Dict, List, Optional
+
+from .events import GameEvent, EventStatus
+from .event_queue import PrioritizedEvent
+from .interval_index import CharacterIntervalIndex
+
+MINUTES_PER_HOUR = 60
+MINUTES_PER_DAY = 24 * 60
+
+# 事件所在的层级
+_READY = -1
+_MINUTE = 0
+_HOUR = 1
+_DAY = 2
+_OVERFLOW = 3
+
+
+class TimingWheelEventQueue:
+    """
+    分层时间轮事件队列（EventQueue 的可选后端）
+
+    使用方式：
+        queue = TimingWheelEventQueue(start_time=game_time.total_minutes)
+        queue.add(event)
+        for event in queue.pop_due(now): ...
+
+    通常通过 create_event_queue("timing_wheel") 创建
+    """
+
+    DAY_SLOTS = 32
+
+    def __init__(self, start_time: int = 0):
+        """
+        Args:
+            start_time: 游标的初始时间（一般为当前游戏时间）
+        """
+        self._start_time = start_time
+        self._now = start_time  # 游标：时间不晚于它的事件都已进入就绪队列
+
+        self._minutes: List[Dict[int, PrioritizedEvent]] = [{} for _ in range(MINUTES_PER_HOUR)]
+        self._hours: List[Dict[int, PrioritizedEvent]] = [{} for _ in range(24)]
+        self._days: List[Dict[int, PrioritizedEvent]] = [{} for _ in range(self.DAY_SLOTS)]
+        self._overflow: Dict[int, PrioritizedEvent] = {}
+        self._overflow_min: Optional[int] = None  # 溢出区最早的事件时间（None表示需要重新计算）
+        self._level_sizes = [0, 0, 0, 0]  # 分钟轮、小时轮、天轮、溢出区的事件数
+
+        self._ready: List[PrioritizedEvent] = []  # 已到期的事件（堆）
+        self._entries: Dict[int, PrioritizedEvent] = {}  # 事件ID -> 条目
+        # 事件ID -> 所在层级/格子（分开存放，不为每个事件创建元组）
+        self._levels: Dict[int, int] = {}
+        self._slots: Dict[int, Optional[dict]] = {}
+
+        self._next_id: int = 1
+        self._seq: int = 0
+        self._intervals = CharacterIntervalIndex()
+
+        # 统计
+        self._added = 0
+        self._popped = 0
+        self._cancelled = 0
+        self._rescheduled = 0
+        self._cascaded = 0
+
+    # ===== 时间轮操作 =====
+
+    def _place(self, pe: PrioritizedEvent):
+        """按事件时间与游标的关系放入就绪队列或对应的轮子"""
+        event_id = pe.event.id
+        time = pe.sort_key[0]
+        now = self._now
+
+        if time <= now:
+            heapq.heappush(self._ready, pe)
+            self._levels[event_id] = _READY
+            self._slots[event_id] = None
+            return
+
+        if time // MINUTES_PER_HOUR == now // MINUTES_PER_HOUR:
+            level, slot = _MINUTE, self._minutes[time % MINUTES_PER_HOUR]
+        elif time // MINUTES_PER_DAY == now // MINUTES_PER_DAY:
+            level, slot = _HOUR, self._hours[time % MINUTES_PER_DAY // MINUTES_PER_HOUR]
+        elif time // MINUTES_PER_DAY - now // MINUTES_PER_DAY < self.DAY_SLOTS:
+            level, slot = _DAY, self._days[time // MINUTES_PER_DAY % self.DAY_SLOTS]
+        else:
+            level, slot = _OVERFLOW, self._overflow
+            if self._overflow_min is not None and time < self._overflow_min:
+                self._overflow_min = time
+
+        slot[event_id] = pe
+        self._level_sizes[level] += 1
+        self._levels[event_id] = level
+        self._slots[event_id] = slot
+
+    def _unplace(self, event_id: int) -> PrioritizedEvent:
+        """把事件从所在的格子或就绪队列中移出"""
+        level = self._levels.pop(event_id)
+        slot = self._slots.pop(event_id)
+        if level != _READY:
+            self._level_sizes[level] -= 1
+            pe = slot.pop(event_id)
+            if level == _OVERFLOW and pe.sort_key[0] == self._overflow_min:
+                self._overflow_min = None
+            return pe
+
+        # 就绪队列只包含当前这一分钟的事件，线性查找即可
+        ready = self._ready
+        pe = self._entries[event_id]
+        for i, entry in enumerate(ready):
+            if entry is pe:
+                ready[i] = ready[-1]
+                ready.pop()
+                heapq.heapify(ready)
+                break
+        return pe
+
+    def _cascade(self, slot: Dict[int, PrioritizedEvent], level: int):
+        """游标进入新的小时/天后，把对应格子里的事件重新放入更细的轮子"""
+        entries = list(slot.values())
+        slot.clear()
+        if level == _OVERFLOW:
+            self._overflow_min = None
+        self._level_sizes[level] -= len(entries)
+        self._cascaded += len(entries)
+        for pe in entries:
+            self._place(pe)
+
+    def _advance(self) -> bool:
+        """
+        就绪队列为空时，把游标推进到下一个有事件的格子
+
+        Returns:
+            就绪队列是否有事件（False表示队列为空）
+        """
+        while not self._ready:
+            now = self._now
+            sizes = self._level_sizes
+
+            if sizes[_MINUTE]:
+                # 分钟轮只保存当前小时内、游标之后的事件
+                hour_start = now - now % MINUTES_PER_HOUR
+                for minute in range(now % MINUTES_PER_HOUR + 1, MINUTES_PER_HOUR):
+                    slot = self._minutes[minute]
+                    if slot:
+                        self._now = hour_start + minute
+                        self._expire(slot)
+                        break
+                continue
+
+            if sizes[_HOUR]:
+                day_start = now - now % MINUTES_PER_DAY
+                for hour in range(now % MINUTES_PER_DAY // MINUTES_PER_HOUR + 1, 24):
+                    slot = self._hours[hour]
+                    if slot:
+                        self._now = day_start + hour * MINUTES_PER_HOUR
+                        self._cascade(slot, _HOUR)
+                        break
+                continue
+
+            if sizes[_OVERFLOW]:
+                # 最早的溢出事件进入天轮范围后先展开溢出区，保证天轮里没有更晚的事件被先取出；
+                # 天轮已空时游标直接跳到溢出区最早事件的当天
+                earliest = self._overflow_earliest()
+                days_ahead = earliest // MINUTES_PER_DAY - now // MINUTES_PER_DAY
+                if days_ahead < self.DAY_SLOTS or not sizes[_DAY]:
+                    if days_ahead >= self.DAY_SLOTS:
+                        self._now = earliest - earliest % MINUTES_PER_DAY
+                    self._cascade(self._overflow, _OVERFLOW)
+                    continue
+
+            if sizes[_DAY]:
+                today = now // MINUTES_PER_DAY
+                for day in range(today + 1, today + self.DAY_SLOTS):
+                    slot = self._days[day % self.DAY_SLOTS]
+                    if slot:
+                        self._now = day * MINUTES_PER_DAY
+                        self._cascade(slot, _DAY)
+                        break
+                continue
+
+            return False
+        return True
+
+    def _overflow_earliest(self) -> int:
+        if self._overflow_min is None:
+            self._overflow_min = min(pe.sort_key[0] for pe in self._overflow.values())
+        return self._overflow_min
+
+    def _expire(self, slot: Dict[int, PrioritizedEvent]):
+        """游标走到的这一分钟的事件整体转入就绪队列"""
+        ready = self._ready
+        levels, slots = self._levels, self._slots
+        for event_id, pe in slot.items():
+            ready.append(pe)
+            levels[event_id] = _READY
+            slots[event_id] = None
+        self._level_sizes[_MINUTE] -= len(slot)
+        slot.clear()
+        heapq.heapify(ready)
+
+    def _pop_ready(self) -> GameEvent:
+        event = heapq.heappop(self._ready).event
+        del self._entries[event.id]
+        del self._levels[event.id]
+        del self._slots[event.id]
+        self._intervals.remove(event.id)
+        self._popped += 1
+        return event
+
+    # ===== 队列操作 =====
+
+    def add(self, event: GameEvent) -> int:
+        """
+        添加事件到队列
+
+        Returns:
+            事件ID
+        """
+        if event.id is None:
+            event.id = self._next_id
+            self._next_id += 1
+        elif event.id >= self._next_id:
+            # 带ID加入的事件（如从存档加载），之后生成的ID从它之后开始
+            self._next_id = event.id + 1
+
+        if event.id in self._entries:
+            # 同一ID重复加入，视为替换
+            self._unplace(event.id)
+
+        self._seq += 1
+        pe = PrioritizedEvent.from_event(event, self._seq)
+        self._entries[event.id] = pe
+        self._place(pe)
+        self._intervals.add(event)
+        self._added += 1
+        return event.id
+
+    def cancel(self, event_id: int) -> bool:
+        """取消事件（立即从队列中移除）"""
+        if event_id not in self._entries:
+            return False
+
+        pe = self._unplace(event_id)
+        del self._entries[event_id]
+        pe.event.status = EventStatus.CANCELLED
+        self._intervals.remove(event_id)
+        self._cancelled += 1
+        return True
+
+    def get(self, event_id: int) -> Optional[GameEvent]:
+        """按ID获取队列中的事件"""
+        pe = self._entries.get(event_id)
+        return pe.event if pe is not None else None
+
+    def peek(self) -> Optional[GameEvent]:
+        """查看队首事件（不移除）"""
+        if not self._advance():
+            return None
+        return self._ready[0].event
+
+    def pop(self) -> Optional[GameEvent]:
+        """取出队首事件"""
+        if not self._advance():
+            return None
+        return self._pop_ready()
+
+    def pop_due(self, game_time: int) -> List[GameEvent]:
+        """按顺序取出所有计划时间不晚于 game_time 的事件"""
+        due = []
+        while self._advance() and self._ready[0].sort_key[0] <= game_time:
+            due.append(self._pop_ready())
+        return due
+
+    def get_next_events(self, game_time: int, count: int = 1) -> List[GameEvent]:
+        """
+        获取指定时间点或之后的下一批事件
+
+        Args:
+            game_time: 当前游戏时间
+            count: 最多返回的事件数
+
+        Returns:
+            事件列表
+        """
+        candidates = [
+            pe for pe in self._entries.values()
+            if pe.event.scheduled_time >= game_time and pe.event.status == EventStatus.PENDING
+        ]
+        return [pe.event for pe in heapq.nsmallest(count, candidates, key=lambda pe: pe.sort_key)]
+
+    def get_events_in_range(self, start_time: int, end_time: int) -> List[GameEvent]:
+        """获取时间范围内的所有事件"""
+        return [
+            pe.event for pe in self._entries.values()
+            if start_time <= pe.event.scheduled_time < end_time
+            and pe.event.status == EventStatus.PENDING
+        ]
+
+    def get_character_events(self, character_id: int,
+                             start_time: Optional[int] = None,
+                             end_time: Optional[int] = None) -> List[GameEvent]:
+        """
+        获取指定角色的事件
+
+        Args:
+            character_id: 角色ID
+            start_time: 开始时间（可选）
+            end_time: 结束时间（可选）
+        """
+        entries = self._entries
+        events = [
+            entries[event_id].event
+            for event_id in self._intervals.in_range(character_id, start_time, end_time)
+        ]
+        events = [e for e in events if e.status == EventStatus.PENDING]
+        return sorted(events, key=lambda e: (e.scheduled_time, e.priority.value))
+
+    def check_conflict(self, new_event: GameEvent) -> List[GameEvent]:
+        """
+        检查新事件与现有事件的冲突
+
+        返回冲突的事件列表（不包括新事件自身）
+        """
+        conflicts = []
+        for event_id in self._intervals.overlapping(
+            new_event.character_id, new_event.scheduled_time, new_event.end_time
+        ):
+            event = self._entries[event_id].event
+            if event is new_event or event.status != EventStatus.PENDING:
+                continue
+            conflicts.append(event)
+
+        return conflicts
+
+    def can_schedule(self, event: GameEvent) -> bool:
+        """检查事件是否可以被调度（无冲突）"""
+        return len(self.check_conflict(event)) == 0
+
+    def reschedule(self, event_id: int, new_time: int) -> bool:
+        """
+        重新调度事件（事件ID不变）
+
+        Args:
+            event_id: 事件ID
+            new_time: 新的计划时间
+        """
+        pe = self._entries.get(event_id)
+        if pe is None:
+            return False
+
+        event = pe.event
+        old_time = event.scheduled_time
+        event.scheduled_time = new_time
+
+        # 检查新时间是否有冲突
+        conflicts = self.check_conflict(event)
+        if conflicts:
+            # 恢复原时间
+            event.scheduled_time = old_time
+            return False
+
+        # 移到新时间对应的格子
+        self._unplace(event_id)
+        pe.sort_key = (new_time,) + pe.sort_key[1:]
+        self._place(pe)
+
+        self._intervals.add(event)
+        self._rescheduled += 1
+        return True
+
+    def __len__(self) -> int:
+        """队列中的事件数"""
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __contains__(self, event_id: int) -> bool:
+        return event_id in self._entries
+
+    def clear(self):
+        """清空队列（游标回到初始时间）"""
+        for wheel in (self._minutes, self._hours, self._days):
+            for slot in wheel:
+                slot.clear()
+        self._overflow.clear()
+        self._overflow_min = None
+        self._level_sizes = [0, 0, 0, 0]
+        self._ready.clear()
+        self._entries.clear()
+        self._levels.clear()
+        self._slots.clear()
+        self._intervals.clear()
+        self._now = self._start_time
+
+    def to_list(self) -> List[GameEvent]:
+        """将队列转换为有序列表"""
+        entries = [pe for pe in self._entries.values() if pe.event.status == EventStatus.PENDING]
+        return [pe.event for pe in sorted(entries, key=lambda pe: pe.sort_key)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列统计"""
+        sizes = self._level_sizes
+        return {
+            'backend': 'timing_wheel',
+            'size': len(self._entries),
+            'cursor': self._now,
+            'ready': len(self._ready),
+            'minute_wheel': sizes[_MINUTE],
+            'hour_wheel': sizes[_HOUR],
+            'day_wheel': sizes[_DAY],
+            'overflow': sizes[_OVERFLOW],
+            'indexed_events': len(self._intervals),
+            'added': self._added,
+            'popped': self._popped,
+            'cancelled': self._cancelled,
+            'rescheduled': self._rescheduled,
+            'cascaded': self._cascaded,
+        }
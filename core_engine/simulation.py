@@ -16,6 +16,13 @@ import heapq
 from .engine import GameTime
 from .environment.world import World, WorldConfig
 from .character.agent import CharacterAgent, AgentManager, AgentState
+from .character.memory import MemorySystem
+from .character.action_logger import get_action_logger, WriteBehindConfig
+from .ai_integration.batch_dispatcher import BatchDispatcher, BatchConfig
+from .social.encounter_detector import EncounterDetector, EncounterConfig
+
+# 执行期间不参与线下相遇的行动
+NO_ENCOUNTER_ACTIONS = frozenset({'sleep', 'talk', 'talk_to', 'greet'})
 
 
 class SimulationState(str, Enum):
@@ -52,6 +59,24 @@ class SimulationConfig:
     # 决策超时（秒）
     decision_timeout: float = 60.0
     
+    # 是否把同一时刻的决策请求合并为一个多角色请求发送
+    batch_decisions: bool = True
+    batch_window_ms: float = 20.0
+    batch_max_size: int = 8
+    
+    # 是否缓冲行动日志批量写入（模拟停止时写入剩余日志）
+    buffered_action_logs: bool = True
+    action_log_flush_size: int = 50
+    action_log_flush_interval_ms: float = 500.0
+    
+    # 是否延迟写入角色记忆（在日期切换和停止时统一在一个事务中写入）
+    defer_memory_writes: bool = True
+    
+    # 是否在每次时间推进后检测角色之间的线下相遇
+    detect_encounters: bool = True
+    encounter_radius: float = 5.0
+    encounter_cooldown_minutes: int = 180
+    
     # 是否启用详细日志
     verbose: bool = True
     
@@ -102,6 +127,15 @@ class GameSimulation:
         # 角色状态跟踪
         self._agent_tasks: Dict[int, Optional[AgentTask]] = {}  # character_id -> current_task
         
+        # 决策请求批量调度器（首次使用时创建）
+        self._batch_dispatcher: Optional[BatchDispatcher] = None
+        
+        # 线下相遇检测
+        self._encounter_detector = EncounterDetector(EncounterConfig(
+            radius=self.config.encounter_radius,
+            cooldown_minutes=self.config.encounter_cooldown_minutes
+        ))
+        
         # 回调
         self._on_action_start_callbacks: List[Callable] = []
         self._on_action_end_callbacks: List[Callable] = []
@@ -149,38 +183,82 @@ class GameSimulation:
         
         try:
             agent = await self.agent_manager.create_agent(character_id, db_session)
-            agent.set_world(self.world)
-            
-            # 设置初始位置
-            self.world.set_character_position(
-                character_id, initial_x, initial_y, initial_location_id
-            )
+            self._register_agent(agent, initial_x, initial_y, initial_location_id)
+            return agent
             
-            # 更新时间
-            agent.update_game_time(
-                self._game_time.day,
-                f"{self._game_time.hour:02d}:{self._game_time.minute:02d}",
-                initial_location_id
+        finally:
+            if db_session:
+                db_session.close()
+    
+    async def add_characters(self, characters: List[Dict[str, Any]]) -> List[CharacterAgent]:
+        """
+        批量添加角色（角色信息、记忆、物品栏用固定次数的查询加载）
+        
+        Args:
+            characters: 角色列表，每项包含 character_id，
+                        可选 initial_x / initial_y / initial_location_id
+        """
+        db_session = self._db_session_factory() if self._db_session_factory else None
+        
+        try:
+            agents = await self.agent_manager.create_agents(
+                [c['character_id'] for c in characters], db_session
             )
+            by_id = {agent.character_id: agent for agent in agents}
             
-            # 初始状态：空闲（无任务）
-            self._agent_tasks[character_id] = None
-            
-            self._log(f"Added character: {agent.profile.name} (ID: {character_id})")
-            return agent
+            for c in characters:
+                agent = by_id.get(c['character_id'])
+                if agent:
+                    self._register_agent(
+                        agent,
+                        c.get('initial_x', 250.0),
+                        c.get('initial_y', 250.0),
+                        c.get('initial_location_id')
+                    )
+            return agents
             
         finally:
             if db_session:
                 db_session.close()
     
+    def _register_agent(self, agent: CharacterAgent, initial_x: float, initial_y: float,
+                        initial_location_id: Optional[int]):
+        """把已创建的Agent放入世界"""
+        character_id = agent.character_id
+        agent.set_world(self.world)
+        agent.memory.auto_flush = not self.config.defer_memory_writes
+        
+        # 设置初始位置
+        self.world.set_character_position(
+            character_id, initial_x, initial_y, initial_location_id
+        )
+        
+        # 更新时间
+        agent.update_game_time(
+            self._game_time.day,
+            f"{self._game_time.hour:02d}:{self._game_time.minute:02d}",
+            initial_location_id
+        )
+        
+        # 初始状态：空闲（无任务）
+        self._agent_tasks[character_id] = None
+        
+        self._log(f"Added character: {agent.profile.name} (ID: {character_id})")
+    
     async def remove_character(self, character_id: int):
         """移除角色"""
+        agent = self.agent_manager.get_agent(character_id)
+        if agent:
+            agent.memory.flush()
+        
         # 移除任务
         self._agent_tasks.pop(character_id, None)
         self._task_heap = [t for t in self._task_heap if t.character_id != character_id]
         heapq.heapify(self._task_heap)
         
         await self.agent_manager.remove_agent(character_id)
+        self.world.remove_character_position(character_id)
+        self._encounter_detector.forget_character(character_id)
         self._log(f"Removed character: {character_id}")
     
     # ===== 主循环 =====
@@ -194,10 +272,26 @@ class GameSimulation:
         self._stop_flag = False
         self._log("Simulation started")
         
-        await self._main_loop()
+        if self.config.buffered_action_logs:
+            get_action_logger().start_write_behind(WriteBehindConfig(
+                flush_size=self.config.action_log_flush_size,
+                flush_interval_ms=self.config.action_log_flush_interval_ms
+            ))
+        
+        try:
+            await self._main_loop()
+        finally:
+            # 写入缓冲中的行动日志和角色记忆
+            await get_action_logger().stop_write_behind()
+            self.flush_memories()
     
     async def stop(self):
-        """停止模拟"""
+        """
+        停止模拟
+        
+        只设置停止标志；缓冲中的行动日志和角色记忆由 start() 退出主循环时统一写入，
+        需要确认写入完成时应等待 start() 返回
+        """
         self._stop_flag = True
         self._pause_event.set()  # 解除暂停以便退出
         self._state = SimulationState.STOPPED
@@ -265,10 +359,24 @@ class GameSimulation:
     # ===== 决策触发 =====
     
     async def _trigger_decisions(self, agents: List[CharacterAgent]):
-        """并行触发多个角色的决策"""
+        """并行触发多个角色的决策（决策请求经批量调度器合并为多角色请求发送）"""
         tasks = [self._trigger_single_decision(agent) for agent in agents]
         await asyncio.gather(*tasks, return_exceptions=True)
     
+    def _get_batch_dispatcher(self) -> Optional[BatchDispatcher]:
+        """获取决策批量调度器，未启用时返回None"""
+        if not self.config.batch_decisions:
+            return None
+        if self._batch_dispatcher is None:
+            self._batch_dispatcher = BatchDispatcher(
+                self.agent_manager._llm_client,
+                BatchConfig(
+                    window_ms=self.config.batch_window_ms,
+                    max_batch_size=self.config.batch_max_size
+                )
+            )
+        return self._batch_dispatcher
+    
     async def _trigger_single_decision(self, agent: CharacterAgent):
         """触发单个角色的决策"""
         try:
@@ -284,7 +392,7 @@ class GameSimulation:
             
             # 调用Agent决策
             decision = await asyncio.wait_for(
-                agent.perceive_and_decide(),
+                agent.perceive_and_decide(dispatcher=self._get_batch_dispatcher()),
                 timeout=self.config.decision_timeout
             )
             
@@ -364,10 +472,16 @@ class GameSimulation:
         
         if time_to_skip > 0:
             old_time = str(self._game_time)
+            old_day = self._game_time.day
             self._game_time.advance(time_to_skip)
             
-            # 更新世界状态
+            # 更新世界状态，所有移动中的角色一起推进
             self.world.update(self._game_time.hour, self._game_time.day)
+            self.world.advance_movement(time_to_skip)
+            
+            # 日期切换时写入所有角色的记忆
+            if self._game_time.day != old_day:
+                self.flush_memories()
             
             self._log(f"Time: {old_time} -> {self._game_time} (skipped {time_to_skip} min)")
             
@@ -376,6 +490,9 @@ class GameSimulation:
         
         # 处理所有已结束的任务
         await self._process_completed_tasks()
+        
+        # 检测新位置上的相遇
+        await self._detect_encounters()
     
     async def _process_completed_tasks(self):
         """处理所有已完成的任务"""
@@ -393,6 +510,99 @@ class GameSimulation:
                 self._log(f"[{agent.profile.name}] Finished: {task.action_name}")
                 await self._fire_action_end(agent, task)
     
+    # ===== 线下相遇 =====
+    
+    async def _detect_encounters(self):
+        """
+        对所有角色做一次相遇检测，把发生的相遇交给EncounterHandler处理
+        
+        睡眠中和正在对话的角色不参与；各对相遇涉及的角色互不重叠，可以同时处理
+        """
+        if not self.config.detect_encounters:
+            return
+        
+        # 按当前任务判断：睡眠/对话行动期间不参与相遇（agent.state不会随任务变成SLEEPING）
+        eligible = set()
+        for character_id, task in self._agent_tasks.items():
+            if task is not None and task.action_name in NO_ENCOUNTER_ACTIONS:
+                continue
+            agent = self.agent_manager.get_agent(character_id)
+            if agent is None or agent.state in (AgentState.SLEEPING, AgentState.TALKING):
+                continue
+            eligible.add(character_id)
+        if len(eligible) < 2:
+            return
+        
+        now = self._game_time.total_minutes
+        pairs = self._encounter_detector.sweep(self.world, now, eligible)
+        if not pairs:
+            return
+        
+        from .event_system.events import GameEvent, EventType
+        from .event_system.handlers import EventHandlerRegistry
+        from .social import social_handlers  # 导入时注册EncounterHandler
+        
+        registry = EventHandlerRegistry.get_instance()
+        
+        async def execute(event: GameEvent, agent: CharacterAgent):
+            # 每对相遇使用独立的数据库会话，并发处理时互不干扰
+            db_session = self._db_session_factory() if self._db_session_factory else None
+            try:
+                context = {'agent': agent, 'db': db_session, 'world': self.world}
+                return await registry.execute(event, context)
+            finally:
+                if db_session:
+                    db_session.close()
+        
+        executions = []
+        for character_id, other_id in pairs:
+            agent = self.agent_manager.get_agent(character_id)
+            pos = self.world.get_character_position(character_id)
+            location = (
+                self.world.location_manager.get(pos.location_id)
+                if pos and pos.location_id else None
+            )
+            location_name = location.name if location else "路上"
+            
+            self._log(f"Encounter: {character_id} <-> {other_id} at {location_name}")
+            event = GameEvent(
+                event_type=EventType.ENCOUNTER,
+                character_id=character_id,
+                scheduled_time=now,
+                data={'other_character_id': other_id, 'location_name': location_name}
+            )
+            executions.append(execute(event, agent))
+        
+        results = await asyncio.gather(*executions, return_exceptions=True)
+        for (character_id, other_id), result in zip(pairs, results):
+            # 处理器内部的异常由registry转为返回False，会话创建等异常在这里捕获
+            if isinstance(result, Exception):
+                self._log(f"Encounter error: {character_id} <-> {other_id}: {result}")
+            elif result is False:
+                self._log(f"Encounter failed: {character_id} <-> {other_id}")
+    
+    # ===== 记忆写入 =====
+    
+    def flush_memories(self) -> int:
+        """
+        把所有角色尚未写入的记忆在一个事务中写入数据库
+        
+        Returns:
+            写入的角色数量，失败返回-1
+        """
+        db_session = self._db_session_factory() if self._db_session_factory else None
+        try:
+            flushed = MemorySystem.flush_all(
+                [agent.memory for agent in self.agent_manager.get_all_agents()],
+                db_session
+            )
+            if flushed:
+                self._log(f"Flushed memories of {flushed} characters")
+            return flushed
+        finally:
+            if db_session:
+                db_session.close()
+    
     # ===== 手动步进 =====
     
     async def step(self) -> Dict[str, Any]:
@@ -498,7 +708,12 @@ class GameSimulation:
             'game_time_detail': self._game_time.to_dict(),
             'world': self.world.get_world_state(),
             'agents': agents_status,
-            'pending_tasks': len(self._task_heap)
+            'pending_tasks': len(self._task_heap),
+            'decision_batching': (
+                self._batch_dispatcher.get_stats() if self._batch_dispatcher else None
+            ),
+            'action_log': get_action_logger().get_stats(),
+            'encounters': self._encounter_detector.get_stats()
         }
     
     def _log(self, message: str):
@@ -8,14 +8,20 @@
 - 线下相遇
 """
 
-from .social_client import SocialClient, get_social_client
-from .social_scheduler import SocialScheduler, get_social_scheduler
+from .social_client import SocialClient, FeedPost, FeedComment, get_social_client
+from .social_scheduler import SocialScheduler, get_social_scheduler, create_social_scheduler
 from .social_handlers import SocialEventHandlers
+from .encounter_detector import EncounterDetector, EncounterConfig
 
 __all__ = [
     'SocialClient',
+    'FeedPost',
+    'FeedComment',
     'get_social_client',
     'SocialScheduler',
     'get_social_scheduler',
-    'SocialEventHandlers'
+    'create_social_scheduler',
+    'SocialEventHandlers',
+    'EncounterDetector',
+    'EncounterConfig'
 ]
@@ -0,0 +1,122 @@
+"""
+线下相遇检测模块
+
+每次时间推进后对所有角色做一次相遇检测：
+- 粗筛：用世界的空间网格一次找出所有距离在相遇半径内的角色对，代价与人数近似线性
+- 去重：每对角色只出现一次，同一次检测中每个角色最多参与一次相遇
+- 冷却：同一对角色相遇后，在冷却时间内不会再次相遇
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+
+@dataclass
+class EncounterConfig:
+    """相遇检测配置"""
+    radius: float = 5.0               # 相遇半径（与World.check_encounter默认值一致）
+    cooldown_minutes: int = 180       # 同一对角色两次相遇的最短间隔（游戏分钟）
+    probability: float = 0.3          # 候选角色对实际发生相遇的概率
+    max_encounters_per_sweep: int = 10  # 每次检测最多发生的相遇数（每次相遇会调用LLM）
+
+
+class EncounterDetector:
+    """
+    相遇检测器
+
+    使用方式：
+        detector = EncounterDetector()
+        pairs = detector.sweep(world, now, eligible=idle_ids)
+        for a, b in pairs: ...   # 交给EncounterHandler处理
+    """
+
+    def __init__(self, config: Optional[EncounterConfig] = None,
+                 rng: Optional[random.Random] = None):
+        self.config = config or EncounterConfig()
+        self._rng = rng or random.Random()
+
+        # (小ID, 大ID) -> 上次相遇的游戏时间
+        self._last_encounter: Dict[Tuple[int, int], int] = {}
+
+        # 统计
+        self._sweeps = 0
+        self._candidates = 0
+        self._cooling_down = 0
+        self._encounters = 0
+
+    @staticmethod
+    def pair_key(a: int, b: int) -> Tuple[int, int]:
+        return (a, b) if a < b else (b, a)
+
+    def sweep(self, world, now: int,
+              eligible: Optional[Set[int]] = None) -> List[Tuple[int, int]]:
+        """
+        检测当前时刻发生的相遇
+
+        Args:
+            world: 游戏世界
+            now: 当前游戏时间（总分钟数）
+            eligible: 可以参与相遇的角色ID，None表示全部
+
+        Returns:
+            发生相遇的角色对列表（小ID在前），每个角色最多出现一次
+        """
+        self._sweeps += 1
+        self._expire(now)
+
+        candidates = world.find_encounter_pairs(self.config.radius)
+        self._candidates += len(candidates)
+
+        # 先排序使结果只取决于随机数种子，再打乱，避免上限截断时总是小ID的角色优先
+        candidates.sort()
+        self._rng.shuffle(candidates)
+
+        busy: Set[int] = set()
+        accepted = []
+        for a, b in candidates:
+            if len(accepted) >= self.config.max_encounters_per_sweep:
+                break
+            if eligible is not None and (a not in eligible or b not in eligible):
+                continue
+            if a in busy or b in busy:
+                continue
+
+            key = self.pair_key(a, b)
+            last = self._last_encounter.get(key)
+            if last is not None and now - last < self.config.cooldown_minutes:
+                self._cooling_down += 1
+                continue
+
+            if self._rng.random() >= self.config.probability:
+                continue
+
+            self._last_encounter[key] = now
+            busy.add(a)
+            busy.add(b)
+            accepted.append(key)
+
+        self._encounters += len(accepted)
+        return accepted
+
+    def _expire(self, now: int):
+        """清理已过冷却时间的记录"""
+        cooldown = self.config.cooldown_minutes
+        expired = [key for key, last in self._last_encounter.items() if now - last >= cooldown]
+        for key in expired:
+            del self._last_encounter[key]
+
+    def forget_character(self, character_id: int):
+        """移除某个角色的冷却记录（角色离开模拟时调用）"""
+        for key in [k for k in self._last_encounter if character_id in k]:
+            del self._last_encounter[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取检测统计"""
+        return {
+            'sweeps': self._sweeps,
+            'candidate_pairs': self._candidates,
+            'skipped_cooldown': self._cooling_down,
+            'encounters': self._encounters,
+            'pairs_in_cooldown': len(self._last_encounter),
+        }
@@ -6,11 +6,11 @@
 """
 
 import asyncio
-from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any
+from dataclasses import dataclass, field, replace
+from typing import Optional, List, Dict, Any, Tuple, Iterable
 from datetime import datetime
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy.orm import Session, contains_eager, joinedload
+from sqlalchemy import desc, func, select, or_
 
 # 延迟导入以避免循环依赖
 _models = None
@@ -47,12 +47,12 @@ class PostData:
     created_at: datetime
     
     @classmethod
-    def from_db(cls, post, db: Session) -> 'PostData':
-        models = _get_models()
-        comments_count = db.query(func.count(models.Comment.id)).filter(
-            models.Comment.post_id == post.id
-        ).scalar()
+    def from_db(cls, post, db: Session = None) -> 'PostData':
+        """
+        从数据库对象创建
         
+        评论数直接读取 posts.comments_count 冗余字段，不再单独查询
+        """
         return cls(
             id=post.id,
             content=post.content,
@@ -61,7 +61,7 @@ class PostData:
             author_name=post.author.nickname or post.author.username,
             author_is_ai=post.author.is_ai,
             likes_count=post.likes_count,
-            comments_count=comments_count,
+            comments_count=post.comments_count or 0,
             created_at=post.created_at
         )
 
@@ -77,6 +77,56 @@ class CommentData:
     created_at: datetime
 
 
+@dataclass(frozen=True)
+class FeedComment:
+    """动态流中的评论（只读）"""
+    id: int
+    post_id: int
+    author_id: int
+    author_name: str
+    content: str
+    created_at: datetime
+    is_mine: bool = False
+
+
+@dataclass(frozen=True)
+class FeedPost:
+    """动态流中的帖子（只读，附带评论）"""
+    id: int
+    content: str
+    image_path: Optional[str]
+    author_id: int
+    author_name: str
+    author_is_ai: bool
+    likes_count: int
+    comments_count: int
+    created_at: datetime
+    comments: Tuple[FeedComment, ...] = ()
+    
+    @property
+    def has_commented(self) -> bool:
+        """浏览者是否评论过（浏览者自己的评论总会被加载）"""
+        return any(c.is_mine for c in self.comments)
+    
+    def to_agent_dict(self) -> Dict[str, Any]:
+        """转换为Agent浏览帖子时使用的格式"""
+        return {
+            'id': self.id,
+            'content': self.content,
+            'author_name': self.author_name,
+            'likes_count': self.likes_count,
+            'comments': [
+                {
+                    'author_name': c.author_name,
+                    'content': c.content,
+                    'is_mine': c.is_mine
+                }
+                for c in self.comments
+            ],
+            'has_commented': self.has_commented
+        }
+
+
 @dataclass
 class MessageData:
     """消息数据"""
@@ -136,7 +186,8 @@ class SocialClient:
     # ===== 帖子相关 =====
     
     def get_latest_posts(self, limit: int = 10, offset: int = 0,
-                         exclude_author_id: int = None) -> List[PostData]:
+                         exclude_author_id: int = None,
+                         cursor: Optional[str] = None) -> List[PostData]:
         """
         获取最新帖子
         
@@ -144,6 +195,7 @@ class SocialClient:
             limit: 获取数量
             offset: 跳过前N条（分页用）
             exclude_author_id: 排除指定作者的帖子
+            cursor: 游标（见next_cursor），提供时忽略offset
             
         Returns:
             帖子列表
@@ -151,17 +203,19 @@ class SocialClient:
         models = _get_models()
         db = self._get_db()
         
-        query = db.query(models.Post).join(models.User)
+        query = db.query(models.Post).join(models.Post.author).options(
+            contains_eager(models.Post.author)
+        )
         
         if exclude_author_id:
             query = query.filter(models.Post.author_id != exclude_author_id)
         
-        posts = query.order_by(desc(models.Post.created_at)).offset(offset).limit(limit).all()
+        posts = self._paginate(query, models.Post, offset, cursor).limit(limit).all()
         
         return [PostData.from_db(p, db) for p in posts]
     
     def get_user_posts(self, user_id: int, limit: int = 10, 
-                       offset: int = 0) -> List[PostData]:
+                       offset: int = 0, cursor: Optional[str] = None) -> List[PostData]:
         """
         获取指定用户的帖子
         
@@ -169,6 +223,7 @@ class SocialClient:
             user_id: 用户ID
             limit: 获取数量
             offset: 跳过前N条（分页用）
+            cursor: 游标（见next_cursor），提供时忽略offset
             
         Returns:
             帖子列表
@@ -176,12 +231,158 @@ class SocialClient:
         models = _get_models()
         db = self._get_db()
         
-        posts = db.query(models.Post).join(models.User).filter(
+        query = db.query(models.Post).join(models.Post.author).options(
+            contains_eager(models.Post.author)
+        ).filter(
             models.Post.author_id == user_id
-        ).order_by(desc(models.Post.created_at)).offset(offset).limit(limit).all()
+        )
+        posts = self._paginate(query, models.Post, offset, cursor).limit(limit).all()
         
         return [PostData.from_db(p, db) for p in posts]
     
+    @staticmethod
+    def _paginate(query, post_model, offset: int = 0, cursor: Optional[str] = None):
+        """按发布时间倒序分页：有游标走键集条件，否则走OFFSET"""
+        from shared.pagination import apply_keyset
+        query = apply_keyset(query, post_model.created_at, post_model.id, cursor)
+        if not cursor and offset:
+            query = query.offset(offset)
+        return query
+    
+    @staticmethod
+    def next_cursor(posts: List[Any]) -> Optional[str]:
+        """
+        根据本页最后一条帖子生成下一页游标
+        
+        Args:
+            posts: PostData或FeedPost列表
+            
+        Returns:
+            游标字符串，空列表返回None
+        """
+        if not posts:
+            return None
+        from shared.pagination import encode_cursor
+        return encode_cursor(posts[-1].created_at, posts[-1].id)
+    
+    # ===== 批量动态流 =====
+    
+    def get_feed(self, viewer_id: int, limit: int = 10, offset: int = 0,
+                 exclude_author_id: int = None, author_id: int = None,
+                 comments_limit: Optional[int] = None,
+                 cursor: Optional[str] = None) -> List[FeedPost]:
+        """
+        批量加载动态流：帖子 + 作者 + 评论数（1次查询，评论数读取posts.comments_count），
+        可选附带每条帖子的前N条评论和浏览者自己的评论（再1次查询）
+        
+        Args:
+            viewer_id: 浏览者ID（用于加载自己的评论）
+            limit: 帖子数量
+            offset: 跳过前N条
+            exclude_author_id: 排除指定作者的帖子
+            author_id: 只看指定作者的帖子
+            comments_limit: 每条帖子加载的评论数，None表示不加载评论
+            cursor: 游标（见next_cursor），提供时忽略offset
+            
+        Returns:
+            只读的帖子记录列表（按发布时间倒序）
+        """
+        models = _get_models()
+        db = self._get_db()
+        
+        Post, User = models.Post, models.User
+        
+        query = db.query(
+            Post.id, Post.content, Post.image_path, Post.author_id,
+            Post.likes_count, Post.comments_count, Post.created_at,
+            User.nickname, User.username, User.is_ai
+        ).join(User, User.id == Post.author_id)
+        
+        if exclude_author_id:
+            query = query.filter(Post.author_id != exclude_author_id)
+        if author_id:
+            query = query.filter(Post.author_id == author_id)
+        
+        rows = self._paginate(query, Post, offset, cursor).limit(limit).all()
+        
+        posts = [
+            FeedPost(
+                id=row.id,
+                content=row.content,
+                image_path=row.image_path,
+                author_id=row.author_id,
+                author_name=row.nickname or row.username,
+                author_is_ai=row.is_ai,
+                likes_count=row.likes_count or 0,
+                comments_count=row.comments_count or 0,
+                created_at=row.created_at
+            )
+            for row in rows
+        ]
+        
+        if comments_limit is not None:
+            posts = self.with_comments(posts, viewer_id, comments_limit)
+        
+        return posts
+    
+    def with_comments(self, posts: List[FeedPost], viewer_id: int,
+                      limit: int = 10) -> List[FeedPost]:
+        """为一组帖子附加评论（1次查询），返回新的帖子记录"""
+        comments = self.get_comments_for_posts([p.id for p in posts], viewer_id, limit)
+        return [replace(p, comments=tuple(comments.get(p.id, ()))) for p in posts]
+    
+    def get_comments_for_posts(self, post_ids: Iterable[int], viewer_id: int,
+                               limit: int = 10) -> Dict[int, List[FeedComment]]:
+        """
+        一次查询多个帖子的评论
+        
+        每个帖子返回前limit条评论 + 浏览者自己的所有评论（按时间顺序），
+        使用窗口函数在数据库中完成每帖截断
+        
+        Returns:
+            post_id -> 评论列表
+        """
+        post_ids = list(post_ids)
+        if not post_ids:
+            return {}
+        
+        models = _get_models()
+        db = self._get_db()
+        
+        Comment, User = models.Comment, models.User
+        
+        row_number = func.row_number().over(
+            partition_by=Comment.post_id,
+            order_by=(Comment.created_at, Comment.id)
+        ).label('rn')
+        ranked = select(
+            Comment.id, Comment.post_id, Comment.author_id,
+            Comment.content, Comment.created_at, row_number
+        ).where(Comment.post_id.in_(post_ids)).subquery()
+        
+        rows = db.query(
+            ranked.c.id, ranked.c.post_id, ranked.c.author_id,
+            ranked.c.content, ranked.c.created_at,
+            User.nickname, User.username
+        ).join(
+            User, User.id == ranked.c.author_id
+        ).filter(
+            or_(ranked.c.rn <= limit, ranked.c.author_id == viewer_id)
+        ).order_by(ranked.c.post_id, ranked.c.rn).all()
+        
+        result: Dict[int, List[FeedComment]] = {}
+        for row in rows:
+            result.setdefault(row.post_id, []).append(FeedComment(
+                id=row.id,
+                post_id=row.post_id,
+                author_id=row.author_id,
+                author_name=row.nickname or row.username,
+                content=row.content,
+                created_at=row.created_at,
+                is_mine=row.author_id == viewer_id
+            ))
+        return result
+    
     def get_user_posts_count(self, user_id: int) -> int:
         """获取指定用户的帖子总数"""
         models = _get_models()
@@ -265,7 +466,9 @@ class SocialClient:
         # 创建点赞
         new_like = models.PostLike(post_id=post_id, user_id=user_id)
         db.add(new_like)
-        post.likes_count += 1
+        # 原子更新计数，多个会话同时点赞同一帖子时不会丢失
+        post.likes_count = models.Post.likes_count + 1
+        post.last_activity_at = func.now()
         
         db.commit()
         return True
@@ -299,7 +502,9 @@ class SocialClient:
         models = _get_models()
         db = self._get_db()
         
-        comments = db.query(models.Comment).join(models.User).filter(
+        comments = db.query(models.Comment).join(models.Comment.author).options(
+            contains_eager(models.Comment.author)
+        ).filter(
             models.Comment.post_id == post_id
         ).order_by(models.Comment.created_at).limit(limit).all()
         
@@ -330,36 +535,18 @@ class SocialClient:
         Returns:
             评论列表
         """
-        models = _get_models()
-        db = self._get_db()
-        
-        # 获取前N条评论
-        top_comments = db.query(models.Comment).join(models.User).filter(
-            models.Comment.post_id == post_id
-        ).order_by(models.Comment.created_at).limit(limit).all()
-        
-        top_comment_ids = {c.id for c in top_comments}
-        
-        # 获取用户自己的评论（不在前N条中的）
-        my_comments = db.query(models.Comment).join(models.User).filter(
-            models.Comment.post_id == post_id,
-            models.Comment.author_id == user_id,
-            models.Comment.id.notin_(top_comment_ids) if top_comment_ids else True
-        ).order_by(models.Comment.created_at).all()
-        
-        # 合并结果
-        all_comments = list(top_comments) + list(my_comments)
+        comments = self.get_comments_for_posts([post_id], user_id, limit).get(post_id, [])
         
         return [
             CommentData(
                 id=c.id,
                 post_id=c.post_id,
                 author_id=c.author_id,
-                author_name=c.author.nickname or c.author.username,
+                author_name=c.author_name,
                 content=c.content,
                 created_at=c.created_at
             )
-            for c in all_comments
+            for c in comments
         ]
     
     def has_user_commented(self, user_id: int, post_id: int) -> bool:
@@ -405,6 +592,11 @@ class SocialClient:
         )
         
         db.add(new_comment)
+        # 与评论在同一事务中更新帖子计数
+        db.query(models.Post).filter(models.Post.id == post_id).update({
+            models.Post.comments_count: models.Post.comments_count + 1,
+            models.Post.last_activity_at: func.now()
+        }, synchronize_session=False)
         db.commit()
         db.refresh(new_comment)
         
@@ -425,7 +617,9 @@ class SocialClient:
         db = self._get_db()
         
         messages = db.query(models.Message).join(
-            models.User, models.Message.sender_id == models.User.id
+            models.Message.sender
+        ).options(
+            contains_eager(models.Message.sender)
         ).filter(
             models.Message.receiver_id == user_id,
             models.Message.is_read == False,
@@ -453,7 +647,9 @@ class SocialClient:
         
         from sqlalchemy import or_, and_
         
-        messages = db.query(models.Message).filter(
+        messages = db.query(models.Message).options(
+            joinedload(models.Message.sender)
+        ).filter(
             or_(
                 and_(models.Message.sender_id == user_id, 
                      models.Message.receiver_id == partner_id),
@@ -466,20 +662,18 @@ class SocialClient:
         # 反转顺序（最旧的在前）
         messages.reverse()
         
-        result = []
-        for m in messages:
-            sender = db.query(models.User).filter(models.User.id == m.sender_id).first()
-            result.append(MessageData(
+        return [
+            MessageData(
                 id=m.id,
                 sender_id=m.sender_id,
-                sender_name=sender.nickname or sender.username if sender else "未知",
+                sender_name=m.sender.nickname or m.sender.username if m.sender else "未知",
                 receiver_id=m.receiver_id,
                 content=m.content,
                 is_read=m.is_read,
                 created_at=m.created_at
-            ))
-        
-        return result
+            )
+            for m in messages
+        ]
     
     def send_message(self, sender_id: int, receiver_id: int, 
                      content: str) -> Optional[MessageData]:
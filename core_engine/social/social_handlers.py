@@ -12,7 +12,8 @@ from typing import Dict, Any, Optional
 
 from ..event_system.events import GameEvent, EventType, EventStatus
 from ..event_system.handlers import EventHandler, event_handler, EventHandlerRegistry
-from .social_scheduler import SocialScheduler, get_social_scheduler
+from .social_client import SocialClient
+from .social_scheduler import SocialScheduler, create_social_scheduler
 
 
 @event_handler(EventType.USE_PHONE)
@@ -26,13 +27,15 @@ class UsePhoneHandler(EventHandler):
     - 可能发帖
     """
     
+    parallel_safe = True
+    
     async def handle(self, event: GameEvent, context: Dict[str, Any]) -> bool:
         agent = context.get('agent')
         if not agent:
             print(f"UsePhoneHandler: No agent in context for character {event.character_id}")
             return False
         
-        scheduler = get_social_scheduler(context.get('db'))
+        scheduler = create_social_scheduler(context.get('db'))
         duration = event.duration or 10
         
         # 执行看手机行为
@@ -77,12 +80,14 @@ class PostContentHandler(EventHandler):
     处理AI角色主动发帖的行为
     """
     
+    parallel_safe = True
+    
     async def handle(self, event: GameEvent, context: Dict[str, Any]) -> bool:
         agent = context.get('agent')
         if not agent:
             return False
         
-        scheduler = get_social_scheduler(context.get('db'))
+        scheduler = create_social_scheduler(context.get('db'))
         
         # 获取上下文（如果有）
         post_context = event.data.get('context', '')
@@ -107,6 +112,8 @@ class OnlinePrivateChatHandler(EventHandler):
     处理AI角色的私聊对话
     """
     
+    parallel_safe = True
+    
     async def handle(self, event: GameEvent, context: Dict[str, Any]) -> bool:
         from ..character.agent import AgentManager
         
@@ -121,7 +128,7 @@ class OnlinePrivateChatHandler(EventHandler):
         
         partner_id = participant_ids[0]
         
-        scheduler = get_social_scheduler(context.get('db'))
+        scheduler = create_social_scheduler(context.get('db'))
         
         # 检查是回复还是主动发起
         if event.data.get('is_reply', False):
@@ -153,6 +160,8 @@ class EncounterHandler(EventHandler):
     处理两个角色在同一地点相遇的情况
     """
     
+    parallel_safe = True
+    
     async def handle(self, event: GameEvent, context: Dict[str, Any]) -> bool:
         from ..character.agent import AgentManager
         
@@ -174,7 +183,7 @@ class EncounterHandler(EventHandler):
             return self._handle_encounter_with_npc(agent, other_id, event, context)
         
         # 两个AI角色相遇
-        scheduler = get_social_scheduler(context.get('db'))
+        scheduler = create_social_scheduler(context.get('db'))
         location = event.data.get('location_name', '某处')
         
         results = await scheduler.handle_encounter(agent, other_agent, location)
@@ -194,9 +203,8 @@ class EncounterHandler(EventHandler):
                                     context: Dict[str, Any]) -> bool:
         """处理与非AI角色（NPC或玩家）的相遇"""
         # 简单处理：不主动发起对话，只是注意到对方
-        from .social_client import get_social_client
         
-        client = get_social_client(context.get('db'))
+        client = SocialClient(context.get('db'))
         other_user = client.get_user(other_id)
         
         if other_user:
@@ -16,6 +16,7 @@ from datetime import datetime, timedelta
 from enum import Enum
 
 from .social_client import SocialClient, PostData, MessageData, get_social_client
+from ..ai_integration.request_scheduler import RequestPriority
 
 if TYPE_CHECKING:
     from ..character.agent import CharacterAgent
@@ -55,8 +56,8 @@ class SocialScheduler:
     - 处理线下相遇对话
     """
     
-    def __init__(self, db_session=None):
-        self._social_client = get_social_client(db_session)
+    def __init__(self, db_session=None, social_client: Optional[SocialClient] = None):
+        self._social_client = social_client or get_social_client(db_session)
         self._db = db_session
     
     def set_db(self, db_session):
@@ -124,8 +125,9 @@ class SocialScheduler:
         
         results = []
         
-        # 获取最新帖子
-        posts = self._social_client.get_latest_posts(
+        # 获取最新帖子（帖子、作者、评论数一次查询）
+        posts = self._social_client.get_feed(
+            agent.character_id,
             limit=max_posts * 2,  # 获取更多，随机选择
             exclude_author_id=agent.character_id
         )
@@ -142,34 +144,13 @@ class SocialScheduler:
         # 随机选择要看的帖子
         posts_to_view = random.sample(posts, min(max_posts, len(posts)))
         
-        # 转换为agent可用的格式，包含评论
-        posts_for_agent = []
-        for p in posts_to_view:
-            # 获取评论（前N条 + 自己的评论）
-            comments = self._social_client.get_post_comments_for_user(
-                p.id, 
-                agent.character_id,
-                limit=settings.ai_browse_comments_limit
-            )
-            
-            # 检查自己是否已评论
-            has_commented = any(c.author_id == agent.character_id for c in comments)
-            
-            posts_for_agent.append({
-                'id': p.id,
-                'content': p.content,
-                'author_name': p.author_name,
-                'likes_count': p.likes_count,
-                'comments': [
-                    {
-                        'author_name': c.author_name,
-                        'content': c.content,
-                        'is_mine': c.author_id == agent.character_id
-                    }
-                    for c in comments
-                ],
-                'has_commented': has_commented
-            })
+        # 一次查询加载评论（前N条 + 自己的评论）
+        posts_to_view = self._social_client.with_comments(
+            posts_to_view,
+            agent.character_id,
+            limit=settings.ai_browse_comments_limit
+        )
+        posts_for_agent = [p.to_agent_dict() for p in posts_to_view]
         
         # 让Agent决定对每个帖子的反应
         reactions = await agent.browse_feed(posts_for_agent)
@@ -295,10 +276,15 @@ class SocialScheduler:
                 duration=1
             )]
         
-        # 获取该用户的帖子
-        posts = self._social_client.get_user_posts(
-            user_id=target_id,
-            limit=max_posts
+        from shared.config import get_settings
+        settings = get_settings()
+        
+        # 获取该用户的帖子和评论（前N条 + 自己的评论），共两次查询
+        posts = self._social_client.get_feed(
+            agent.character_id,
+            limit=max_posts,
+            author_id=target_id,
+            comments_limit=settings.ai_browse_comments_limit
         )
         
         if not posts:
@@ -311,37 +297,7 @@ class SocialScheduler:
             ))
             return results
         
-        from shared.config import get_settings
-        settings = get_settings()
-        
-        # 转换为agent可用的格式，包含评论
-        posts_for_agent = []
-        for p in posts:
-            # 获取评论（前N条 + 自己的评论）
-            comments = self._social_client.get_post_comments_for_user(
-                p.id, 
-                agent.character_id,
-                limit=settings.ai_browse_comments_limit
-            )
-            
-            # 检查自己是否已评论
-            has_commented = any(c.author_id == agent.character_id for c in comments)
-            
-            posts_for_agent.append({
-                'id': p.id,
-                'content': p.content,
-                'author_name': p.author_name,
-                'likes_count': p.likes_count,
-                'comments': [
-                    {
-                        'author_name': c.author_name,
-                        'content': c.content,
-                        'is_mine': c.author_id == agent.character_id
-                    }
-                    for c in comments
-                ],
-                'has_commented': has_commented
-            })
+        posts_for_agent = [p.to_agent_dict() for p in posts]
         
         # 让Agent决定对每个帖子的反应
         reactions = await agent.browse_feed(posts_for_agent)
@@ -523,7 +479,9 @@ class SocialScheduler:
         response = await agent._llm.generate_json(
             agent._build_system_prompt(),
             prompt,
-            temperature=0.7
+            temperature=0.7,
+            priority=RequestPriority.FEED,
+            character_id=agent.character_id
         )
         
         if response and response.get('reply') and response.get('content'):
@@ -572,7 +530,9 @@ class SocialScheduler:
         response = await agent._llm.generate_json(
             agent._build_system_prompt(),
             prompt,
-            temperature=0.8
+            temperature=0.8,
+            priority=RequestPriority.FEED,
+            character_id=agent.character_id
         )
         
         if not response or not response.get('content'):
@@ -686,38 +646,6 @@ class SocialScheduler:
         await agent2.end_conversation(agent1.character_id, agent1.profile.name)
         
         return results
-    
-    async def check_for_encounters(self, 
-                                    agents: List['CharacterAgent'],
-                                    location_id: int) -> List[tuple]:
-        """
-        检查同一地点的角色是否相遇
-        
-        Args:
-            agents: 在同一地点的角色列表
-            location_id: 地点ID
-            
-        Returns:
-            可能发生相遇的角色对列表
-        """
-        if len(agents) < 2:
-            return []
-        
-        encounters = []
-        checked = set()
-        
-        for i, agent1 in enumerate(agents):
-            for agent2 in agents[i+1:]:
-                pair_key = tuple(sorted([agent1.character_id, agent2.character_id]))
-                if pair_key in checked:
-                    continue
-                checked.add(pair_key)
-                
-                # 30%的概率发生相遇对话
-                if random.random() < 0.3:
-                    encounters.append((agent1, agent2))
-        
-        return encounters
 
 
 # 全局实例
@@ -732,3 +660,13 @@ def get_social_scheduler(db_session=None) -> SocialScheduler:
     elif db_session:
         _scheduler_instance.set_db(db_session)
     return _scheduler_instance
+
+
+def create_social_scheduler(db_session=None) -> SocialScheduler:
+    """
+    创建独立的社交调度器（不使用全局实例）
+    
+    全局实例只有一个数据库会话，并发执行的事件处理器各自创建调度器，
+    读写都落在自己的会话中
+    """
+    return SocialScheduler(db_session, SocialClient(db_session))
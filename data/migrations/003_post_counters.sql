@@ -0,0 +1,20 @@
+-- 帖子计数字段
+-- comments_count：评论数，发表/删除评论时在同一事务中维护，列表接口不再逐条COUNT
+-- last_activity_at：最近一次被评论/点赞的时间
+-- 计数与实际数据不一致时，可执行 python repair_post_counters.py 重新校准
+
+USE ai_community;
+
+ALTER TABLE posts
+    ADD COLUMN comments_count INT DEFAULT 0 AFTER likes_count,
+    ADD COLUMN last_activity_at DATETIME DEFAULT CURRENT_TIMESTAMP AFTER created_at;
+
+-- 回填已有帖子
+UPDATE posts p
+LEFT JOIN (
+    SELECT post_id, COUNT(*) AS cnt, MAX(created_at) AS last_at
+    FROM comments
+    GROUP BY post_id
+) c ON c.post_id = p.id
+SET p.comments_count = COALESCE(c.cnt, 0),
+    p.last_activity_at = GREATEST(p.created_at, COALESCE(c.last_at, p.created_at));
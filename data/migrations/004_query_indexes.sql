@@ -0,0 +1,25 @@
+-- 模拟热点查询的复合索引
+-- 与 api_server/models.py 中的 Index 声明保持一致
+-- 效果对比可运行 python benchmarks/query_indexes.py
+
+USE ai_community;
+
+-- 未读消息：WHERE receiver_id = ? AND is_read = 0 ORDER BY created_at
+CREATE INDEX idx_receiver_unread ON messages (receiver_id, is_read, created_at);
+
+-- 私聊历史：WHERE (sender_id, receiver_id) = (?, ?) ORDER BY created_at DESC LIMIT n
+-- 覆盖原 idx_private_chat (sender_id, receiver_id) 的前缀，原索引删除
+CREATE INDEX idx_private_chat_time ON messages (sender_id, receiver_id, created_at);
+DROP INDEX idx_private_chat ON messages;
+
+-- 帖子评论：WHERE post_id IN (...) ORDER BY created_at
+-- 覆盖原 idx_post (post_id) 的前缀，原索引删除
+CREATE INDEX idx_post_created ON comments (post_id, created_at);
+DROP INDEX idx_post ON comments;
+
+-- 共同记忆：WHERE memory_type = 'common'
+-- 个人记忆 (user_id, memory_type) 已有 idx_user_type
+CREATE INDEX idx_memory_type ON memories (memory_type);
+
+-- 角色某天的行动日志：WHERE character_id = ? AND game_day = ? ORDER BY created_at DESC
+CREATE INDEX idx_character_day_time ON action_logs (character_id, game_day, created_at);
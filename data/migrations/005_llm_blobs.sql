@@ -0,0 +1,19 @@
+-- LLM输入/输出的压缩存储
+-- 行动日志中的完整prompt和LLM原始响应移到按内容哈希寻址的压缩表中：
+-- - 相同内容（如重复的系统提示词）只存一份
+-- - action_logs只保存哈希，日志列表查询不再读取大文本
+-- 旧日志的 input_prompt / llm_response 列保留，读取详情时作为回退
+
+USE ai_community;
+
+CREATE TABLE IF NOT EXISTS llm_blobs (
+    hash CHAR(64) PRIMARY KEY,              -- 原文的SHA-256
+    codec VARCHAR(10) NOT NULL DEFAULT 'zlib',
+    data MEDIUMBLOB NOT NULL,               -- 压缩后的内容
+    raw_size INT NOT NULL,                  -- 原文字节数
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+ALTER TABLE action_logs
+    ADD COLUMN input_prompt_hash CHAR(64) NULL AFTER llm_response,
+    ADD COLUMN llm_response_hash CHAR(64) NULL AFTER input_prompt_hash;
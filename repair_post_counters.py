@@ -0,0 +1,96 @@
+"""
+帖子计数校准脚本
+
+根据comments、post_likes表重新计算posts表中的反规范化字段：
+- comments_count：评论数
+- likes_count：点赞数
+- last_activity_at：最近一次评论/点赞时间（不早于发帖时间）
+
+用法：
+    python repair_post_counters.py            # 校准所有帖子
+    python repair_post_counters.py --dry-run  # 只检查不修改
+"""
+
+import argparse
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select, func
+
+from api_server.database import SessionLocal
+from api_server.models import Post, PostLike, Comment
+
+
+def _actual_comments_count():
+    return select(func.count(Comment.id)).where(
+        Comment.post_id == Post.id
+    ).correlate(Post).scalar_subquery()
+
+
+def _actual_likes_count():
+    return select(func.count(PostLike.id)).where(
+        PostLike.post_id == Post.id
+    ).correlate(Post).scalar_subquery()
+
+
+def _actual_last_activity():
+    last_comment = select(func.max(Comment.created_at)).where(
+        Comment.post_id == Post.id
+    ).correlate(Post).scalar_subquery()
+    last_like = select(func.max(PostLike.created_at)).where(
+        PostLike.post_id == Post.id
+    ).correlate(Post).scalar_subquery()
+    return func.greatest(
+        Post.created_at,
+        func.coalesce(last_comment, Post.created_at),
+        func.coalesce(last_like, Post.created_at)
+    )
+
+
+def repair_post_counters(dry_run: bool = False) -> int:
+    """
+    校准帖子计数
+
+    Returns:
+        计数不一致的帖子数量
+    """
+    db = SessionLocal()
+    try:
+        mismatched = db.query(func.count(Post.id)).filter(
+            (func.coalesce(Post.comments_count, -1) != _actual_comments_count()) |
+            (func.coalesce(Post.likes_count, -1) != _actual_likes_count())
+        ).scalar() or 0
+
+        print(f"计数不一致的帖子: {mismatched}")
+
+        if dry_run:
+            return mismatched
+
+        updated = db.query(Post).update({
+            Post.comments_count: _actual_comments_count(),
+            Post.likes_count: _actual_likes_count(),
+            Post.last_activity_at: _actual_last_activity(),
+        }, synchronize_session=False)
+        db.commit()
+
+        print(f"已校准帖子: {updated}")
+        return mismatched
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="校准帖子评论数/点赞数")
+    parser.add_argument("--dry-run", action="store_true", help="只检查不修改")
+    args = parser.parse_args()
+
+    try:
+        repair_post_counters(dry_run=args.dry_run)
+    except Exception as e:
+        print(f"错误: {e}")
+        sys.exit(1)
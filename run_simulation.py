@@ -69,7 +69,8 @@ async def run_interactive_simulation():
     world_config = WorldConfig(
         name="AI社区",
         map_width=500.0,
-        map_height=500.0
+        map_height=500.0,
+        continuous_movement=True   # 角色沿路线移动，时间推进时更新位置
     )
     
     simulation = create_simulation(
@@ -95,14 +96,14 @@ async def run_interactive_simulation():
             print("警告: 没有找到AI角色，请先在数据库中创建 is_ai=True 的用户")
             return
         
-        for i, user in enumerate(ai_users):
-            initial_x = 100 + (i % 5) * 80
-            initial_y = 100 + (i // 5) * 80
-            await simulation.add_character(
-                character_id=user.id,
-                initial_x=initial_x,
-                initial_y=initial_y
-            )
+        await simulation.add_characters([
+            {
+                'character_id': user.id,
+                'initial_x': 100 + (i % 5) * 80,
+                'initial_y': 100 + (i // 5) * 80
+            }
+            for i, user in enumerate(ai_users)
+        ])
         
     finally:
         db.close()
@@ -141,6 +142,8 @@ async def run_interactive_simulation():
             
             elif cmd == "stop":
                 await simulation.stop()
+                if simulation_task and not simulation_task.done():
+                    await simulation_task  # 等待剩余日志和记忆写入
                 print("模拟已停止")
             
             elif cmd == "pause":
@@ -174,6 +177,8 @@ async def run_interactive_simulation():
             
             elif cmd in ["quit", "exit", "q"]:
                 await simulation.stop()
+                if simulation_task and not simulation_task.done():
+                    await simulation_task
                 print("再见!")
                 break
             
@@ -183,6 +188,8 @@ async def run_interactive_simulation():
     except KeyboardInterrupt:
         print("\n中断")
         await simulation.stop()
+        if simulation_task and not simulation_task.done():
+            await simulation_task
 
 
 async def run_step_by_step(steps: int = 10):
@@ -206,12 +213,14 @@ async def run_step_by_step(steps: int = 10):
         await simulation.initialize(db)
         
         ai_users = load_ai_characters(db)
-        for i, user in enumerate(ai_users):
-            await simulation.add_character(
-                character_id=user.id,
-                initial_x=100 + (i % 5) * 80,
-                initial_y=100 + (i // 5) * 80
-            )
+        await simulation.add_characters([
+            {
+                'character_id': user.id,
+                'initial_x': 100 + (i % 5) * 80,
+                'initial_y': 100 + (i // 5) * 80
+            }
+            for i, user in enumerate(ai_users)
+        ])
     finally:
         db.close()
     
@@ -229,6 +238,8 @@ async def run_step_by_step(steps: int = 10):
             print(f"  {action['character']}: {action['action']} ({action['duration']}分钟)")
         print()
     
+    # 步进模式不经过start()，手动写入延迟的角色记忆
+    simulation.flush_memories()
     print(f"结束时间: {simulation.game_time}")
 
 
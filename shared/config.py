@@ -36,6 +36,7 @@ class Settings(BaseSettings):
     
     # AI社交行为配置
     ai_browse_comments_limit: int = 10  # AI浏览帖子时显示的评论数量
+    ai_feed_reaction_mode: str = "batch"  # AI对帖子的反应方式：batch(一次请求)/concurrent(逐条并发)/sequential(逐条依次)
     
     @property
     def database_url(self) -> str:
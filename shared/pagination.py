@@ -0,0 +1,69 @@
+"""
+游标分页工具
+
+基于 (created_at, id) 的键集分页：游标记录上一页最后一条记录的位置，
+下一页直接从该位置继续查询，不需要OFFSET扫描，深度翻页也保持稳定的耗时
+
+游标对外是不透明的字符串，调用方只需原样传回
+"""
+
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import or_, and_
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """把 (created_at, id) 编码为游标字符串"""
+    raw = f"{created_at.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    解析游标字符串
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        created_at_str, id_str = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at_str), int(id_str)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def apply_keyset(query, created_at_column, id_column, cursor: Optional[str],
+                 descending: bool = True):
+    """
+    为查询加上键集条件和排序
+
+    Args:
+        query: SQLAlchemy查询
+        created_at_column: 时间列
+        id_column: 主键列（时间相同时的次序）
+        cursor: 上一页返回的游标，None表示第一页
+        descending: True表示从新到旧
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        if descending:
+            query = query.filter(or_(
+                created_at_column < created_at,
+                and_(created_at_column == created_at, id_column < last_id)
+            ))
+        else:
+            query = query.filter(or_(
+                created_at_column > created_at,
+                and_(created_at_column == created_at, id_column > last_id)
+            ))
+
+    if descending:
+        return query.order_by(created_at_column.desc(), id_column.desc())
+    return query.order_by(created_at_column.asc(), id_column.asc())